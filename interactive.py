@@ -1,4 +1,4 @@
-from layouteditorwrapper import wrapper
+from layouteditorwrapper import jobs, wrapper
 
 
 def main():
@@ -6,5 +6,13 @@ def main():
     drawing = layout.drawing()
     return layout, drawing
 
+
+def submit(build, *args, **kwargs):
+    """
+    Run the given build function in the background and show the result when it finishes; see jobs.submit().
+    """
+    kwargs.setdefault('on_finished', lambda job: layout.show_latest())
+    return jobs.submit(drawing, build, *args, **kwargs)
+
 if __name__ == '__main__':
     layout, drawing = main()
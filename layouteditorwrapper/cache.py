@@ -0,0 +1,412 @@
+"""
+This module stores computed geometry on disk, so that rebuilding a design that has not changed skips the geometry
+computation.
+
+A GeometryCache is a directory containing one binary file per entry and an index. Each entry is a set of named
+arrays, such as the arc points of a smoothed path or the integer database-unit vertices of a component cell, stored
+back to back in a single .npy file; large entries are memory-mapped when they are read, and small ones are read into
+memory. Entries are identified by keys, which are hashes of everything that determines the geometry: see key(). The
+total size of the entries is bounded, and when it is exceeded the least recently used entries are deleted. The index,
+which records the order of use, is written by save(), which is called when a cache used in a with statement is
+deactivated; entry files that are missing from the index, because the index was not saved, are deleted when the cache
+is opened.
+
+The cache is used only while it is active. While a cache is active, the path.SmoothedElement constructors look up the
+result of smooth_path(), and the mesh elements look up the result of Mesh.path_mesh(), so warm rebuilds of paths do no
+geometry calculation at all; component cells are cached by calling the component through call(), or through a
+function wrapped with cached(). A cell can be cached if it contains only boxes, polygons, and paths, which is true of
+the functions in components.py; other cells are simply created again each time.
+
+The cache is meant to be used by one process at a time. Each file is written to a temporary name and then renamed, so a
+build that is interrupted never leaves a partial entry.
+
+Example:
+    with cache.GeometryCache('build/geometry', max_bytes=2 ** 30):
+        feedline = path.Path([path.CPWMesh(...), ...])  # Smoothing and meshing are read from the cache.
+        idc = cache.call(drawing, components.interdigitated_capacitor, space=2, length=100, ...)
+"""
+from __future__ import division
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import wrapper
+
+# This is part of every key; change it when a change to the code changes the geometry computed from the same inputs.
+VERSION = 1
+
+# The name of the index file in the cache directory.
+INDEX = 'index.json'
+
+# The arrays in each entry start at multiples of this many bytes.
+ALIGNMENT = 8
+
+# The element types that call() can store and recreate.
+CACHED_TYPES = (wrapper.BOX, wrapper.PATH, wrapper.POLYGON)
+
+Entry = namedtuple('Entry', ['arrays', 'info'])
+Entry.__doc__ = """
+A cache entry. The arrays are an OrderedDict of read-only numpy arrays, and info is a dict of additional values that
+can be stored as JSON.
+"""
+
+_replace = getattr(os, 'replace', os.rename)
+
+_active = None
+
+
+def update_hash(sha, value):
+    """
+    Update the given hash object with a representation of the given value, which may be a nested structure of dicts,
+    lists, tuples, numpy arrays, and objects with a repr that identifies their value, such as numbers and strings.
+    """
+    if isinstance(value, np.ndarray):
+        sha.update('{} {}'.format(value.dtype, value.shape).encode())
+        sha.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        sha.update('{}['.format(len(value)).encode())
+        for item in value:
+            update_hash(sha, item)
+        sha.update(b']')
+    elif isinstance(value, dict):
+        sha.update('{}{{'.format(len(value)).encode())
+        for key in sorted(value):
+            update_hash(sha, key)
+            update_hash(sha, value[key])
+        sha.update(b'}')
+    else:
+        sha.update(repr(value).encode())
+
+
+def key(*values):
+    """
+    Return a key that identifies the given values, which may be anything accepted by update_hash(). The first value is
+    usually the name of the calculation and the others are its arguments.
+
+    :return: a string containing the hexadecimal SHA-1 digest.
+    """
+    sha = hashlib.sha1('{}'.format(VERSION).encode())
+    update_hash(sha, values)
+    return sha.hexdigest()
+
+
+def _code_values(code):
+    """
+    Return the parts of the given code object that determine its behavior, with nested code objects, such as lambdas
+    and comprehensions, replaced by their own parts; the repr of a code object contains its memory address.
+    """
+    constants = [_code_values(value) if hasattr(value, 'co_code') else repr(value) for value in code.co_consts]
+    return [code.co_code, code.co_names, constants]
+
+
+def _bound_value(value):
+    """
+    Return a hashable stand-in for a default argument or closure value: functions are replaced by their module, name,
+    and code, since their repr contains a memory address, and empty closure cells by None.
+    """
+    code = getattr(value, '__code__', None)
+    if code is not None:
+        return [getattr(value, '__module__', None), getattr(value, '__name__', None), _code_values(code)]
+    return value
+
+
+def _closure_values(function):
+    values = []
+    for cell in getattr(function, '__closure__', None) or ():
+        try:
+            values.append(_bound_value(cell.cell_contents))
+        except ValueError:  # The cell is empty.
+            values.append(None)
+    return values
+
+
+def function_key(function):
+    """
+    Return a key that identifies the given function by its module, name, code, default argument values, and the values
+    of the variables in its closure, so that editing the function or its defaults changes the key. Changes to the
+    functions that it calls are not detected; change VERSION after such changes.
+
+    :param function: a Python function.
+    :return: a key string.
+    """
+    code = getattr(function, '__code__', None)
+    defaults = [_bound_value(value) for value in getattr(function, '__defaults__', None) or ()]
+    keyword_defaults = dict((name, _bound_value(value))
+                            for name, value in (getattr(function, '__kwdefaults__', None) or {}).items())
+    return key('function', getattr(function, '__module__', None), getattr(function, '__name__', repr(function)),
+               None if code is None else _code_values(code), defaults, keyword_defaults, _closure_values(function))
+
+
+def active():
+    """
+    :return: the active GeometryCache, or None if no cache is active.
+    """
+    return _active
+
+
+def activate(geometry_cache):
+    """
+    Make the given cache the active cache.
+
+    :param geometry_cache: a GeometryCache, or None to stop using a cache.
+    :return: the cache that was active before, or None.
+    """
+    global _active
+    previous = _active
+    _active = geometry_cache
+    return previous
+
+
+class GeometryCache(object):
+    """A size-bounded, least recently used store of named arrays on disk; see the module docstring."""
+
+    def __init__(self, directory, max_bytes=2 ** 30, mmap_bytes=2 ** 20):
+        """
+        Open the cache in the given directory, creating the directory if it does not exist.
+
+        :param directory: the directory in which the entries are stored.
+        :param max_bytes: the largest total size of the entry files; the least recently used entries are deleted to
+            stay below this.
+        :param mmap_bytes: entries at least this large are memory-mapped when they are read, and smaller entries are
+            read into memory, which avoids keeping a file open for each of many small entries.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_bytes = mmap_bytes
+        self._previous = []
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._index = OrderedDict()
+        try:
+            with open(os.path.join(directory, INDEX)) as f:
+                stored = json.load(f)
+        except (IOError, OSError, ValueError):
+            stored = []
+        for name, record in stored:
+            if os.path.exists(self._filename(name)):
+                self._index[name] = record
+        self._size = sum(record['size'] for record in self._index.values())
+        for filename in os.listdir(directory):
+            name, extension = os.path.splitext(filename)
+            if extension == '.tmp' or (extension == '.npy' and name not in self._index):
+                os.remove(os.path.join(directory, filename))
+
+    def __enter__(self):
+        self._previous.append(activate(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        activate(self._previous.pop())
+        self.save()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    @property
+    def size(self):
+        """
+        :return: the total size of the entry files, in bytes.
+        """
+        return self._size
+
+    def _filename(self, name):
+        return os.path.join(self.directory, name + '.npy')
+
+    def _write(self, filename, write):
+        """
+        Write a file with the given function, which is called with a binary file object, through a temporary file.
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                write(f)
+            _replace(temporary, filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def get(self, name):
+        """
+        Return the entry with the given key and mark it as the most recently used.
+
+        :param name: a key string; see key().
+        :return: an Entry, or None if there is no entry with this key.
+        """
+        record = self._index.get(name)
+        if record is None:
+            return None
+        filename = self._filename(name)
+        try:
+            if record['size'] >= self.mmap_bytes:
+                data = np.load(filename, mmap_mode='r')
+            else:
+                data = np.load(filename)
+                data.flags.writeable = False
+        except (IOError, OSError, ValueError):
+            self._size -= self._index.pop(name)['size']
+            return None
+        self._index[name] = self._index.pop(name)
+        arrays = OrderedDict()
+        for array_name, dtype, shape, start in record['arrays']:
+            dtype = np.dtype(str(dtype))
+            count = int(np.prod(shape, dtype=np.int64))
+            arrays[array_name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(shape)
+        return Entry(arrays=arrays, info=record['info'])
+
+    def put(self, name, arrays, info=None):
+        """
+        Store the given arrays under the given key, replacing any entry with the same key, and then delete the least
+        recently used entries until the total size is at most max_bytes. The entry is not recorded in the index file
+        until save() is called.
+
+        :param name: a key string; see key().
+        :param arrays: a dict of arrays with numeric or boolean data types; an OrderedDict keeps its order.
+        :param info: a dict of additional values that can be stored as JSON.
+        :return: None
+        """
+        layout = []
+        parts = []
+        start = 0
+        for array_name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            padding = -start % ALIGNMENT
+            parts.append(np.zeros(padding, dtype=np.uint8))
+            start += padding
+            layout.append([array_name, array.dtype.str, list(array.shape), start])
+            parts.append(array.reshape(-1).view(np.uint8))
+            start += array.nbytes
+        data = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+        self._write(self._filename(name), lambda f: np.save(f, data))
+        if name in self._index:
+            self._size -= self._index.pop(name)['size']
+        size = os.path.getsize(self._filename(name))
+        self._index[name] = {'size': size, 'arrays': layout, 'info': info or {}}
+        self._size += size
+        self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._index:
+            name, record = self._index.popitem(last=False)
+            self._size -= record['size']
+            try:
+                os.remove(self._filename(name))
+            except OSError:
+                pass
+
+    def save(self):
+        """
+        Write the index, which records the order in which the entries were last used.
+
+        :return: None
+        """
+        stored = [[name, record] for name, record in self._index.items()]
+        self._write(os.path.join(self.directory, INDEX), lambda f: f.write(json.dumps(stored).encode()))
+
+    def clear(self):
+        """
+        Delete all entries.
+
+        :return: None
+        """
+        self._index, removed = OrderedDict(), self._index
+        self._size = 0
+        for name in removed:
+            try:
+                os.remove(self._filename(name))
+            except OSError:
+                pass
+        self.save()
+
+
+def _store_cell(geometry_cache, name, cell):
+    """
+    Store the geometry of the given cell under the given key, if it contains only elements that can be recreated.
+    """
+    table = cell.element_table()
+    if not np.all(np.isin(table.types, CACHED_TYPES)):
+        return
+    arrays = OrderedDict([('types', table.types), ('layers', table.layers), ('data_types', table.data_types),
+                          ('widths', table.widths), ('caps', table.caps), ('offsets', table.offsets),
+                          ('points', table.points)])
+    geometry_cache.put(name, arrays, info={'cell_name': cell.name})
+
+
+def _load_cell(drawing, entry):
+    """
+    Create a new cell containing the geometry stored by _store_cell().
+    """
+    arrays = entry.arrays
+    cell = drawing.add_cell(entry.info['cell_name'])
+    offsets = arrays['offsets']
+    # The table lists the most recent element first, and pylayout adds each new element to the front of the list.
+    for row in range(arrays['types'].size - 1, -1, -1):
+        code = arrays['types'][row]
+        layer = int(arrays['layers'][row])
+        points = arrays['points'][offsets[row]:offsets[row + 1]]
+        if code == wrapper.BOX:
+            # The two points of a box are its upper left and lower right corners; see Box._points.
+            (x0, y0), (x1, y1) = points[:2].astype(np.int64).tolist()
+            box = np.array([min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0)])
+            x, y, width, height = drawing.from_database_units(box).tolist()
+            element = cell.add_box(x, y, width, height, layer)
+        elif code == wrapper.POLYGON:
+            element = cell.add_polygon(points, layer, database=True)
+        else:
+            element = cell.add_path(points, layer, width=drawing.from_database_units(int(arrays['widths'][row])),
+                                    cap=int(arrays['caps'][row]), database=True)
+        if arrays['data_types'][row]:
+            element.data_type = int(arrays['data_types'][row])
+    return cell
+
+
+def call(drawing, component, *args, **kwargs):
+    """
+    Return component(drawing, *args, **kwargs), which must return a new Cell, using the active cache: if the same
+    component has been called with the same arguments in a drawing with the same units, a new cell is created with the
+    stored geometry, and otherwise the component is called and its cell is stored. If no cache is active, this simply
+    calls the component.
+
+    With Drawing.auto_number, the cell created from the cache is numbered again, so its name differs from the name of
+    the cell that was stored.
+
+    :param drawing: the Drawing in which to create the cell.
+    :param component: a function that returns a new Cell; see function_key() for the changes that are detected.
+    :return: the new Cell.
+    """
+    geometry_cache = _active
+    if geometry_cache is None:
+        return component(drawing, *args, **kwargs)
+    name = key('component', function_key(component), args, kwargs, drawing.grid, drawing.use_user_unit)
+    entry = geometry_cache.get(name)
+    if entry is not None:
+        return _load_cell(drawing, entry)
+    cell = component(drawing, *args, **kwargs)
+    _store_cell(geometry_cache, name, cell)
+    return cell
+
+
+def cached(component):
+    """
+    Wrap the given component function so that it is called through call().
+
+    Example:
+        capacitor = cache.cached(components.interdigitated_capacitor)
+        idc = capacitor(drawing, space=2, length=100, ...)
+
+    :param component: a function that is called as component(drawing, ...) and returns a new Cell.
+    :return: the wrapped function.
+    """
+    @functools.wraps(component)
+    def cached_component(drawing, *args, **kwargs):
+        return call(drawing, component, *args, **kwargs)
+
+    return cached_component
@@ -1,7 +1,5 @@
 from __future__ import division
 import numpy as np
-# This should be from layouteditor import interface, but that doesn't resolve currently.
-import wrapper
 
 def interdigitated_capacitor(drawing, space, length, width, base, offset, turns, layer, cell_name=None):
     """
@@ -35,6 +33,49 @@ def interdigitated_capacitor(drawing, space, length, width, base, offset, turns,
     return cell
 
 
+def meander_points(length, spacing, width, turns):
+    """
+    Return the center line of the meander drawn by meander(). The points are the cumulative sum of a template of four
+    steps per turn, so no Python loop over the turns is needed.
+
+    :param length: the length of each turn, from outer edge to outer edge.
+    :param spacing: the edge-to-edge spacing between traces.
+    :param width: the width of the trace.
+    :param turns: the number of out-and-back turns.
+    :return: an array with shape (4 * turns, 2).
+    """
+    pitch = spacing + width
+    template = np.array([[0, length - width], [pitch, 0], [0, -(length - width)], [pitch, 0]])
+    steps = np.vstack(([[width / 2, width / 2]], np.tile(template, (turns, 1))[:-1]))
+    return np.cumsum(steps, axis=0)
+
+
+def meander_length(length, spacing, width, turns):
+    """
+    Return the length of the center line of the meander drawn by meander(), not including the caps, without drawing it.
+
+    :param length: the length of each turn, from outer edge to outer edge.
+    :param spacing: the edge-to-edge spacing between traces.
+    :param width: the width of the trace.
+    :param turns: the number of out-and-back turns.
+    :return: the length, which is 2 * turns * (length - width) + (2 * turns - 1) * (spacing + width).
+    """
+    return 2 * turns * (length - width) + (2 * turns - 1) * (spacing + width)
+
+
+def meander_bounding_box(length, spacing, width, turns):
+    """
+    Return the bounding box of the meander drawn by meander(), without drawing it.
+
+    :param length: the length of each turn, from outer edge to outer edge.
+    :param spacing: the edge-to-edge spacing between traces.
+    :param width: the width of the trace.
+    :param turns: the number of out-and-back turns.
+    :return: a tuple (x_min, y_min, x_max, y_max).
+    """
+    return 0, 0, 2 * turns * width + (2 * turns - 1) * spacing, length
+
+
 def meander(drawing, length, spacing, width, turns, layer, cell_name=None):
     """
     Create and return a new interface.Cell object containing a meandered inductor with the given parameters. The
@@ -56,17 +97,67 @@ def meander(drawing, length, spacing, width, turns, layer, cell_name=None):
         cell_name = 'meander_{:.3f}_{:.3f}_{:.3f}_{:.0f}_{:.0f}'.format(length, spacing, width, turns, layer)
 
     cell = drawing.add_cell(cell_name)
-    points = [np.array([width / 2, width / 2])]
-    for turn in range(turns):
-        points.append(points[-1] + np.array([0, length - width]))
-        points.append(points[-1] + np.array([spacing + width, 0]))
-        points.append(points[-1] + np.array([0, -(length - width)]))
-        points.append(points[-1] + np.array([spacing + width, 0]))
-    points.pop()
+    points = meander_points(length, spacing, width, turns)
     cell.add_path(points, int(layer), width=width, cap=2)
     return cell
 
 
+def double_meander_points(length, spacing, width, turns):
+    """
+    Return the center line of the double-wound meander drawn by double_meander(). The outgoing and returning traces
+    are each the cumulative sum of a template of steps that repeats every two turns, so no Python loop over the turns
+    is needed.
+
+    :param length: the length of each turn, from outer edge to outer edge.
+    :param spacing: the edge-to-edge spacing between traces.
+    :param width: the width of the trace.
+    :param turns: the number of turns, where each turn is a pair of traces.
+    :return: an array with shape (4 * turns, 2).
+    """
+    horizontal = width + spacing
+    vertical = (length - width) - horizontal
+    repeats = (turns + 1) // 2
+    out_steps = np.tile([[0, vertical], [3 * horizontal, 0], [0, -vertical], [horizontal, 0]], (repeats, 1))
+    back_steps = np.tile([[0, vertical], [horizontal, 0], [0, -vertical], [3 * horizontal, 0]], (repeats, 1))
+    # The last horizontal connection of each trace is omitted, and the first point of the outgoing trace is moved down.
+    out = np.cumsum(np.vstack(([[width / 2, width / 2 + horizontal]], out_steps[:2 * turns - 1])), axis=0)
+    back = np.cumsum(np.vstack(([[width / 2 + horizontal, width / 2]], back_steps[:2 * turns - 1])), axis=0)
+    out[0, 1] = width / 2
+    # Close the loop with a horizontal connection at the end of the trace that is higher.
+    if turns % 2:
+        back[-1, 1] = out[-1, 1]
+    else:
+        out[-1, 1] = back[-1, 1]
+    return np.vstack((out, back[::-1]))
+
+
+def double_meander_length(length, spacing, width, turns):
+    """
+    Return the length of the center line of the meander drawn by double_meander(), not including the caps, without
+    drawing it. It is the same as the length of the meander drawn by meander() with the same parameters.
+
+    :param length: the length of each turn, from outer edge to outer edge.
+    :param spacing: the edge-to-edge spacing between traces.
+    :param width: the width of the trace.
+    :param turns: the number of turns, where each turn is a pair of traces.
+    :return: the length, which is 2 * turns * (length - width) + (2 * turns - 1) * (spacing + width).
+    """
+    return meander_length(length, spacing, width, turns)
+
+
+def double_meander_bounding_box(length, spacing, width, turns):
+    """
+    Return the bounding box of the meander drawn by double_meander(), without drawing it.
+
+    :param length: the length of each turn, from outer edge to outer edge.
+    :param spacing: the edge-to-edge spacing between traces.
+    :param width: the width of the trace.
+    :param turns: the number of turns, where each turn is a pair of traces.
+    :return: a tuple (x_min, y_min, x_max, y_max).
+    """
+    return meander_bounding_box(length, spacing, width, turns)
+
+
 def double_meander(drawing, length, spacing, width, turns, layer, cell_name=None):
     """
     Create and return a new interface.Cell object containing a double-wound meandered inductor with the given
@@ -89,32 +180,7 @@ def double_meander(drawing, length, spacing, width, turns, layer, cell_name=None
         cell_name = 'double_meander_{:.3f}_{:.3f}_{:.3f}_{:.0f}_{:.0f}'.format(length, spacing, width, turns, layer)
 
     cell = drawing.add_cell(cell_name)
-    out = [np.array([width / 2, width / 2 + width + spacing])]
-    back = [np.array([width / 2 + width + spacing, width / 2])]
-    horizontal = width + spacing
-    vertical = (length - width) - horizontal
-    for turn in range(turns):
-        if turn % 2:
-            out.append(out[-1] + np.array([0, -vertical]))
-            back.append(back[-1] + np.array([0, -vertical]))
-            out.append(out[-1] + np.array([horizontal, 0]))
-            back.append(back[-1] + np.array([3 * horizontal, 0]))
-        else:
-            out.append(out[-1] + np.array([0, vertical]))
-            back.append(back[-1] + np.array([0, vertical]))
-            out.append(out[-1] + np.array([3 * horizontal, 0]))
-            back.append(back[-1] + np.array([horizontal, 0]))
-    # Fix the first point.
-    out[0] = np.array([width / 2, width / 2])
-    # Delete the last horizontal connection and close the loop.
-    out.pop()
-    back.pop()
-    if turns % 2:
-        back[-1] = np.array([back[-1][0], out[-1][1]])
-    else:
-        out[-1] = np.array([out[-1][0], back[-1][1]])
-    out.extend(reversed(back))
-    cell.add_path(out, int(layer), width=width, cap=2)
+    cell.add_path(double_meander_points(length, spacing, width, turns), int(layer), width=width, cap=2)
     return cell
 
 
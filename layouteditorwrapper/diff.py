@@ -0,0 +1,320 @@
+"""
+This module compares two layouts and reports which cells and shapes changed, for example after regenerating a mask
+with a different parameter.
+
+Each cell is summarized by a content hash that covers its own shapes and its cell references, in a normalized form:
+the order of the elements, the starting vertex and orientation of polygons, the direction of paths, and the names of
+referenced cells do not matter, but every coordinate and attribute does. The hash of a reference includes the content
+hash of the referenced cell, so the hashes form a Merkle tree: two cells with equal hashes have identical contents all
+the way down, and a comparison of two hierarchies only descends into the cells whose hashes differ.
+
+The shapes of each pair of changed cells are compared layer by layer. A shape that appears in only one of the cells is
+added or removed, unless an identical shape at a different position appears in the other cell, in which case the pair
+is reported as moved. Candidate moves are found with the grid index in spatial.py.
+
+The hashes of individual shapes are 64-bit values computed with vectorized integer arithmetic over the ElementTable of
+each cell, and the cell hash is a SHA-1 digest of the sorted shape hashes. Text strings are not stored in an
+ElementTable, so text elements are compared only by position, layer, and height.
+
+Example:
+    result = diff.diff(old_drawing, new_drawing)
+    for name, layers in result.changed.items():
+        for layer, changes in layers.items():
+            print(name, layer, len(changes.added), len(changes.removed), len(changes.moved))
+"""
+from __future__ import division
+
+import hashlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import geometry, spatial, wrapper
+
+# The layer used for cell references, as in an ElementTable.
+REFERENCE_LAYER = -1
+
+LayerDiff = namedtuple('LayerDiff', ['added', 'removed', 'moved'])
+LayerDiff.__doc__ = """
+The changes on one layer of a cell. The added list contains the indices in Cell.elements of the new cell of the shapes
+that do not appear in the old cell; the removed list contains the indices in the old cell of the shapes that do not
+appear in the new cell; the moved list contains (old_index, new_index, displacement) tuples for shapes that are
+identical except for their position, where displacement is an (x, y) tuple in the units of the drawing.
+"""
+
+Diff = namedtuple('Diff', ['added', 'removed', 'changed', 'unchanged'])
+Diff.__doc__ = """
+The changes between two layouts. The added and removed lists contain the names of cells that appear in only the new or
+only the old layout; changed is an OrderedDict with the name of each cell that appears in both but has a different
+content hash, and values that are OrderedDicts with layer keys and LayerDiff values, where the layer of cell references
+is REFERENCE_LAYER; unchanged is a list of the names of the cells with equal hashes. A cell can be changed even if none
+of its own layers changed, because a cell that it references changed.
+"""
+
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(values):
+    """
+    Scramble the bits of the given integers using the finalizer of the SplitMix64 generator.
+
+    :param values: an integer array.
+    :return: a uint64 array with the same shape.
+    """
+    z = np.ascontiguousarray(values, dtype=np.int64).view(np.uint64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _combine(*columns):
+    """
+    Combine columns of uint64 hashes into a single hash for each row; the order of the columns matters.
+    """
+    result = np.zeros(np.broadcast(*columns).shape, dtype=np.uint64)
+    for column in columns:
+        result = _mix((result * _MULTIPLIER + column).view(np.int64))
+    return result
+
+
+def _float_bits(values):
+    """
+    :return: the bits of the given floats as int64 values, with -0.0 replaced by 0.0.
+    """
+    return (np.asarray(values, dtype=np.float64) + 0.0).view(np.int64)
+
+
+def _shape_hashes(vertices, offsets):
+    """
+    Hash the vertices of each shape, in order.
+
+    :return: a uint64 array with one hash per shape.
+    """
+    owners = geometry.shape_indices(offsets)
+    positions = (np.arange(vertices.shape[0]) - offsets[owners]).astype(np.uint64)
+    vertex_hashes = _combine(_mix(vertices[:, 0]), _mix(vertices[:, 1]), _mix(positions.view(np.int64)))
+    if offsets.size == 1:
+        return np.empty(0, dtype=np.uint64)
+    return _combine(np.add.reduceat(vertex_hashes, offsets[:-1]), _mix(np.diff(offsets)))
+
+
+class _Summary(object):
+    """
+    The normalized hashes of all of the elements in one cell.
+
+    Attributes, with one entry per element in the order of Cell.elements:
+    hashes: a uint64 array of hashes that depend on everything about each element.
+    signatures: a uint64 array of hashes that are independent of the position of each element.
+    anchors: an int64 array with shape (M, 2) containing the position of each element, which is the first vertex of its
+        normalized points.
+    layers: the layer of each element, with REFERENCE_LAYER for cell references.
+    digest: the content hash of the cell, as a hexadecimal string.
+    """
+
+    def __init__(self, table, child_digests):
+        """
+        :param table: the ElementTable of the cell.
+        :param child_digests: a dict with cell name keys and content hash values for every referenced cell.
+        """
+        rows = len(table)
+        self.layers = table.layers
+        signatures = np.zeros(rows, dtype=np.uint64)
+        self.anchors = np.zeros((rows, 2), dtype=np.int64)
+        points = table.points
+        ring_vertices, ring_offsets, ring_rows = table.rings()
+        ring_vertices, ring_offsets = geometry.normalize_rings(ring_vertices, ring_offsets)
+        line_vertices, line_offsets, line_rows = table.lines()
+        line_vertices, line_offsets = geometry.normalize_lines(line_vertices, line_offsets)
+        other_rows = table.rows(types=(wrapper.TEXT, wrapper.CELLREF, wrapper.CELLREF_ARRAY))
+        other_vertices, other_offsets = geometry.select(points, table.offsets, other_rows)
+        for vertices, offsets, selected in ((ring_vertices, ring_offsets, ring_rows),
+                                            (line_vertices, line_offsets, line_rows),
+                                            (other_vertices, other_offsets, other_rows)):
+            anchors = vertices[offsets[:-1]].astype(np.int64)
+            relative = vertices.astype(np.int64) - np.repeat(anchors, np.diff(offsets), axis=0)
+            signatures[selected] = _shape_hashes(relative, offsets)
+            self.anchors[selected] = anchors
+        # Boxes, circles, and polygons that enclose the same region are the same shape.
+        kinds = np.where(np.isin(table.types, (wrapper.BOX, wrapper.CIRCLE, wrapper.POLYGON)), -1, table.types)
+        children = np.array([int(child_digests[name][:16], 16) if name is not None else 0
+                             for name in table.cell_names], dtype=np.uint64)
+        self.signatures = _combine(signatures, _mix(kinds), _mix(table.layers), _mix(table.data_types),
+                                   _mix(table.widths), _mix(table.caps), _mix(table.repeats[:, 0]),
+                                   _mix(table.repeats[:, 1]), _mix(_float_bits(table.angles)),
+                                   _mix(_float_bits(table.scales)), _mix(table.mirrors), children)
+        self.hashes = _combine(self.signatures, _mix(self.anchors[:, 0]), _mix(self.anchors[:, 1]))
+        self.digest = hashlib.sha1(np.sort(self.hashes).tobytes()).hexdigest()
+
+
+def _summarize(cell, cache):
+    """
+    Return the _Summary of the given cell, using and updating the given cache of summaries by cell name.
+    """
+    name = cell.name
+    if name not in cache:
+        table = cell.element_table()
+        child_digests = dict((child.name, _summarize(child, cache).digest) for row, child in table.references())
+        cache[name] = _Summary(table, child_digests)
+    return cache[name]
+
+
+def cell_hashes(drawing):
+    """
+    :param drawing: a Drawing.
+    :return: a dict with cell name keys and content hash values, which are hexadecimal strings.
+    """
+    cache = {}
+    return dict((name, _summarize(cell, cache).digest) for name, cell in drawing.cells.items())
+
+
+def _occurrence_keys(hashes):
+    """
+    Return keys that distinguish repeated hashes by their order of occurrence, so that multisets of hashes can be
+    compared with set operations.
+    """
+    order = np.argsort(hashes, kind='stable')
+    sorted_hashes = hashes[order]
+    starts = np.concatenate(([True], sorted_hashes[1:] != sorted_hashes[:-1]))
+    group_starts = np.maximum.accumulate(np.where(starts, np.arange(hashes.size), 0))
+    occurrences = np.empty(hashes.size, dtype=np.int64)
+    occurrences[order] = np.arange(hashes.size) - group_starts
+    return _combine(hashes, _mix(occurrences))
+
+
+def _match_moves(old, new, removed, added, max_move):
+    """
+    Pair removed and added shapes with equal signatures, preferring the closest pairs.
+
+    :return: a list of (old_row, new_row) tuples.
+    """
+    if not (removed.size and added.size):
+        return []
+    old_anchors = old.anchors[removed].astype(np.float64)
+    new_anchors = new.anchors[added].astype(np.float64)
+    if max_move is None:
+        # Pair the k-th removed and k-th added shape with each signature, in order of position.
+        old_order = np.lexsort((old_anchors[:, 1], old_anchors[:, 0]))
+        new_order = np.lexsort((new_anchors[:, 1], new_anchors[:, 0]))
+        old_keys = _occurrence_keys(old.signatures[removed][old_order])
+        new_keys = _occurrence_keys(new.signatures[added][new_order])
+        common, i, j = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+        return list(zip(removed[old_order[i]].tolist(), added[new_order[j]].tolist()))
+    i, j = spatial.box_pairs(spatial.point_boxes(old_anchors), spatial.point_boxes(new_anchors), margin=max_move)
+    same = old.signatures[removed[i]] == new.signatures[added[j]]
+    i = i[same]
+    j = j[same]
+    d = new_anchors[j] - old_anchors[i]
+    pairs = []
+    used_old = set()
+    used_new = set()
+    for k in np.argsort(np.hypot(d[:, 0], d[:, 1]), kind='stable').tolist():
+        if i[k] not in used_old and j[k] not in used_new:
+            used_old.add(i[k])
+            used_new.add(j[k])
+            pairs.append((int(removed[i[k]]), int(added[j[k]])))
+    return sorted(pairs)
+
+
+def _compare(old, new, drawing, max_move):
+    """
+    Compare the summaries of two cells.
+
+    :return: an OrderedDict with layer keys, in increasing order, and LayerDiff values, for the layers that changed.
+    """
+    old_keys = _occurrence_keys(old.hashes)
+    new_keys = _occurrence_keys(new.hashes)
+    removed = np.flatnonzero(~np.isin(old_keys, new_keys))
+    added = np.flatnonzero(~np.isin(new_keys, old_keys))
+    if max_move is not None:
+        max_move = max_move / drawing.grid
+    moves = _match_moves(old, new, removed, added, max_move)
+    moved_old = set(pair[0] for pair in moves)
+    moved_new = set(pair[1] for pair in moves)
+    layers = OrderedDict()
+    for layer in np.union1d(old.layers[removed], new.layers[added]).tolist():
+        layer_moves = [(a, b, tuple((drawing.grid * (new.anchors[b] - old.anchors[a])).tolist()))
+                       for a, b in moves if old.layers[a] == layer]
+        layers[layer] = LayerDiff(added=[b for b in added.tolist() if new.layers[b] == layer and b not in moved_new],
+                                  removed=[a for a in removed.tolist()
+                                           if old.layers[a] == layer and a not in moved_old],
+                                  moved=layer_moves)
+    return layers
+
+
+def diff_cells(old_cell, new_cell, max_move=None):
+    """
+    Compare the elements drawn directly in two cells.
+
+    :param old_cell: a Cell.
+    :param new_cell: a Cell, which may belong to a different Drawing.
+    :param max_move: if not None, shapes are reported as moved only if they moved at most this distance in x and y, in
+        the units of the new drawing; if None, identical shapes are paired in order of position regardless of distance.
+    :return: an OrderedDict with layer keys and LayerDiff values, for the layers that changed.
+    """
+    return _compare(_summarize(old_cell, {}), _summarize(new_cell, {}), new_cell.drawing, max_move)
+
+
+def diff_hierarchy(old_cell, new_cell, max_move=None):
+    """
+    Compare two cell hierarchies, descending only into referenced cells whose content hashes differ. Referenced cells
+    are paired by name.
+
+    :param old_cell: the top Cell of the old hierarchy.
+    :param new_cell: the top Cell of the new hierarchy.
+    :param max_move: see diff_cells().
+    :return: a Diff that includes only the cells visited; unchanged contains the names of visited cells whose hashes
+        are equal, below which nothing was compared.
+    """
+    old_cache = {}
+    new_cache = {}
+    result = Diff(added=[], removed=[], changed=OrderedDict(), unchanged=[])
+    pending = [(old_cell, new_cell)]
+    visited = set()
+    while pending:
+        old, new = pending.pop()
+        if new.name in visited:
+            continue
+        visited.add(new.name)
+        old_summary = _summarize(old, old_cache)
+        new_summary = _summarize(new, new_cache)
+        if old_summary.digest == new_summary.digest:
+            result.unchanged.append(new.name)
+            continue
+        result.changed[new.name] = _compare(old_summary, new_summary, new.drawing, max_move)
+        old_children = OrderedDict((child.name, child) for row, child in old.element_table().references())
+        new_children = OrderedDict((child.name, child) for row, child in new.element_table().references())
+        for name, child in new_children.items():
+            if name in old_children:
+                pending.append((old_children[name], child))
+            elif name not in result.added:
+                result.added.append(name)
+        result.removed.extend(name for name in old_children if name not in new_children and name not in result.removed)
+    return result
+
+
+def diff(old_drawing, new_drawing, max_move=None):
+    """
+    Compare every cell of two drawings, pairing cells by name.
+
+    :param old_drawing: a Drawing.
+    :param new_drawing: a Drawing.
+    :param max_move: see diff_cells().
+    :return: a Diff.
+    """
+    old_cells = old_drawing.cells
+    new_cells = new_drawing.cells
+    old_cache = {}
+    new_cache = {}
+    result = Diff(added=[name for name in new_cells if name not in old_cells],
+                  removed=[name for name in old_cells if name not in new_cells],
+                  changed=OrderedDict(), unchanged=[])
+    for name, new in new_cells.items():
+        if name not in old_cells:
+            continue
+        old_summary = _summarize(old_cells[name], old_cache)
+        new_summary = _summarize(new, new_cache)
+        if old_summary.digest == new_summary.digest:
+            result.unchanged.append(name)
+        else:
+            result.changed[name] = _compare(old_summary, new_summary, new_drawing, max_move)
+    return result
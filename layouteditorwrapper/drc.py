@@ -0,0 +1,342 @@
+"""
+This module checks the shapes in a cell against minimum width, spacing, enclosure, and area rules, so that design rule
+violations can be found while a layout is being generated instead of after it has been exported.
+
+All of the shapes on a layer are converted to polygons: boxes, circles, and polygons are used directly, and paths are
+converted to their outlines. The edges of the polygons are paired using the grid index in spatial.py and the distance
+between each candidate pair of edges is computed in one vectorized step, so the cost grows with the number of edges and
+nearby pairs. The checks are done in database units, and the rules and results use the units of the drawing.
+
+The shapes on a layer are not merged, so the checks follow these conventions:
+- A width violation is a pair of non-adjacent edges of the same polygon that face each other across its interior, that
+  overlap when each is projected onto the other, and that are closer than the minimum width.
+- A spacing violation is a pair of edges of polygons that are closer than the minimum spacing, excluding polygons that
+  touch or overlap, directly or through other polygons; spacing within a single connected group of polygons, such as a
+  notch, is not checked.
+- An enclosure violation is an edge of an inner polygon that is closer than the minimum enclosure to, or crosses, an
+  edge of a polygon on the outer layer, or an inner polygon that is not inside any outer polygon. Outer polygons that
+  abut are not merged, so an inner polygon that straddles the seam between them is reported.
+- An area violation is a connected group of polygons with total area less than the minimum; overlaps are counted twice.
+
+Only the elements drawn directly in the cell are checked; cell references are ignored.
+
+The check can also run incrementally: if the elements added since the last check are given, such as the list returned
+by path.Path.draw() with incremental=True, then only violations that involve at least one of those elements are
+reported, and only the edges near them are compared.
+
+Example:
+    rules = [drc.Rule(drc.WIDTH, 1, 2), drc.Rule(drc.SPACING, 1, 2), drc.Rule(drc.ENCLOSURE, 2, 1, inner_layer=3)]
+    violations = drc.check(cell, rules)
+    added = path.draw(cell, origin, positive_layer=1, incremental=True)
+    violations = drc.check(cell, rules, elements=added)
+"""
+from __future__ import division
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import geometry, spatial
+
+WIDTH = 'width'
+SPACING = 'spacing'
+ENCLOSURE = 'enclosure'
+AREA = 'area'
+
+Rule = namedtuple('Rule', ['kind', 'layer', 'value', 'inner_layer'])
+Rule.__new__.__defaults__ = (None,)
+Rule.__doc__ = """
+A design rule. The kind is WIDTH, SPACING, ENCLOSURE, or AREA, and the value is the minimum width, spacing, or
+enclosure, or the minimum area, in the units of the drawing. For ENCLOSURE rules, layer is the outer layer and
+inner_layer is the layer that it must enclose.
+"""
+
+Violation = namedtuple('Violation', ['kind', 'layer', 'location', 'value'])
+Violation.__doc__ = """
+A design rule violation. The kind and layer are those of the violated rule; the location is an (x, y) tuple, which is
+the midpoint of the closest points for width, spacing, and enclosure violations and the first vertex of the shape for
+area violations; the value is the measured distance or area, in the units of the drawing.
+"""
+
+
+class _Polygons(object):
+    """
+    The polygons on a single layer of an ElementTable, with their edges and bounding boxes, in database units.
+    """
+
+    def __init__(self, table, layer, new_rows=None):
+        ring_vertices, ring_offsets, ring_rows = table.rings(layers=(layer,))
+        line_vertices, line_offsets, line_rows = table.lines(layers=(layer,))
+        outlines = [geometry.path_outline(line_vertices[line_offsets[k]:line_offsets[k + 1]], table.widths[row],
+                                          table.caps[row])
+                    for k, row in enumerate(line_rows)]
+        outline_vertices, outline_offsets = geometry.concatenate(outlines)
+        keep = np.flatnonzero(np.diff(outline_offsets) > 0)
+        outline_vertices, outline_offsets = geometry.select(outline_vertices, outline_offsets, keep)
+        self.vertices = np.concatenate((ring_vertices.astype(np.float64), outline_vertices))
+        self.offsets = np.concatenate((ring_offsets, ring_offsets[-1] + outline_offsets[1:]))
+        self.rows = np.concatenate((ring_rows, line_rows[keep]))
+        if new_rows is None:
+            self.new = np.ones(self.rows.size, dtype=bool)
+        else:
+            self.new = np.isin(self.rows, new_rows)
+        self.boxes = geometry.bounding_boxes(self.vertices, self.offsets)
+        # Edge k runs from vertex k to the next vertex of the same polygon, wrapping around at the end.
+        self.next = np.arange(1, self.vertices.shape[0] + 1)
+        self.next[self.offsets[1:] - 1] = self.offsets[:-1]
+        self.starts = self.vertices
+        self.ends = self.vertices[self.next]
+        self.owners = geometry.shape_indices(self.offsets)
+        self.edge_boxes = spatial.segment_boxes(self.starts, self.ends)
+
+    def __len__(self):
+        return self.rows.size
+
+    def edge_pairs(self, margin, other=None, mask=None):
+        """
+        Return the nearby pairs of edges, at least one of which belongs to a selected polygon, with their distances and
+        closest points.
+
+        :param margin: the maximum distance of interest.
+        :param other: another _Polygons instance, or None to pair edges of these polygons with each other.
+        :param mask: a boolean array that selects polygons; the default selects the new polygons.
+        :return: a tuple (i, j, distances, closest_i, closest_j).
+        """
+        if mask is None:
+            mask = self.new
+        edges = np.flatnonzero(mask[self.owners])
+        if other is None:
+            i, j = spatial.box_pairs(self.edge_boxes[edges], self.edge_boxes, margin=margin)
+            i = edges[i]
+            # Pairs of two selected edges are found twice.
+            keep = (i != j) & ~(mask[self.owners[j]] & (j < i))
+            i = i[keep]
+            j = j[keep]
+            other = self
+        else:
+            i, j = spatial.box_pairs(self.edge_boxes[edges], other.edge_boxes, margin=margin)
+            i = edges[i]
+        distances, closest_i, closest_j = geometry.segment_distances(self.starts[i], self.ends[i], other.starts[j],
+                                                                     other.ends[j])
+        return i, j, distances, closest_i, closest_j
+
+    def near(self, boxes, margin):
+        """
+        :return: a boolean array that is True for each polygon whose bounding box is within the margin of any of the
+            given boxes.
+        """
+        i, j = spatial.box_pairs(boxes, self.boxes, margin=margin)
+        near = np.zeros(len(self), dtype=bool)
+        near[j] = True
+        return near
+
+    def components(self, touching_i, touching_j):
+        """
+        :return: an integer array containing a label for each polygon, which is shared by all polygons connected
+            through the given pairs of touching polygons.
+        """
+        labels = np.arange(len(self))
+        while touching_i.size:
+            smaller = np.minimum(labels[touching_i], labels[touching_j])
+            if np.all(labels[touching_i] == smaller) and np.all(labels[touching_j] == smaller):
+                break
+            np.minimum.at(labels, touching_i, smaller)
+            np.minimum.at(labels, touching_j, smaller)
+            labels = labels[labels]
+        return labels
+
+
+def _location(closest_a, closest_b):
+    return (closest_a + closest_b) / 2
+
+
+def _violations(kind, layer, locations, values, location_scale, value_scale):
+    """
+    Convert arrays of violations to a list of Violation objects. Pairs of edges that meet at a corner often measure the
+    same distance between the same points, so duplicate violations are removed.
+    """
+    locations = np.asarray(locations).reshape(-1, 2)
+    values = np.asarray(values)
+    unique, first = np.unique(np.column_stack((locations, values)), axis=0, return_index=True)
+    first = np.sort(first)
+    locations = locations[first]
+    values = values[first]
+    return [Violation(kind, layer, tuple(location), value)
+            for location, value in zip((location_scale * np.asarray(locations)).tolist(),
+                                       (value_scale * np.asarray(values)).tolist())]
+
+
+def _projection_overlaps(starts, directions, other_starts, other_ends):
+    """
+    :return: a boolean array that is True where the projection of each other segment onto the line of the segment that
+        starts at the given point with the given direction overlaps that segment with positive length.
+    """
+    lengths = np.sum(directions * directions, axis=1)
+    t0 = np.sum((other_starts - starts) * directions, axis=1) / lengths
+    t1 = np.sum((other_ends - starts) * directions, axis=1) / lengths
+    return np.minimum(np.maximum(t0, t1), 1) > np.maximum(np.minimum(t0, t1), 0)
+
+
+def min_width(polygons, width):
+    """
+    :param polygons: a _Polygons instance.
+    :param width: the minimum width in database units.
+    :return: a tuple (locations, widths) of arrays containing the violations.
+    """
+    i, j, distances, closest_i, closest_j = polygons.edge_pairs(width)
+    same = polygons.owners[i] == polygons.owners[j]
+    adjacent = (polygons.next[i] == j) | (polygons.next[j] == i)
+    di = polygons.ends[i] - polygons.starts[i]
+    dj = polygons.ends[j] - polygons.starts[j]
+    # Edges on opposite sides of a narrow part of a polygon run in opposite directions.
+    facing = np.sum(di * dj, axis=1) < 0
+    candidates = np.flatnonzero(same & ~adjacent & facing & (distances > 0) & (distances < width))
+    i = i[candidates]
+    j = j[candidates]
+    di = di[candidates]
+    dj = dj[candidates]
+    # The interior is to the left of each edge of a counterclockwise ring and to the right of each edge of a clockwise
+    # ring. The gap between the closest points lies inside the polygon if it leaves each edge on its interior side.
+    signs = np.sign(geometry.ring_signed_areas(polygons.vertices, polygons.offsets))[polygons.owners[i]]
+    normals_i = signs[:, np.newaxis] * np.column_stack((-di[:, 1], di[:, 0]))
+    normals_j = signs[:, np.newaxis] * np.column_stack((-dj[:, 1], dj[:, 0]))
+    gaps = closest_j[candidates] - closest_i[candidates]
+    inward = (np.sum(normals_i * gaps, axis=1) > 0) & (np.sum(normals_j * gaps, axis=1) < 0)
+    overlapping = (_projection_overlaps(polygons.starts[i], di, polygons.starts[j], polygons.ends[j]) &
+                   _projection_overlaps(polygons.starts[j], dj, polygons.starts[i], polygons.ends[i]))
+    keep = candidates[inward & overlapping]
+    return _location(closest_i[keep], closest_j[keep]), distances[keep]
+
+
+def _touching(polygons, mask):
+    """
+    Return the pairs of distinct polygons that touch or overlap, at least one of which is selected by the mask.
+    """
+    i, j, distances, closest_i, closest_j = polygons.edge_pairs(0, mask=mask)
+    edge_touches = (distances == 0) & (polygons.owners[i] != polygons.owners[j])
+    a = polygons.owners[i][edge_touches]
+    b = polygons.owners[j][edge_touches]
+    # Polygons that are nested do not share any edges, so test whether the first vertex of each is inside the other.
+    selected = np.flatnonzero(mask)
+    box_i, box_j = spatial.box_pairs(polygons.boxes[selected], polygons.boxes)
+    box_i = selected[box_i]
+    distinct = box_i != box_j
+    box_i = box_i[distinct]
+    box_j = box_j[distinct]
+    inside = (geometry.rings_contain(polygons.vertices, polygons.offsets, box_j,
+                                     polygons.vertices[polygons.offsets[box_i]]) |
+              geometry.rings_contain(polygons.vertices, polygons.offsets, box_i,
+                                     polygons.vertices[polygons.offsets[box_j]]))
+    return np.concatenate((a, box_i[inside])), np.concatenate((b, box_j[inside]))
+
+
+def min_spacing(polygons, spacing):
+    """
+    Polygons are considered connected if they touch through polygons within the spacing of the new polygons.
+
+    :param polygons: a _Polygons instance.
+    :param spacing: the minimum spacing in database units.
+    :return: a tuple (locations, spacings) of arrays containing the violations.
+    """
+    i, j, distances, closest_i, closest_j = polygons.edge_pairs(spacing)
+    local = polygons.new | polygons.near(polygons.boxes[polygons.new], spacing)
+    labels = polygons.components(*_touching(polygons, local))
+    separate = labels[polygons.owners[i]] != labels[polygons.owners[j]]
+    candidates = np.flatnonzero(separate & (distances < spacing))
+    return _location(closest_i[candidates], closest_j[candidates]), distances[candidates]
+
+
+def min_enclosure(outer, inner, enclosure):
+    """
+    :param outer: a _Polygons instance for the enclosing layer.
+    :param inner: a _Polygons instance for the enclosed layer.
+    :param enclosure: the minimum enclosure in database units.
+    :return: a tuple (locations, enclosures) of arrays containing the violations.
+    """
+    i, j, distances, closest_i, closest_j = inner.edge_pairs(enclosure, other=outer)
+    candidates = np.flatnonzero(distances < enclosure)
+    locations = [_location(closest_i[candidates], closest_j[candidates])]
+    values = [distances[candidates]]
+    new = np.flatnonzero(inner.new)
+    first_vertices = inner.vertices[inner.offsets[new]]
+    point_i, point_j = spatial.box_pairs(np.hstack((first_vertices, first_vertices)), outer.boxes)
+    inside = geometry.rings_contain(outer.vertices, outer.offsets, point_j, first_vertices[point_i])
+    enclosed = np.zeros(new.size, dtype=bool)
+    enclosed[point_i[inside]] = True
+    locations.append(first_vertices[~enclosed])
+    values.append(np.zeros(np.count_nonzero(~enclosed)))
+    return np.concatenate(locations), np.concatenate(values)
+
+
+def min_area(polygons, area, new=None):
+    """
+    :param polygons: a _Polygons instance.
+    :param area: the minimum area in square database units.
+    :param new: a boolean array that selects the polygons whose groups are checked; the default is polygons.new.
+    :return: a tuple (locations, areas) of arrays containing the violations.
+    """
+    labels = polygons.components(*_touching(polygons, np.ones(len(polygons), dtype=bool)))
+    totals = np.bincount(labels, weights=geometry.ring_areas(polygons.vertices, polygons.offsets),
+                         minlength=len(polygons))
+    if new is None:
+        new = polygons.new
+    new_labels = np.unique(labels[new])
+    small = new_labels[totals[new_labels] < area]
+    return polygons.vertices[polygons.offsets[small]], totals[small]
+
+
+def check(cell, rules, elements=None):
+    """
+    Check the shapes drawn directly in the given cell against the given rules.
+
+    :param cell: a wrapper.Cell object.
+    :param rules: an iterable of Rule objects.
+    :param elements: if not None, an iterable of Element objects in the cell, such as those returned by
+        path.Path.draw() with incremental=True; only violations that involve at least one of these elements are
+        reported.
+    :return: a list of Violation objects, grouped by rule in the given order.
+    """
+    table = cell.element_table()
+    if elements is None:
+        new_rows = None
+    else:
+        new_rows = table.element_rows(elements)
+    grid = cell.drawing.grid
+    layers = {}
+
+    def polygons(layer, all_new=False):
+        key = (layer, all_new or new_rows is None)
+        if key not in layers:
+            layers[key] = _Polygons(table, layer, None if key[1] else new_rows)
+        return layers[key]
+
+    violations = []
+    for rule in rules:
+        value = rule.value / grid
+        value_scale = grid
+        if rule.kind == WIDTH:
+            locations, values = min_width(polygons(rule.layer), value)
+        elif rule.kind == SPACING:
+            locations, values = min_spacing(polygons(rule.layer), value)
+        elif rule.kind == ENCLOSURE:
+            # A new outer shape can cause violations by any inner shape near it, so all pairs are measured and the
+            # violations that are not near a new shape on either layer are discarded.
+            outer = polygons(rule.layer)
+            inner = polygons(rule.inner_layer)
+            locations, values = min_enclosure(polygons(rule.layer, all_new=True),
+                                              polygons(rule.inner_layer, all_new=True), value)
+            if new_rows is not None:
+                boxes = np.vstack((outer.boxes[outer.new], inner.boxes[inner.new]))
+                point_i, box_j = spatial.box_pairs(np.hstack((locations, locations)), boxes, margin=value)
+                keep = np.unique(point_i)
+                locations = locations[keep]
+                values = values[keep]
+        elif rule.kind == AREA:
+            value = rule.value / grid ** 2
+            value_scale = grid ** 2
+            # Every polygon contributes to the area of its group, not only the polygons near new shapes.
+            locations, values = min_area(polygons(rule.layer, all_new=True), value, new=polygons(rule.layer).new)
+        else:
+            raise ValueError("Unknown rule kind: {}".format(rule.kind))
+        violations.extend(_violations(rule.kind, rule.layer, locations, values, grid, value_scale))
+    return violations
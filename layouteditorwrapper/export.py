@@ -0,0 +1,267 @@
+"""
+This module exports the geometry of a cell, or of a cell and every cell that it references, as columnar arrays for
+offline analysis with vectorized tools.
+
+export() builds one ElementTable (see wrapper.py) for each distinct cell and concatenates them into a Geometry tuple
+with one row per element: the index of the cell that contains it, its index in that cell, its type, layer, data type,
+width, and cap, and for cell references the index of the referenced cell and the transformation. The points of all
+elements are stored in the concatenated format described in geometry.py, in integer database units. The hierarchy is
+not flattened: each cell is exported once, however many times it is referenced, and the references record where its
+instances are.
+
+The arrays can be saved to an uncompressed .npz file, which load_npz() memory-maps back without copying, or, if pyarrow
+is installed, to Arrow IPC files, which pyarrow also memory-maps, and to Parquet files. In the Arrow tables each row is
+an element and the points are stored as lists of x- and y-coordinates.
+
+Example:
+    export.save_npz('chip.npz', export.export(top, hierarchy=True))
+    geometry = export.load_npz('chip.npz')
+    rows = np.flatnonzero(geometry.layers == 3)
+"""
+from __future__ import division
+
+import struct
+import zipfile
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import geometry
+
+# The columns of a Geometry, each of which is an array; the other fields are scalars and the list of cell names.
+COLUMNS = ('cells', 'element_ids', 'types', 'layers', 'data_types', 'widths', 'caps', 'targets', 'repeats', 'angles',
+           'scales', 'mirrors', 'offsets', 'points')
+
+Geometry = namedtuple('Geometry', ('cell_names', 'user_unit', 'database_unit') + COLUMNS)
+Geometry.__doc__ = """
+The geometry of one or more cells in columnar form; see the module docstring. The cell_names list contains the name of
+each exported cell, with the exported cell first, and user_unit and database_unit are the units of the drawing. Each
+column except offsets and points has one row per element:
+cells: the index in cell_names of the cell that contains the element.
+element_ids: the index of the element in its cell, which is its row in the ElementTable of the cell.
+types, layers, data_types, widths, caps, repeats, angles, scales, mirrors: the columns of the ElementTable rows.
+targets: the index in cell_names of the cell referenced by a cell reference or cell reference array, and -1 for the
+    other elements.
+offsets: the offsets into points, with one more entry than the number of elements.
+points: an integer array with shape (N, 2) containing the points of all elements, in database units.
+"""
+
+# The local file header of a zip archive member has this many bytes before the file name and extra field.
+_ZIP_HEADER_SIZE = 30
+
+
+def export(cell, hierarchy=False, coordinate_dtype=np.int32):
+    """
+    Export the elements of the given cell, and optionally of all of the cells it references, as columnar arrays.
+
+    :param cell: a wrapper.Cell.
+    :param hierarchy: if True, also export every cell referenced by this cell, recursively, each once.
+    :param coordinate_dtype: the integer data type of the points; the default of 32-bit integers is large enough for
+        every coordinate that pylayout can store.
+    :return: a Geometry tuple.
+    """
+    tables = OrderedDict([(cell.name, cell.element_table())])
+    pending = [cell.name]
+    while hierarchy and pending:
+        for row, child in tables[pending.pop()].references():
+            if child.name not in tables:
+                tables[child.name] = child.element_table()
+                pending.append(child.name)
+    indices = dict((name, index) for index, name in enumerate(tables))
+    columns = dict((name, []) for name in COLUMNS if name != 'offsets')
+    for index, table in enumerate(tables.values()):
+        columns['cells'].append(np.full(len(table), index, dtype=np.int32))
+        columns['element_ids'].append(np.arange(len(table), dtype=np.int64))
+        columns['targets'].append(np.array([-1 if name is None else indices.get(name, -1) for name in table.cell_names],
+                                           dtype=np.int32))
+        for name in ('types', 'layers', 'data_types', 'widths', 'caps', 'repeats', 'angles', 'scales', 'mirrors',
+                     'points'):
+            columns[name].append(getattr(table, name))
+    dtypes = {'layers': np.int32, 'data_types': np.int32, 'repeats': np.int32, 'points': coordinate_dtype}
+    arrays = {}
+    for name, parts in columns.items():
+        arrays[name] = np.concatenate(parts).astype(dtypes.get(name, parts[0].dtype), copy=False)
+    arrays['offsets'] = geometry.offsets_from_counts(np.concatenate([np.diff(table.offsets)
+                                                                     for table in tables.values()]))
+    drawing = cell.drawing
+    return Geometry(cell_names=list(tables), user_unit=drawing.user_unit, database_unit=drawing.database_unit,
+                    **arrays)
+
+
+def save_npz(filename, geometry_):
+    """
+    Save the given geometry to an uncompressed .npz file, which load_npz() can memory-map.
+
+    :param filename: the name of the file, or a binary file-like object.
+    :param geometry_: a Geometry tuple.
+    :return: None
+    """
+    arrays = dict((name, np.asarray(getattr(geometry_, name))) for name in COLUMNS)
+    arrays['cell_names'] = np.array(geometry_.cell_names, dtype=np.str_).reshape(-1)
+    arrays['units'] = np.array([geometry_.user_unit, geometry_.database_unit], dtype=np.float64)
+    np.savez(filename, **arrays)
+
+
+def _npz_members(filename, mmap):
+    """
+    Return a dict of the arrays in the given .npz file, memory-mapping each uncompressed member if mmap is True.
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+            f.seek(info.header_offset + _ZIP_HEADER_SIZE - 4)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + _ZIP_HEADER_SIZE + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError("Member {} of {} contains Python objects.".format(name, filename))
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def load_npz(filename, mmap=True):
+    """
+    Load a geometry saved by save_npz().
+
+    :param filename: the name of the file.
+    :param mmap: if True, the columns are read-only memory maps of the file, so they are read from disk only when used;
+        this requires the file to be uncompressed, as save_npz() writes it. If False, the columns are read into memory.
+    :return: a Geometry tuple.
+    """
+    arrays = _npz_members(filename, mmap)
+    user_unit, database_unit = np.asarray(arrays.pop('units')).tolist()
+    return Geometry(cell_names=[str(name) for name in arrays.pop('cell_names')], user_unit=user_unit,
+                    database_unit=database_unit, **dict((name, arrays[name]) for name in COLUMNS))
+
+
+def to_arrow(geometry_):
+    """
+    Convert the given geometry to a pyarrow.Table with one row per element. The cell and target columns contain cell
+    names, the points are in the list columns x and y, and the units are stored in the schema metadata.
+
+    :param geometry_: a Geometry tuple.
+    :return: a pyarrow.Table.
+    :raises ImportError: if pyarrow is not installed.
+    """
+    import pyarrow as pa
+    names = pa.array(geometry_.cell_names, type=pa.string())
+    offsets = np.asarray(geometry_.offsets)
+    if offsets[-1] > np.iinfo(np.int32).max:
+        list_array, offsets = pa.LargeListArray, pa.array(offsets.astype(np.int64))
+    else:
+        list_array, offsets = pa.ListArray, pa.array(offsets.astype(np.int32))
+    points = np.asarray(geometry_.points)
+    targets = np.asarray(geometry_.targets)
+    repeats = np.asarray(geometry_.repeats)
+    columns = OrderedDict([
+        ('cell', pa.DictionaryArray.from_arrays(pa.array(np.asarray(geometry_.cells, dtype=np.int32)), names)),
+        ('element_id', pa.array(np.asarray(geometry_.element_ids))),
+        ('type', pa.array(np.asarray(geometry_.types))),
+        ('layer', pa.array(np.asarray(geometry_.layers))),
+        ('data_type', pa.array(np.asarray(geometry_.data_types))),
+        ('width', pa.array(np.asarray(geometry_.widths))),
+        ('cap', pa.array(np.asarray(geometry_.caps))),
+        ('target', pa.DictionaryArray.from_arrays(pa.array(targets.astype(np.int32), mask=targets < 0), names)),
+        ('repeat_x', pa.array(np.ascontiguousarray(repeats[:, 0]))),
+        ('repeat_y', pa.array(np.ascontiguousarray(repeats[:, 1]))),
+        ('angle', pa.array(np.asarray(geometry_.angles))),
+        ('scale', pa.array(np.asarray(geometry_.scales))),
+        ('mirror_x', pa.array(np.asarray(geometry_.mirrors))),
+        ('x', list_array.from_arrays(offsets, pa.array(np.ascontiguousarray(points[:, 0])))),
+        ('y', list_array.from_arrays(offsets, pa.array(np.ascontiguousarray(points[:, 1])))),
+    ])
+    metadata = {'user_unit': repr(geometry_.user_unit), 'database_unit': repr(geometry_.database_unit),
+                'cell_names': '\n'.join(geometry_.cell_names)}
+    return pa.Table.from_arrays(list(columns.values()), names=list(columns)).replace_schema_metadata(metadata)
+
+
+def from_arrow(table):
+    """
+    Convert a table created by to_arrow() back to a Geometry. The numeric columns are views of the Arrow buffers where
+    possible, so a memory-mapped table is not copied.
+
+    :param table: a pyarrow.Table.
+    :return: a Geometry tuple.
+    """
+    metadata = dict((key.decode(), value.decode()) for key, value in table.schema.metadata.items())
+    cell_names = metadata['cell_names'].split('\n') if metadata['cell_names'] else []
+    indices = dict((name, index) for index, name in enumerate(cell_names))
+
+    def column(name):
+        return table.column(name).combine_chunks()
+
+    def numbers(name):
+        return column(name).to_numpy(zero_copy_only=False)
+
+    def name_indices(name):
+        array = column(name)
+        lookup = np.array([indices[value] for value in array.dictionary.to_pylist()] + [-1], dtype=np.int32)
+        return lookup[array.indices.fill_null(-1).to_numpy(zero_copy_only=False)]
+
+    x = column('x')
+    offsets = x.offsets.to_numpy().astype(np.int64)
+    used = slice(offsets[0], offsets[-1])
+    points = np.column_stack((x.values.to_numpy()[used], column('y').values.to_numpy()[used]))
+    offsets -= offsets[0]
+    return Geometry(cell_names=cell_names, user_unit=float(metadata['user_unit']),
+                    database_unit=float(metadata['database_unit']), cells=name_indices('cell'),
+                    element_ids=numbers('element_id'), types=numbers('type'), layers=numbers('layer'),
+                    data_types=numbers('data_type'), widths=numbers('width'), caps=numbers('cap'),
+                    targets=name_indices('target'), repeats=np.column_stack((numbers('repeat_x'), numbers('repeat_y'))),
+                    angles=numbers('angle'), scales=numbers('scale'), mirrors=numbers('mirror_x'), offsets=offsets,
+                    points=points)
+
+
+def save_arrow(filename, geometry_):
+    """
+    Save the given geometry to an uncompressed Arrow IPC file, which load_arrow() can memory-map.
+
+    :param filename: the name of the file.
+    :param geometry_: a Geometry tuple.
+    :return: None
+    """
+    import pyarrow as pa
+    table = to_arrow(geometry_)
+    with pa.OSFile(filename, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def load_arrow(filename, mmap=True):
+    """
+    Load a geometry saved by save_arrow().
+
+    :param filename: the name of the file.
+    :param mmap: if True, memory-map the file, so that the columns are read from disk only when used.
+    :return: a Geometry tuple.
+    """
+    import pyarrow as pa
+    source = pa.memory_map(filename, 'r') if mmap else pa.OSFile(filename, 'rb')
+    with source:
+        return from_arrow(pa.ipc.open_file(source).read_all())
+
+
+def save_parquet(filename, geometry_, **kwargs):
+    """
+    Save the given geometry to a Parquet file, which can be read with pyarrow.parquet.read_table() and from_arrow().
+
+    :param filename: the name of the file.
+    :param geometry_: a Geometry tuple.
+    :param kwargs: keyword arguments for pyarrow.parquet.write_table(), such as compression.
+    :return: None
+    """
+    import pyarrow.parquet as pq
+    pq.write_table(to_arrow(geometry_), filename, **kwargs)
@@ -0,0 +1,207 @@
+"""
+This module splits polygons into trapezoids, or into pieces with a limited number of vertices, for export.
+
+GDSII limits a boundary to 8191 points, and many mask writers accept only much smaller polygons or trapezoids. The
+polygons are fractured by a slab decomposition: the horizontal lines through all of the vertices of a polygon divide it
+into slabs, and within each slab the edges that cross it are sorted by position and paired, using the even-odd rule,
+into trapezoids with horizontal top and bottom sides. A trapezoid is joined to the one above it when each is the only
+trapezoid that the other touches, which gives strips that are monotone in y, and each strip is cut into pieces that have
+at most the given number of vertices. Vertices that are collinear with their neighbors are removed, so a rectangle is
+always a single four-vertex piece and a circle with fewer vertices than the limit is a single piece.
+
+All of the polygons are processed together with whole-array operations. For the polygons drawn by this package, such
+as circles, annuli, and path outlines, each edge crosses only a few slabs, so the time is linear in the number of
+vertices. The new vertices along the cuts are shared exactly by the pieces on either side, so the pieces tile the
+original polygon without gaps when they are rounded to integers.
+"""
+from __future__ import division
+
+import numpy as np
+
+from . import geometry
+
+
+def _slab_trapezoids(vertices, offsets, groups=None):
+    """
+    Return the trapezoids of the slab decomposition of the given rings, using the even-odd rule.
+
+    :param groups: if not None, an integer array containing the index of the polygon to which each ring belongs.
+
+    :return: a tuple (owners, levels, y0, y1, left0, right0, left1, right1) of arrays with one entry per trapezoid,
+        sorted by level and then by x, where levels is a global index of the slab bottom that increases with y within
+        each ring, y0 and y1 are the bottom and top, and left0, right0, left1, right1 are the x-coordinates of the
+        bottom-left, bottom-right, top-left, and top-right corners.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    owners = geometry.shape_indices(offsets)
+    if groups is not None:
+        owners = np.asarray(groups)[owners]
+    # Assign each vertex the index of its y-value among the sorted distinct y-values of its ring.
+    order = np.lexsort((vertices[:, 1], owners))
+    sorted_owners = owners[order]
+    sorted_y = vertices[order, 1]
+    new_level = np.concatenate(([True], (sorted_owners[1:] != sorted_owners[:-1]) | (sorted_y[1:] != sorted_y[:-1])))
+    level_of_sorted = np.cumsum(new_level) - 1
+    vertex_levels = np.empty(vertices.shape[0], dtype=np.int64)
+    vertex_levels[order] = level_of_sorted
+    level_y = sorted_y[new_level]
+    # Edge k runs from vertex k to the next vertex of the same ring.
+    following = np.arange(1, vertices.shape[0] + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    low = np.minimum(vertex_levels, vertex_levels[following])
+    high = np.maximum(vertex_levels, vertex_levels[following])
+    levels, edges = geometry.expand_ranges(low, high)
+    a = vertices[edges]
+    b = vertices[following[edges]]
+    y0 = level_y[levels]
+    y1 = level_y[levels + 1]
+
+    x0 = geometry.segment_x_at(a, b, y0)
+    x1 = geometry.segment_x_at(a, b, y1)
+    crossing_order = np.lexsort((x0 + x1, levels))
+    left = crossing_order[0::2]
+    right = crossing_order[1::2]
+    return (owners[edges[left]], levels[left], y0[left], y1[left], x0[left], x0[right], x1[left], x1[right])
+
+
+def _strip_predecessors(levels, left0, right0, left1, right1):
+    """
+    Link each trapezoid to the trapezoid in the previous slab below it, if each of the two is the only trapezoid that
+    the other overlaps along the line between the slabs. The linked trapezoids form y-monotone strips, which are simple
+    polygons.
+
+    :return: an integer array containing, for each trapezoid, the index of the trapezoid linked below it, or its own
+        index if there is none.
+    """
+    count = levels.size
+    # Replace each x-coordinate by its rank, so that (level, x) pairs can be compared as single integer keys.
+    xs = np.unique(np.concatenate((left0, right0, left1, right1)))
+
+    def keys(level, x):
+        return level * xs.size + np.searchsorted(xs, x)
+
+    # The trapezoids are sorted by level and then by x, and do not overlap within a slab, so all of these are sorted.
+    bottom_left = keys(levels, left0)
+    bottom_right = keys(levels, right0)
+    top_left = keys(levels + 1, left1)
+    top_right = keys(levels + 1, right1)
+    # The trapezoids above each top side are those whose bottom side ends after it starts and starts before it ends.
+    above = np.searchsorted(bottom_right, top_left, side='right')
+    above_count = np.searchsorted(bottom_left, top_right, side='left') - above
+    below = np.searchsorted(top_right, bottom_left, side='right')
+    below_count = np.searchsorted(top_left, bottom_right, side='left') - below
+    lower = np.flatnonzero(above_count == 1)
+    lower = lower[below_count[above[lower]] == 1]
+    predecessors = np.arange(count)
+    predecessors[above[lower]] = lower
+    return predecessors
+
+
+def _simplify(vertices, offsets):
+    """
+    Remove repeated vertices and vertices that are collinear with their neighbors from each ring.
+    """
+    for collinear in (False, True):
+        owners = geometry.shape_indices(offsets)
+        # A ring can become empty after its repeated vertices are removed.
+        nonempty = np.diff(offsets) > 0
+        starts = offsets[:-1][nonempty]
+        stops = offsets[1:][nonempty]
+        following = np.arange(1, vertices.shape[0] + 1)
+        following[stops - 1] = starts
+        preceding = np.arange(-1, vertices.shape[0] - 1)
+        preceding[starts] = stops - 1
+        if collinear:
+            before = vertices - vertices[preceding]
+            after = vertices[following] - vertices
+            keep = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0] != 0
+        else:
+            keep = np.any(vertices != vertices[following], axis=1)
+        vertices = vertices[keep]
+        offsets = geometry.offsets_from_counts(np.bincount(owners[keep], minlength=offsets.size - 1))
+    return vertices, offsets
+
+
+def fracture(vertices, offsets, max_vertices=4, groups=None):
+    """
+    Split the given rings into pieces with at most the given number of vertices, using the slab decomposition
+    described in the module docstring. Every ring is fractured, even if it is already small enough; see split().
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M closed shapes.
+    :param max_vertices: the maximum number of vertices in each piece, which must be at least 4; the default produces
+        trapezoids, some of which may be triangles.
+    :param groups: if not None, an integer array containing, for each ring, the index of the polygon to which it
+        belongs, so that a polygon with holes can be given as its outer ring and its hole rings.
+    :return: a tuple (vertices, offsets, sources) in which sources contains the index of the ring, or of the polygon if
+        groups is given, from which each piece was cut, in increasing order.
+    """
+    if max_vertices < 4:
+        raise ValueError("Pieces must be allowed at least 4 vertices.")
+    owners, levels, y0, y1, left0, right0, left1, right1 = _slab_trapezoids(vertices, offsets, groups)
+    predecessors = _strip_predecessors(levels, left0, right0, left1, right1)
+    # Pointer doubling finds the bottom trapezoid of each strip in a logarithmic number of steps.
+    roots = predecessors
+    while True:
+        next_roots = roots[roots]
+        if np.array_equal(next_roots, roots):
+            break
+        roots = next_roots
+    # Each trapezoid adds its two top corners to a strip, and its bottom corners where they differ from the top corners
+    # of the trapezoid below. A piece has the four corners of its first trapezoid and the corners added by the others,
+    # so cutting the running total of the added corners into intervals of max_vertices - 3 respects the limit.
+    added = 2 + (left0 != left1[predecessors]) + (right0 != right1[predecessors])
+    order = np.lexsort((levels, roots, owners))
+    owners, y0, y1, left0, right0, left1, right1, roots, added = [
+        array[order] for array in (owners, y0, y1, left0, right0, left1, right1, roots, added)]
+    new_strip = np.concatenate(([True], roots[1:] != roots[:-1]))
+    totals = np.cumsum(added)
+    strip_starts = np.flatnonzero(new_strip)
+    totals -= (totals[strip_starts] - added[strip_starts])[np.cumsum(new_strip) - 1]
+    pieces = (totals - 1) // (max_vertices - 3)
+    starts = np.flatnonzero(new_strip | np.concatenate(([True], pieces[1:] != pieces[:-1])))
+    counts = np.diff(np.append(starts, owners.size))
+    piece_of = np.repeat(np.arange(starts.size), counts)
+    position = np.arange(owners.size) - starts[piece_of]
+    vertex_offsets = geometry.offsets_from_counts(4 * counts)
+    base = vertex_offsets[piece_of]
+    result = np.empty((vertex_offsets[-1], 2))
+    # The left side runs up through the left corners, then the right side runs down through the right corners.
+    result[base + 2 * position] = np.column_stack((left0, y0))
+    result[base + 2 * position + 1] = np.column_stack((left1, y1))
+    right = base + 4 * counts[piece_of] - 2 * position - 2
+    result[right] = np.column_stack((right1, y1))
+    result[right + 1] = np.column_stack((right0, y0))
+    result, vertex_offsets = _simplify(result, vertex_offsets)
+    return result, vertex_offsets, owners[starts]
+
+
+def split(vertices, offsets, max_vertices):
+    """
+    Return the given rings with every ring that has more than the given number of vertices fractured into smaller
+    pieces; rings within the limit are unchanged. A final vertex that repeats the first is not counted.
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M closed shapes.
+    :param max_vertices: the maximum number of vertices in each piece, which must be at least 4.
+    :return: a tuple (vertices, offsets, sources) in which sources contains the index of the ring from which each piece
+        came, in increasing order.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    counts = np.diff(offsets)
+    nonempty = counts > 0
+    closed = np.zeros(counts.size, dtype=bool)
+    closed[nonempty] = np.all(vertices[offsets[1:][nonempty] - 1] == vertices[offsets[:-1][nonempty]], axis=1)
+    large = np.flatnonzero((counts - (closed & (counts > 1))) > max_vertices)
+    small = np.setdiff1d(np.arange(counts.size), large)
+    if not large.size:
+        return vertices, np.asarray(offsets), np.arange(counts.size)
+    small_vertices, small_offsets = geometry.select(vertices, offsets, small)
+    large_vertices, large_offsets = geometry.select(vertices, offsets, large)
+    pieces, piece_offsets, sources = fracture(large_vertices, large_offsets, max_vertices)
+    all_vertices = np.concatenate((small_vertices, pieces))
+    all_offsets = np.concatenate((small_offsets, small_offsets[-1] + piece_offsets[1:]))
+    all_sources = np.concatenate((small, large[sources]))
+    order = np.argsort(all_sources, kind='stable')
+    result, result_offsets = geometry.select(all_vertices, all_offsets, order)
+    return result, result_offsets, all_sources[order]
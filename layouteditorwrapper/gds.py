@@ -0,0 +1,282 @@
+"""
+This module contains a minimal GDSII stream writer that does not depend on pylayout.
+
+The writer emits records in the order they are requested, so a library can be written one structure (cell) at a time
+without holding the whole design in memory. All coordinates are integer database units.
+
+See the GDSII stream format specification for the meaning of the records; only the records needed to represent the
+elements in wrapper.py are implemented.
+"""
+from __future__ import division
+
+import struct
+import time
+
+import numpy as np
+
+from . import fracture, geometry
+
+# Record types, including the data type in the low byte.
+HEADER = 0x0002
+BGNLIB = 0x0102
+LIBNAME = 0x0206
+UNITS = 0x0305
+ENDLIB = 0x0400
+BGNSTR = 0x0502
+STRNAME = 0x0606
+ENDSTR = 0x0700
+BOUNDARY = 0x0800
+PATH = 0x0900
+SREF = 0x0A00
+AREF = 0x0B00
+TEXT = 0x0C00
+LAYER = 0x0D02
+DATATYPE = 0x0E02
+WIDTH = 0x0F03
+XY = 0x1003
+ENDEL = 0x1100
+SNAME = 0x1206
+COLROW = 0x1302
+TEXTTYPE = 0x1602
+STRING = 0x1906
+STRANS = 0x1A01
+MAG = 0x1B05
+ANGLE = 0x1C05
+PATHTYPE = 0x2102
+
+# The XY record of a boundary may contain at most this many points, including the closing point.
+MAX_BOUNDARY_POINTS = 8191
+
+# The XY record of a path may contain at most this many points.
+MAX_PATH_POINTS = 8191
+
+# The largest and smallest coordinates that fit in the four-byte signed integers of an XY record.
+MAX_COORDINATE = 2 ** 31 - 1
+MIN_COORDINATE = -2 ** 31
+
+
+def real8(value):
+    """
+    Encode a float in the eight-byte excess-64 base-16 format used by GDSII.
+
+    :param value: a float.
+    :return: a bytes object of length 8.
+    """
+    if value == 0:
+        return b'\x00' * 8
+    sign = 0x80 if value < 0 else 0
+    value = abs(float(value))
+    exponent = 64
+    while value >= 1:
+        value /= 16
+        exponent += 1
+    while value < 1 / 16:
+        value *= 16
+        exponent -= 1
+    mantissa = int(round(value * 2 ** 56))
+    if mantissa >= 2 ** 56:  # Rounding carried into the next hexadecimal digit.
+        mantissa //= 16
+        exponent += 1
+    return struct.pack('>Q', ((sign | exponent) << 56) | mantissa)
+
+
+def _timestamp():
+    now = time.localtime()
+    fields = (now.tm_year, now.tm_mon, now.tm_mday, now.tm_hour, now.tm_min, now.tm_sec)
+    return fields + fields  # Modification time and access time.
+
+
+class Writer(object):
+    """Write a GDSII stream file one record at a time."""
+
+    def __init__(self, stream_or_filename, library_name='LIB', user_unit=0.001, database_unit=1e-9,
+                 max_vertices=MAX_BOUNDARY_POINTS - 1):
+        """
+        Create a writer and write the library header.
+
+        :param stream_or_filename: a binary file-like object, or a filename to open for writing.
+        :param library_name: the name of the library.
+        :param user_unit: the size of the database unit in user units, which is Drawing.user_unit.
+        :param database_unit: the size of the database unit in meters, which is Drawing.database_unit.
+        :param max_vertices: boundaries with more vertices than this, not counting the closing point, are fractured
+            into smaller boundaries; see fracture.split(). It must be at least 4 and less than MAX_BOUNDARY_POINTS.
+        """
+        if not 4 <= max_vertices < MAX_BOUNDARY_POINTS:
+            raise ValueError("max_vertices must be at least 4 and less than {}.".format(MAX_BOUNDARY_POINTS))
+        self.max_vertices = max_vertices
+        if hasattr(stream_or_filename, 'write'):
+            self.stream = stream_or_filename
+            self._owns_stream = False
+        else:
+            self.stream = open(stream_or_filename, 'wb')
+            self._owns_stream = True
+        self._in_structure = False
+        self.closed = False
+        self._record(HEADER, struct.pack('>h', 600))
+        self._record(BGNLIB, struct.pack('>12h', *_timestamp()))
+        self._string(LIBNAME, library_name)
+        self._record(UNITS, real8(user_unit) + real8(database_unit))
+
+    def _record(self, record_type, data=b''):
+        length = 4 + len(data)
+        if length > 0xFFFF:
+            raise ValueError("Record is too long: {} bytes.".format(length))
+        self.stream.write(struct.pack('>HH', length, record_type))
+        self.stream.write(data)
+
+    def _string(self, record_type, string):
+        data = str(string).encode('ascii')
+        if len(data) % 2:
+            data += b'\x00'
+        self._record(record_type, data)
+
+    def _xy(self, points):
+        points = np.asarray(points).reshape(-1, 2)
+        if points.size and (points.max() > MAX_COORDINATE or points.min() < MIN_COORDINATE):
+            raise OverflowError("Coordinates do not fit in four-byte integers.")
+        self._record(XY, points.astype('>i4').tobytes())
+
+    def _layer(self, layer, data_type_record, data_type):
+        self._record(LAYER, struct.pack('>h', int(layer)))
+        self._record(data_type_record, struct.pack('>h', int(data_type)))
+
+    def _transformation(self, angle, scale, mirror_x):
+        if angle or scale != 1 or mirror_x:
+            self._record(STRANS, struct.pack('>H', 0x8000 if mirror_x else 0))
+            if scale != 1:
+                self._record(MAG, real8(scale))
+            if angle:
+                self._record(ANGLE, real8(angle))
+
+    def begin_structure(self, name):
+        """
+        Begin a structure, which corresponds to a cell. All elements are written into the current structure.
+
+        :param name: the name of the structure.
+        """
+        if self._in_structure:
+            raise RuntimeError("The previous structure has not been ended.")
+        self._record(BGNSTR, struct.pack('>12h', *_timestamp()))
+        self._string(STRNAME, name)
+        self._in_structure = True
+
+    def end_structure(self):
+        """End the current structure."""
+        if not self._in_structure:
+            raise RuntimeError("There is no structure to end.")
+        self._record(ENDSTR)
+        self._in_structure = False
+
+    def boundary(self, layer, data_type, points):
+        """
+        Write a boundary, which is a polygon. The polygon is closed if the last point differs from the first. A polygon
+        with more than max_vertices vertices is written as several boundaries whose vertices are rounded to integers.
+
+        :param layer: the layer number.
+        :param data_type: the data type number.
+        :param points: an integer array with shape (N, 2).
+        """
+        points = np.asarray(points).reshape(-1, 2)
+        if points.shape[0] and np.any(points[0] != points[-1]):
+            points = np.vstack((points, points[:1]))
+        if points.shape[0] > self.max_vertices + 1:
+            vertices, offsets, _ = fracture.split(points[:-1], np.array([0, points.shape[0] - 1]), self.max_vertices)
+            vertices = np.round(vertices).astype(np.int64)
+            for start, stop in zip(offsets[:-1], offsets[1:]):
+                self._boundary(layer, data_type, np.vstack((vertices[start:stop], vertices[start:start + 1])))
+        else:
+            self._boundary(layer, data_type, points)
+
+    def _boundary(self, layer, data_type, points):
+        self._record(BOUNDARY)
+        self._layer(layer, DATATYPE, data_type)
+        self._xy(points)
+        self._record(ENDEL)
+
+    def path(self, layer, data_type, points, width, cap=0):
+        """
+        Write a path.
+
+        :param layer: the layer number.
+        :param data_type: the data type number.
+        :param points: an integer array with shape (N, 2) containing the center line.
+        :param width: the integer width of the path.
+        :param cap: the path type, which is the same as the pylayout cap code.
+        """
+        if len(points) > MAX_PATH_POINTS:
+            # The outline is written instead, and fractured by boundary(); a round cap is written as an extended cap.
+            self.boundary(layer, data_type, geometry.path_outline(points, width, cap))
+            return
+        self._record(PATH)
+        self._layer(layer, DATATYPE, data_type)
+        self._record(PATHTYPE, struct.pack('>h', int(cap)))
+        self._record(WIDTH, struct.pack('>i', int(width)))
+        self._xy(points)
+        self._record(ENDEL)
+
+    def reference(self, name, origin, angle=0, scale=1, mirror_x=False):
+        """
+        Write a structure reference, which corresponds to a Cellref.
+
+        :param name: the name of the referenced structure.
+        :param origin: the integer origin point.
+        :param angle: the rotation angle in degrees.
+        :param scale: the magnification.
+        :param mirror_x: if True, reflect about the x-axis before rotating.
+        """
+        self._record(SREF)
+        self._string(SNAME, name)
+        self._transformation(angle, scale, mirror_x)
+        self._xy([origin])
+        self._record(ENDEL)
+
+    def array_reference(self, name, points, columns, rows, angle=0, scale=1, mirror_x=False):
+        """
+        Write an array reference, which corresponds to a CellrefArray.
+
+        :param name: the name of the referenced structure.
+        :param points: an integer array with shape (3, 2) containing the origin, the origin displaced by all of the
+            columns, and the origin displaced by all of the rows.
+        :param columns: the number of columns.
+        :param rows: the number of rows.
+        :param angle: the rotation angle in degrees.
+        :param scale: the magnification.
+        :param mirror_x: if True, reflect about the x-axis before rotating.
+        """
+        self._record(AREF)
+        self._string(SNAME, name)
+        self._transformation(angle, scale, mirror_x)
+        self._record(COLROW, struct.pack('>hh', int(columns), int(rows)))
+        self._xy(points)
+        self._record(ENDEL)
+
+    def text(self, layer, text_type, origin, string, height=0):
+        """
+        Write a text element.
+
+        :param layer: the layer number.
+        :param text_type: the text type number.
+        :param origin: the integer origin point.
+        :param string: the text.
+        :param height: the integer text height; if 0, no height is written.
+        """
+        self._record(TEXT)
+        self._layer(layer, TEXTTYPE, text_type)
+        if height:
+            self._record(WIDTH, struct.pack('>i', int(height)))
+        self._xy([origin])
+        self._string(STRING, string)
+        self._record(ENDEL)
+
+    def close(self):
+        """Write the end of the library and close the file if this writer opened it."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._in_structure:
+            self.end_structure()
+        self._record(ENDLIB)
+        if self._owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
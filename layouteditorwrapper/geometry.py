@@ -0,0 +1,357 @@
+"""
+This module contains vectorized functions that operate on many shapes at once.
+
+Instead of a list of point lists, the functions in this module use the *concatenated* format: the vertices of all
+shapes are stacked into a single array with shape (N, 2), and an integer array of offsets with length M + 1 marks where
+each of the M shapes begins and ends, so that the vertices of shape i are vertices[offsets[i]:offsets[i + 1]]. This
+allows reductions over all shapes in a cell to happen in a few numpy calls instead of a Python loop over elements.
+
+A *ring* is the vertex list of a closed shape, such as a polygon; the closing segment from the last vertex back to the
+first is implied, so rings that repeat the first vertex at the end are also handled correctly. A *line* is the vertex
+list of an open shape, such as the center line of a path.
+"""
+from __future__ import division
+
+import numpy as np
+
+
+def offsets_from_counts(counts):
+    """
+    Return the offsets array corresponding to the given numbers of vertices per shape.
+
+    :param counts: an iterable of integers that are the numbers of vertices in each shape.
+    :return: an integer array with length len(counts) + 1 that starts with 0.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.zeros(counts.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def concatenate(point_lists):
+    """
+    Convert a sequence of point lists to the concatenated format.
+
+    :param point_lists: an iterable of point lists, each of which can be converted to an array with shape (n, 2).
+    :return: a tuple (vertices, offsets).
+    """
+    arrays = [np.asarray(points, dtype=np.float64).reshape(-1, 2) for points in point_lists]
+    offsets = offsets_from_counts([a.shape[0] for a in arrays])
+    if arrays:
+        vertices = np.concatenate(arrays)
+    else:
+        vertices = np.empty((0, 2))
+    return vertices, offsets
+
+
+def shape_indices(offsets):
+    """
+    :param offsets: the offsets array of M shapes.
+    :return: an integer array with one entry per vertex that is the index of the shape containing that vertex.
+    """
+    return np.repeat(np.arange(offsets.size - 1), np.diff(offsets))
+
+
+def select(vertices, offsets, indices):
+    """
+    Return the given shapes, in the given order, in the concatenated format.
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M shapes.
+    :param indices: an integer array of the indices of the shapes to select.
+    :return: a tuple (vertices, offsets) containing only the selected shapes.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    counts = offsets[indices + 1] - offsets[indices]
+    selected_offsets = offsets_from_counts(counts)
+    positions = np.arange(selected_offsets[-1]) + np.repeat(offsets[indices] - selected_offsets[:-1], counts)
+    return np.asarray(vertices)[positions], selected_offsets
+
+
+def segments(vertices, offsets, closed):
+    """
+    Return the start and end vertices of every segment of every shape, along with the index of the shape to which each
+    segment belongs.
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M shapes.
+    :param closed: if True, include the closing segment of each shape, from its last vertex to its first.
+    :return: a tuple (starts, ends, owners) of arrays with shapes (K, 2), (K, 2), and (K,).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    counts = np.diff(offsets)
+    indices = shape_indices(offsets)
+    same = indices[:-1] == indices[1:]
+    starts = vertices[:-1][same]
+    ends = vertices[1:][same]
+    owners = indices[:-1][same]
+    if closed:
+        nonempty = np.flatnonzero(counts > 0)
+        starts = np.concatenate((starts, vertices[offsets[nonempty + 1] - 1]))
+        ends = np.concatenate((ends, vertices[offsets[nonempty]]))
+        owners = np.concatenate((owners, nonempty))
+    return starts, ends, owners
+
+
+def line_lengths(vertices, offsets):
+    """
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M open shapes.
+    :return: an array with shape (M,) containing the length of each line.
+    """
+    starts, ends, owners = segments(vertices, offsets, closed=False)
+    d = ends - starts
+    return np.bincount(owners, weights=np.hypot(d[:, 0], d[:, 1]), minlength=offsets.size - 1)
+
+
+def ring_perimeters(vertices, offsets):
+    """
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M closed shapes.
+    :return: an array with shape (M,) containing the perimeter of each ring.
+    """
+    starts, ends, owners = segments(vertices, offsets, closed=True)
+    d = ends - starts
+    return np.bincount(owners, weights=np.hypot(d[:, 0], d[:, 1]), minlength=offsets.size - 1)
+
+
+def ring_signed_areas(vertices, offsets):
+    """
+    Calculate the area of each ring using the shoelace formula. The area is positive for rings with counterclockwise
+    orientation.
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M closed shapes.
+    :return: an array with shape (M,) containing the signed area of each ring.
+    """
+    starts, ends, owners = segments(vertices, offsets, closed=True)
+    cross = starts[:, 0] * ends[:, 1] - ends[:, 0] * starts[:, 1]
+    return np.bincount(owners, weights=cross, minlength=offsets.size - 1) / 2
+
+
+def ring_areas(vertices, offsets):
+    """
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M closed shapes.
+    :return: an array with shape (M,) containing the absolute area of each ring.
+    """
+    return np.abs(ring_signed_areas(vertices, offsets))
+
+
+def box_rings(corners):
+    """
+    Convert boxes specified by two opposite corners to four-vertex rings.
+
+    :param corners: an array with shape (M, 2, 2) containing two opposite corners of each box.
+    :return: an array with shape (M, 4, 2) containing the four vertices of each box.
+    """
+    corners = np.asarray(corners)
+    (x0, y0), (x1, y1) = corners[:, 0].T, corners[:, 1].T
+    return np.stack((np.column_stack((x0, y0)), np.column_stack((x1, y0)),
+                     np.column_stack((x1, y1)), np.column_stack((x0, y1))), axis=1)
+
+
+def bounding_boxes(vertices, offsets):
+    """
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M shapes, none of which may be empty.
+    :return: an array with shape (M, 4) containing (x_min, y_min, x_max, y_max) for each shape.
+    """
+    vertices = np.asarray(vertices)
+    starts = offsets[:-1]
+    if starts.size == 0:
+        return np.empty((0, 4), dtype=vertices.dtype)
+    lower = np.minimum.reduceat(vertices, starts, axis=0)
+    upper = np.maximum.reduceat(vertices, starts, axis=0)
+    return np.hstack((lower, upper))
+
+
+def expand_ranges(starts, stops):
+    """
+    Expand a set of integer ranges into a flat array, which is a vectorized version of concatenating
+    [range(start, stop) for start, stop in zip(starts, stops)].
+
+    :param starts: an integer array with shape (M,).
+    :param stops: an integer array with shape (M,); stops[i] >= starts[i].
+    :return: a tuple (values, owners) of integer arrays, where owners contains the index of the range of each value.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    counts = np.asarray(stops, dtype=np.int64) - starts
+    total = counts.sum()
+    owners = np.repeat(np.arange(starts.size), counts)
+    first = np.zeros(starts.size, dtype=np.int64)
+    np.cumsum(counts[:-1], out=first[1:])
+    return np.arange(total) - np.repeat(first - starts, counts), owners
+
+
+def point_segment_distances(points, starts, ends):
+    """
+    :param points: an array with shape (K, 2).
+    :param starts: an array with shape (K, 2) containing the start points of K segments.
+    :param ends: an array with shape (K, 2) containing the end points of K segments.
+    :return: a tuple (distances, closest) where distances has shape (K,) and closest has shape (K, 2) and contains the
+        point on each segment that is closest to the corresponding point.
+    """
+    d = ends - starts
+    squared = np.sum(d * d, axis=1)
+    t = np.sum((points - starts) * d, axis=1) / np.where(squared > 0, squared, 1)
+    closest = starts + np.clip(t, 0, 1)[:, np.newaxis] * d
+    difference = points - closest
+    return np.hypot(difference[:, 0], difference[:, 1]), closest
+
+
+def segment_distances(a_starts, a_ends, b_starts, b_ends):
+    """
+    Calculate the minimum distance between each pair of segments a_k and b_k.
+
+    :param a_starts: an array with shape (K, 2).
+    :param a_ends: an array with shape (K, 2).
+    :param b_starts: an array with shape (K, 2).
+    :param b_ends: an array with shape (K, 2).
+    :return: a tuple (distances, a_closest, b_closest) where a_closest and b_closest have shape (K, 2) and contain a
+        pair of closest points; the distance is 0 if the segments intersect.
+    """
+    a_starts, a_ends, b_starts, b_ends = [np.asarray(a, dtype=np.float64) for a in (a_starts, a_ends, b_starts, b_ends)]
+    candidates = [point_segment_distances(a_starts, b_starts, b_ends),
+                  point_segment_distances(a_ends, b_starts, b_ends),
+                  point_segment_distances(b_starts, a_starts, a_ends),
+                  point_segment_distances(b_ends, a_starts, a_ends)]
+    distances = np.column_stack([c[0] for c in candidates])
+    best = np.argmin(distances, axis=1)
+    rows = np.arange(best.size)
+    on_b = np.stack([c[1] for c in candidates[:2]], axis=1)
+    on_a = np.stack([c[1] for c in candidates[2:]], axis=1)
+    a_closest = np.where((best < 2)[:, np.newaxis], np.stack((a_starts, a_ends), axis=1)[rows, best % 2],
+                         on_a[rows, best % 2])
+    b_closest = np.where((best < 2)[:, np.newaxis], on_b[rows, best % 2],
+                         np.stack((b_starts, b_ends), axis=1)[rows, best % 2])
+    result = distances[rows, best]
+    # Segments that cross have no endpoint on the other segment, so the endpoint distances are all positive.
+    crossing = ((_orientation(a_starts, a_ends, b_starts) * _orientation(a_starts, a_ends, b_ends) < 0) &
+                (_orientation(b_starts, b_ends, a_starts) * _orientation(b_starts, b_ends, a_ends) < 0))
+    result[crossing] = 0
+    return result, a_closest, b_closest
+
+
+def segment_x_at(starts, ends, y):
+    """
+    :param starts: an array with shape (K, 2) containing the start points of K non-horizontal segments.
+    :param ends: an array with shape (K, 2) containing the end points of K non-horizontal segments.
+    :param y: an array with shape (K,) containing a y-coordinate for each segment.
+    :return: an array with shape (K,) containing the x-coordinate at which each segment reaches its y-coordinate; the
+        end points are used exactly, so that trapezoids that meet at a vertex have identical corners.
+    """
+    x = starts[:, 0] + (y - starts[:, 1]) / (ends[:, 1] - starts[:, 1]) * (ends[:, 0] - starts[:, 0])
+    return np.where(y == starts[:, 1], starts[:, 0], np.where(y == ends[:, 1], ends[:, 0], x))
+
+
+def _orientation(a, b, c):
+    """
+    :return: the sign of the cross product (b - a) x (c - a) for each row.
+    """
+    return np.sign((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+
+
+def rings_contain(vertices, offsets, ring_indices, points):
+    """
+    Test whether each point lies inside the corresponding ring, using the even-odd rule. Points exactly on an edge may
+    be classified either way.
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M closed shapes.
+    :param ring_indices: an integer array with shape (K,) containing the index of the ring to test for each point.
+    :param points: an array with shape (K, 2).
+    :return: a boolean array with shape (K,).
+    """
+    starts, ends, owners = segments(vertices, offsets, closed=True)
+    order = np.argsort(owners, kind='stable')
+    edge_offsets = np.searchsorted(owners[order], np.arange(offsets.size))
+    ring_indices = np.asarray(ring_indices, dtype=np.int64)
+    edges, pairs = expand_ranges(edge_offsets[ring_indices], edge_offsets[ring_indices + 1])
+    edges = order[edges]
+    p = np.asarray(points, dtype=np.float64)[pairs]
+    s = starts[edges]
+    e = ends[edges]
+    straddles = (s[:, 1] > p[:, 1]) != (e[:, 1] > p[:, 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = s[:, 0] + (p[:, 1] - s[:, 1]) * (e[:, 0] - s[:, 0]) / (e[:, 1] - s[:, 1])
+    crossings = straddles & (x > p[:, 0])
+    return np.bincount(pairs, weights=crossings, minlength=ring_indices.size) % 2 == 1
+
+
+def path_outline(points, width, cap=0):
+    """
+    Return the outline polygon of a path with mitered joints.
+
+    :param points: an array with shape (N, 2) containing the center line.
+    :param width: the path width.
+    :param cap: the pylayout cap code; 0 is flush, and the other caps are treated as extended by half the width,
+        which contains a round cap.
+    :return: an array with shape (2 * N, 2) containing the outline, or an empty array if the path has no area.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if points.shape[0]:
+        points = points[np.concatenate(([True], np.any(np.diff(points, axis=0) != 0, axis=1)))]
+    if points.shape[0] < 2 or width <= 0:
+        return np.empty((0, 2))
+    d = np.diff(points, axis=0)
+    u = d / np.hypot(d[:, 0], d[:, 1])[:, np.newaxis]
+    normals = np.column_stack((-u[:, 1], u[:, 0]))
+    half = width / 2
+    if cap:
+        points[0] -= half * u[0]
+        points[-1] += half * u[-1]
+    # The miter offset at each interior vertex has length half / cos(bend / 2) along the bisector of the normals.
+    denominator = 1 + np.sum(normals[:-1] * normals[1:], axis=1)
+    miters = (normals[:-1] + normals[1:]) / np.maximum(denominator, 1e-9)[:, np.newaxis]
+    shifts = half * np.vstack((normals[:1], miters, normals[-1:]))
+    return np.vstack((points + shifts, (points - shifts)[::-1]))
+
+
+def normalize_rings(vertices, offsets):
+    """
+    Return the given rings in a canonical form, so that rings that enclose the same region with the same vertices are
+    identical: a final vertex that repeats the first is removed, the vertices are ordered counterclockwise, and each
+    ring starts at its lexicographically smallest vertex, ordered by x and then y.
+
+    :param vertices: the (N, 2) vertex array, with integer or float values.
+    :param offsets: the offsets array of M closed shapes, none of which may be empty.
+    :return: a tuple (vertices, offsets) containing the normalized rings.
+    """
+    vertices = np.asarray(vertices)
+    owners = shape_indices(offsets)
+    closing = np.zeros(vertices.shape[0], dtype=bool)
+    last = offsets[1:] - 1
+    repeated = (last > offsets[:-1]) & np.all(vertices[last] == vertices[offsets[:-1]], axis=1)
+    closing[last[repeated]] = True
+    vertices = vertices[~closing]
+    owners = owners[~closing]
+    offsets = offsets_from_counts(np.bincount(owners, minlength=offsets.size - 1))
+    counts = np.diff(offsets)
+    positions = np.arange(vertices.shape[0]) - offsets[owners]
+    # Find the position of the smallest vertex of each ring: sort by ring, then x, then y, and take the first of each.
+    order = np.lexsort((vertices[:, 1], vertices[:, 0], owners))
+    smallest = positions[order[offsets[:-1]]]
+    clockwise = ring_signed_areas(vertices, offsets) < 0
+    direction = np.where(clockwise, -1, 1)[owners]
+    source = offsets[owners] + (smallest[owners] + direction * positions) % counts[owners]
+    return vertices[source], offsets
+
+
+def normalize_lines(vertices, offsets):
+    """
+    Return the given lines in a canonical form, so that lines with the same vertices in opposite orders are identical:
+    each line is reversed if its last vertex is lexicographically smaller than its first.
+
+    :param vertices: the (N, 2) vertex array.
+    :param offsets: the offsets array of M open shapes, none of which may be empty.
+    :return: a tuple (vertices, offsets) containing the normalized lines.
+    """
+    vertices = np.asarray(vertices)
+    owners = shape_indices(offsets)
+    first = vertices[offsets[:-1]]
+    last = vertices[offsets[1:] - 1]
+    reverse = (last[:, 0] < first[:, 0]) | ((last[:, 0] == first[:, 0]) & (last[:, 1] < first[:, 1]))
+    positions = np.arange(vertices.shape[0]) - offsets[owners]
+    source = np.where(reverse[owners], offsets[owners + 1] - 1 - positions, offsets[owners] + positions)
+    return vertices[source], offsets
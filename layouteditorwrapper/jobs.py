@@ -0,0 +1,308 @@
+"""
+This module runs long layout builds without freezing the LayoutEditor window.
+
+pylayout objects must only be used from the thread that runs the Qt event loop, but most of the time in a large build
+is spent computing geometry: smoothing paths, generating mesh holes, and evaluating component recipes. A Job runs a
+build function in a background thread, giving it a RecordingDrawing instead of the real Drawing. The recording
+drawing and its recording cells accept the same calls as a Drawing and its Cells, but instead of touching pylayout they
+record each call. A QTimer on the Qt event loop then replays the recorded calls on the real drawing in small chunks,
+so the GUI stays responsive between chunks. Each recorded call is also a point at which the build can be cancelled.
+
+The build function is called as build(drawing, *args, **kwargs) and can do anything that only adds to the drawing:
+create cells with drawing.add_cell(), draw into them with the Cell add_ methods, Path.draw() (not in incremental
+mode), and subtract(), and use the unit conversions of the drawing. Calls that read the contents of the drawing, such
+as Cell.elements, are not available, because the contents do not exist yet. The value returned by the build function
+becomes Job.result, with recording cells replaced by the real cells that were created.
+
+Jobs require a running Qt event loop. In IPython, enable it with %gui qt4; in a script, call Job.wait().
+
+Example:
+    def build(drawing, feedline):
+        cell = drawing.add_cell('feedline')
+        feedline.draw(cell, (0, 0), positive_layer=1, negative_layer=2, result_layer=3)
+        return cell
+
+    job = jobs.submit(drawing, build, feedline, on_finished=lambda job: layout.show_latest())
+    job.progress  # (3000, 12000)
+    job.cancel()
+"""
+from __future__ import division
+
+import threading
+import time
+
+from . import wrapper
+from .wrapper import QtCore
+
+COMPUTING = 'computing'
+INSERTING = 'inserting'
+FINISHED = 'finished'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+# The Cell methods that a RecordingCell records.
+RECORDED_METHODS = ('add_box', 'add_cell', 'add_cell_array', 'add_cells', 'add_circle', 'add_path', 'add_polygon',
+                    'add_polygon_arc', 'add_text', 'add_texts', 'subtract')
+
+
+class Cancelled(Exception):
+    """Raised inside the build function when its job has been cancelled."""
+
+
+class RecordingDrawing(wrapper.Drawing):
+    """
+    A stand-in for a Drawing that records the creation of cells instead of creating them. The units are copied from the
+    real drawing when the recording drawing is created, so unit conversions do not use pylayout.
+    """
+
+    def __init__(self, drawing, job=None):
+        """
+        :param drawing: the real Drawing, whose units are copied.
+        :param job: the Job that owns this recording, which is checked for cancellation on every recorded call.
+        """
+        super(RecordingDrawing, self).__init__(None, use_user_unit=drawing.use_user_unit, auto_number=False)
+        self._user_unit = drawing.user_unit
+        self._database_unit = drawing.database_unit
+        self.job = job
+        self.calls = []
+
+    def _read_units(self):
+        return self._user_unit, self._database_unit
+
+    @property
+    def cells(self):
+        raise RuntimeError("The contents of a drawing cannot be read while recording.")
+
+    def record(self, target, name, args, kwargs, result=None):
+        """
+        Record a call, after checking whether the job has been cancelled.
+
+        :param target: the RecordingCell or RecordingDrawing whose method was called.
+        :param name: the name of the method.
+        :param args: the positional arguments.
+        :param kwargs: the keyword arguments.
+        :param result: if not None, the RecordingCell that stands in for the value that the call returns.
+        :return: None
+        :raises Cancelled: if the job has been cancelled.
+        """
+        if self.job is not None and self.job.cancelled:
+            raise Cancelled()
+        self.calls.append((target, name, args, kwargs, result))
+
+    def add_cell(self, name):
+        """
+        Record the creation of a cell. The name of the real cell can differ if the real drawing uses auto_number.
+
+        :param name: the name of the new cell; see Drawing.add_cell().
+        :return: a RecordingCell that stands in for the new cell.
+        """
+        cell = RecordingCell(self, name)
+        self.record(self, 'add_cell', (name,), {}, result=cell)
+        return cell
+
+
+class RecordingCell(object):
+    """
+    A stand-in for a Cell that records calls to the methods in RECORDED_METHODS. The recorded methods return None.
+    """
+
+    def __init__(self, drawing, name):
+        self.drawing = drawing
+        self.name = name
+
+    def __getattr__(self, name):
+        if name not in RECORDED_METHODS:
+            raise AttributeError("{} is not available while recording.".format(name))
+
+        def recorded_method(*args, **kwargs):
+            self.drawing.record(self, name, args, kwargs)
+
+        recorded_method.__name__ = name
+        return recorded_method
+
+
+def resolve(cells, value):
+    """
+    Replace the recording cells in the given value by the real cells that were created for them.
+
+    :param cells: a dict with RecordingCell keys and Cell values, as returned by replay().
+    :param value: a RecordingCell, or a list or tuple that may contain them, or any other value.
+    :return: the value with its recording cells replaced.
+    """
+    if isinstance(value, RecordingCell):
+        return cells[value]
+    elif isinstance(value, (list, tuple)) and any(isinstance(item, RecordingCell) for item in value):
+        return type(value)(resolve(cells, item) for item in value)
+    return value
+
+
+def _replay_call(drawing, recording, cells, target, name, args, kwargs, result):
+    if target is recording:
+        target = drawing
+    value = getattr(resolve(cells, target), name)(*[resolve(cells, arg) for arg in args],
+                                                  **dict((key, resolve(cells, item)) for key, item in kwargs.items()))
+    if result is not None:
+        cells[result] = value
+
+
+def replay(drawing, recording, cells=None):
+    """
+    Replay all of the calls recorded by the given recording drawing on the given real drawing, immediately. This must
+    be called from the thread that owns the pylayout objects.
+
+    :param drawing: the Drawing into which the results are inserted.
+    :param recording: a RecordingDrawing.
+    :param cells: a dict to which the real cells are added; if None, a new dict is used.
+    :return: a dict with RecordingCell keys and the corresponding real Cell values.
+    """
+    if cells is None:
+        cells = {}
+    for call in recording.calls:
+        _replay_call(drawing, recording, cells, *call)
+    return cells
+
+
+class Job(object):
+    """
+    A build that runs in a background thread and whose results are inserted into a drawing from the Qt event loop.
+
+    The state attribute is one of COMPUTING, INSERTING, FINISHED, CANCELLED, or FAILED. If the build raises an
+    exception, the state is FAILED and the exception is stored in the error attribute.
+    """
+
+    def __init__(self, drawing, build, args=(), kwargs=None, chunk_size=200, interval=0, on_progress=None,
+                 on_finished=None):
+        """
+        :param drawing: the Drawing into which the results are inserted.
+        :param build: a function that is called as build(recording_drawing, *args, **kwargs) in a background thread.
+        :param args: the positional arguments for the build function.
+        :param kwargs: the keyword arguments for the build function.
+        :param chunk_size: the number of recorded calls to replay each time the event loop runs the timer.
+        :param interval: the time in milliseconds between chunks.
+        :param on_progress: if not None, a function called as on_progress(job) on the event loop after each chunk.
+        :param on_finished: if not None, a function called as on_finished(job) on the event loop when the job stops,
+            whether it finished, was cancelled, or failed.
+        """
+        self.drawing = drawing
+        self.build = build
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.state = None
+        self.cancelled = False
+        self.error = None
+        self.result = None
+        self.inserted = 0
+        self.recording = RecordingDrawing(drawing, job=self)
+        self._returned = None
+        self._thread = None
+        self._cells = {}
+        self._timer = QtCore.QTimer()
+        self._timer.timeout.connect(self._step)
+
+    def start(self):
+        """
+        Start computing in a background thread and start the timer that inserts the results.
+
+        :return: this Job.
+        """
+        self.state = COMPUTING
+        self._thread = threading.Thread(target=self._compute)
+        self._thread.daemon = True
+        self._thread.start()
+        self._timer.start(self.interval)
+        return self
+
+    def _compute(self):
+        try:
+            self._returned = self.build(self.recording, *self.args, **self.kwargs)
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.error = e
+
+    @property
+    def progress(self):
+        """
+        A tuple (done, total) containing the number of recorded calls that have been inserted and the total number of
+        recorded calls, which increases until the computation finishes.
+        """
+        return self.inserted, len(self.recording.calls)
+
+    @property
+    def done(self):
+        return self.state in (FINISHED, CANCELLED, FAILED)
+
+    def cancel(self):
+        """
+        Cancel this job. The build function stops at its next recorded call and no further calls are inserted; cells
+        and elements that have already been inserted remain in the drawing.
+        """
+        self.cancelled = True
+
+    def wait(self, poll=0.01):
+        """
+        Process Qt events until this job is done, for use in scripts that do not otherwise run the event loop.
+
+        :param poll: the time in seconds to sleep between processing events.
+        :return: this Job.
+        """
+        while not self.done:
+            QtCore.QCoreApplication.processEvents()
+            time.sleep(poll)
+        return self
+
+    def _step(self):
+        """
+        Insert the next chunk of recorded calls; this is called by the timer on the event loop. Insertion starts while
+        the build is still computing.
+        """
+        if self.cancelled:
+            self._stop(CANCELLED)
+            return
+        computing = self._thread.is_alive()
+        if not computing:
+            if self.error is not None:
+                self._stop(FAILED)
+                return
+            self.state = INSERTING
+        calls = self.recording.calls
+        stop = min(len(calls), self.inserted + self.chunk_size)
+        try:
+            for call in calls[self.inserted:stop]:
+                _replay_call(self.drawing, self.recording, self._cells, *call)
+                self.inserted += 1
+        except Exception as e:
+            self.error = e
+            self.cancelled = True
+            self._stop(FAILED)
+            return
+        if self.on_progress is not None:
+            self.on_progress(self)
+        if not computing and self.inserted == len(calls):
+            self.result = resolve(self._cells, self._returned)
+            self._stop(FINISHED)
+
+    def _stop(self, state):
+        self._timer.stop()
+        self.state = state
+        if self.on_finished is not None:
+            self.on_finished(self)
+
+
+def submit(drawing, build, *args, **kwargs):
+    """
+    Create and start a Job with the default settings.
+
+    :param drawing: the Drawing into which the results are inserted.
+    :param build: a function that is called as build(recording_drawing, *args, **kwargs) in a background thread.
+    :param on_progress: an optional keyword argument; see Job.
+    :param on_finished: an optional keyword argument; see Job.
+    :return: the started Job.
+    """
+    on_progress = kwargs.pop('on_progress', None)
+    on_finished = kwargs.pop('on_finished', None)
+    return Job(drawing, build, args=args, kwargs=kwargs, on_progress=on_progress, on_finished=on_finished).start()
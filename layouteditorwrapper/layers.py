@@ -0,0 +1,207 @@
+"""
+This module renumbers, copies, merges, and deletes layers in a cell and, optionally, in every cell that it references.
+
+Each operation walks the pylayout element list of each distinct cell in the hierarchy exactly once, however many times
+the cell is referenced, without creating Element wrappers. The walk collects the layer of every element into an array,
+and the elements to change are then chosen with whole-array operations, so only those elements are touched again:
+renumbering sets their layers, deleting selects them and deletes the selection with one pylayout call, and copying
+adds new elements made from the pylayout point arrays of the originals. Merging uses the pylayout union boolean in each
+cell, so shapes are merged with the other shapes in the same cell, but not with shapes in other cells.
+
+Example:
+    layers.remap(top, {1: 10, 2: 20})  # Renumber layers 1 and 2 everywhere below top.
+    layers.merge(top, [10, 20], 30)  # Replace layers 10 and 20 by their union on layer 30.
+"""
+from __future__ import division
+
+from collections import OrderedDict
+
+import numpy as np
+
+from . import wrapper
+from .wrapper import pylayout
+
+
+def _scan(cell):
+    """
+    Walk the element list of the given cell once.
+
+    :return: a tuple (pyl_elements, layers, children) where pyl_elements is a list of the pylayout elements, layers is
+        an integer array containing the layer of each element, or -1 for cell references, and children is a list of
+        the pylayout cells that are referenced.
+    """
+    pyl_elements = []
+    layers = []
+    children = []
+    current = cell.pyl.firstElement
+    while current is not None:
+        pyl_element = current.thisElement
+        pyl_elements.append(pyl_element)
+        if pyl_element.isCellref() or pyl_element.isCellrefArray():
+            layers.append(-1)
+            children.append(pyl_element.depend())
+        else:
+            layers.append(pyl_element.layerNum)
+        current = current.nextElement
+    return pyl_elements, np.array(layers, dtype=np.int64), children
+
+
+def _cells(cell, hierarchy):
+    """
+    Yield a tuple (cell, pyl_elements, layers) from _scan() for the given cell and, if hierarchy is True, for each
+    distinct cell that it references, recursively. Each cell is scanned before it is yielded and is not scanned again.
+    """
+    seen = set([cell.name])
+    pending = [cell]
+    while pending:
+        current = pending.pop()
+        pyl_elements, layers, children = _scan(current)
+        if hierarchy:
+            for pyl_cell in children:
+                child = current.drawing.cell_class(pyl_cell, current.drawing)
+                if child.name not in seen:
+                    seen.add(child.name)
+                    pending.append(child)
+        yield current, pyl_elements, layers
+
+
+def _lookup(mapping, layers):
+    """
+    :param mapping: a dict with integer layer keys and values.
+    :param layers: an integer array of layers.
+    :return: a tuple (rows, targets) containing the indices of the layers that are keys of the mapping and the values
+        for those layers.
+    """
+    keys = np.array(sorted(mapping), dtype=np.int64)
+    values = np.array([mapping[key] for key in keys.tolist()], dtype=np.int64)
+    if not keys.size:
+        return np.empty(0, dtype=np.int64), values
+    positions = np.minimum(np.searchsorted(keys, layers), keys.size - 1)
+    rows = np.flatnonzero((keys[positions] == layers) & (layers >= 0))
+    return rows, values[positions[rows]]
+
+
+def remap(cell, mapping, hierarchy=True):
+    """
+    Move the shapes on each layer in the given mapping to the corresponding layer. All layers are moved at once, so a
+    mapping such as {1: 2, 2: 1} swaps two layers.
+
+    :param cell: a wrapper.Cell.
+    :param mapping: a dict from old layer numbers to new layer numbers.
+    :param hierarchy: if True, also change every cell referenced by this cell, recursively, each once.
+    :return: the number of elements that were changed.
+    """
+    count = 0
+    for current, pyl_elements, layers in _cells(cell, hierarchy):
+        rows, targets = _lookup(mapping, layers)
+        for row, target in zip(rows.tolist(), targets.tolist()):
+            pyl_elements[row].layerNum = target
+        count += rows.size
+    return count
+
+
+def _select(cell, pyl_elements, rows):
+    """
+    Make the elements with the given rows the selection of the given cell.
+    """
+    cell.pyl.deselectAll()
+    for row in rows.tolist():
+        pyl_elements[row].select()
+
+
+def delete(cell, layers, hierarchy=True):
+    """
+    Delete all shapes on the given layers. This clears the current selection in each changed cell.
+
+    :param cell: a wrapper.Cell.
+    :param layers: an iterable of layer numbers.
+    :param hierarchy: if True, also change every cell referenced by this cell, recursively, each once.
+    :return: the number of elements that were deleted.
+    """
+    layers_to_delete = np.array(sorted(set(layers)), dtype=np.int64)
+    count = 0
+    for current, pyl_elements, element_layers in _cells(cell, hierarchy):
+        rows = np.flatnonzero(np.isin(element_layers, layers_to_delete) & (element_layers >= 0))
+        if rows.size:
+            _select(current, pyl_elements, rows)
+            current.pyl.deleteSelect()
+            count += rows.size
+    return count
+
+
+def _copy_element(cell, pyl_element, layer):
+    """
+    Add a copy of the given pylayout element to the given cell on the given layer, and return the new element.
+    """
+    code = wrapper.element_type(pyl_element)
+    if code == wrapper.BOX:
+        (x0, y0), (x1, y1) = cell.drawing._to_np_array(pyl_element.getPoints())[:2].tolist()
+        pyl_copy = cell.pyl.addBox(min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0), layer)
+    elif code in (wrapper.CIRCLE, wrapper.POLYGON):
+        # pylayout treats a regular polygon with enough points as a circle, so a copied circle is still a circle.
+        pyl_copy = cell.pyl.addPolygon(pyl_element.getPoints(), layer)
+    elif code == wrapper.PATH:
+        pyl_copy = cell.pyl.addPath(pyl_element.getPoints(), layer)
+        pyl_copy.setWidth(pyl_element.getWidth())
+        pyl_copy.setCap(pyl_element.getCap())
+    elif code == wrapper.TEXT:
+        pyl_copy = cell.pyl.addText(layer, pyl_element.getPoints().point(0),
+                                    str(wrapper.Text(pyl_element, cell.drawing).text))
+        pyl_copy.setWidth(pyl_element.getWidth())
+    else:
+        raise ValueError("Elements of type {} have no layer.".format(wrapper.ELEMENT_TYPES[code]))
+    pyl_copy.setDatatype(pyl_element.getDatatype())
+    return pyl_copy
+
+
+def copy(cell, mapping, hierarchy=True):
+    """
+    Copy the shapes on each layer in the given mapping to the corresponding layer; the original shapes are unchanged.
+
+    :param cell: a wrapper.Cell.
+    :param mapping: a dict from source layer numbers to destination layer numbers.
+    :param hierarchy: if True, also change every cell referenced by this cell, recursively, each once.
+    :return: the number of elements that were created.
+    """
+    count = 0
+    for current, pyl_elements, layers in _cells(cell, hierarchy):
+        rows, targets = _lookup(mapping, layers)
+        for row, target in zip(rows.tolist(), targets.tolist()):
+            _copy_element(current, pyl_elements[row], target)
+        count += rows.size
+    return count
+
+
+def merge(cell, layers, result_layer, hierarchy=True):
+    """
+    Replace the shapes on the given layers by their union, on the result layer, in each cell. The result layer may be
+    one of the given layers. The shapes on the result layer are replaced only if it is one of the given layers.
+
+    :param cell: a wrapper.Cell.
+    :param layers: an iterable of layer numbers.
+    :param result_layer: the layer on which the union is created.
+    :param hierarchy: if True, also change every cell referenced by this cell, recursively, each once.
+    :return: the number of cells that were changed.
+    """
+    layers = list(OrderedDict.fromkeys(int(layer) for layer in layers))
+    if not layers:
+        return 0
+    drawing = cell.drawing
+    count = 0
+    for current, pyl_elements, element_layers in _cells(cell, hierarchy):
+        if not np.isin(element_layers, layers).any():
+            continue
+        # The other layers are moved onto the second layer, and the union of the two is made on an unused layer, so
+        # that it is never mixed with its sources.
+        scratch = int(max(element_layers.max(), result_layer, max(layers))) + 1
+        first = layers[0]
+        second = layers[1] if len(layers) > 1 else first
+        for row in np.flatnonzero(np.isin(element_layers, layers[2:])).tolist():
+            pyl_elements[row].layerNum = second
+        drawing.pyl.setCell(current.pyl)
+        handler = pylayout.booleanHandler(drawing.pyl)
+        handler.boolOnLayer(first, second, scratch, pylayout.string('A+B'), 0, 0, 0)
+        delete(current, [first, second], hierarchy=False)
+        remap(current, {scratch: result_layer}, hierarchy=False)
+        count += 1
+    return count
@@ -0,0 +1,190 @@
+"""
+This module calculates geometric totals, such as metal area and path length, for whole cells.
+
+The points of all elements in a cell are collected into an ElementTable (see wrapper.py) so that the area,
+perimeter, and length of every shape on every layer are computed in a few vectorized reductions. Totals can optionally
+include the contents of referenced cells, multiplied by the number of instances, without flattening the hierarchy:
+each referenced cell is measured only once. Bounding boxes of cell hierarchies are calculated in the same way.
+
+All calculations are done in integer database units and converted at the end, so the results are in user units if the
+drawing uses them.
+"""
+from __future__ import division
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import geometry, wrapper
+
+Metrics = namedtuple('Metrics', ['area', 'perimeter', 'length'])
+Metrics.__doc__ = """
+The totals for a single layer. The area and perimeter include all boxes, circles, polygons, and paths; the length is
+the total center line length of the paths only. Path outlines are calculated from the path length, width, and cap, so
+corrections at bends are neglected.
+"""
+
+# The pylayout cap codes, which are the same as the GDSII path types.
+FLUSH_CAP = 0
+ROUND_CAP = 1
+EXTENDED_CAP = 2
+
+
+def path_outlines(lengths, widths, caps):
+    """
+    Return the area and perimeter of paths with the given center line lengths, widths, and cap styles, neglecting the
+    corrections at bends.
+
+    :param lengths: an array of center line lengths.
+    :param widths: an array of path widths.
+    :param caps: an array of pylayout cap codes.
+    :return: a tuple (areas, perimeters) of arrays.
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    widths = np.asarray(widths, dtype=np.float64)
+    caps = np.asarray(caps)
+    areas = widths * lengths + np.select([caps == ROUND_CAP, caps == EXTENDED_CAP],
+                                         [np.pi * widths ** 2 / 4, widths ** 2], 0)
+    perimeters = 2 * lengths + np.select([caps == ROUND_CAP, caps == EXTENDED_CAP],
+                                         [np.pi * widths, 4 * widths], 2 * widths)
+    return areas, perimeters
+
+
+def _layer_totals(layers, values):
+    """
+    Sum the rows of values that share a layer.
+
+    :param layers: an integer array with shape (M,).
+    :param values: an array with shape (M, 3).
+    :return: a dict with layer keys and array values with shape (3,).
+    """
+    unique, inverse = np.unique(layers, return_inverse=True)
+    sums = np.column_stack([np.bincount(inverse.ravel(), weights=column, minlength=unique.size)
+                            for column in values.T])
+    return dict(zip(unique.tolist(), sums))
+
+
+def _cell_totals(cell, hierarchy, cache):
+    """
+    Return the totals for a single cell in database units, using and updating the given cache of totals by cell name.
+    """
+    key = (cell.name, hierarchy)
+    if key in cache:
+        return cache[key]
+    table = cell.element_table()
+    ring_vertices, ring_offsets, ring_rows = table.rings()
+    line_vertices, line_offsets, line_rows = table.lines()
+    lengths = geometry.line_lengths(line_vertices, line_offsets)
+    path_areas, path_perimeters = path_outlines(lengths, table.widths[line_rows], table.caps[line_rows])
+    values = np.vstack((np.column_stack((geometry.ring_areas(ring_vertices, ring_offsets),
+                                         geometry.ring_perimeters(ring_vertices, ring_offsets),
+                                         np.zeros(ring_rows.size))),
+                        np.column_stack((path_areas, path_perimeters, lengths))))
+    totals = _layer_totals(np.concatenate((table.layers[ring_rows], table.layers[line_rows])), values)
+    if hierarchy:
+        for row, child in table.references():
+            factors = np.prod(table.repeats[row]) * np.array([table.scales[row] ** 2, table.scales[row],
+                                                              table.scales[row]])
+            for layer, child_values in _cell_totals(child, hierarchy, cache).items():
+                totals[layer] = totals.get(layer, 0) + factors * child_values
+    cache[key] = totals
+    return totals
+
+
+def cell_metrics(cell, hierarchy=False):
+    """
+    Return the total area, perimeter, and path length on each layer of the given cell.
+
+    :param cell: a wrapper.Cell object.
+    :param hierarchy: if True, include the contents of all cells referenced by this cell, recursively, multiplied by
+        the number of instances and scaled by the reference transformations; if False, include only the elements
+        drawn directly in this cell.
+    :return: an OrderedDict with integer layer keys, in increasing order, and Metrics values.
+    """
+    totals = _cell_totals(cell, hierarchy, {})
+    if cell.drawing.use_user_unit:
+        unit = cell.drawing.user_unit
+    else:
+        unit = 1
+    factors = np.array([unit ** 2, unit, unit])
+    return OrderedDict((layer, Metrics(*(factors * totals[layer]).tolist())) for layer in sorted(totals))
+
+
+def _transformed_boxes(boxes, angle, scale, mirror_x, translations):
+    """
+    Return the bounding box of the given box after a reference transformation and each of the given translations.
+
+    :param boxes: a tuple (x_min, y_min, x_max, y_max).
+    :param translations: an array with shape (K, 2).
+    :return: a tuple (x_min, y_min, x_max, y_max).
+    """
+    x_min, y_min, x_max, y_max = boxes
+    corners = np.array([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]], dtype=np.float64)
+    if mirror_x:
+        corners[:, 1] = -corners[:, 1]
+    radians = np.radians(angle)
+    rotation = scale * np.array([[np.cos(radians), -np.sin(radians)], [np.sin(radians), np.cos(radians)]])
+    corners = corners.dot(rotation.T)
+    low = corners.min(axis=0) + translations.min(axis=0)
+    high = corners.max(axis=0) + translations.max(axis=0)
+    return low[0], low[1], high[0], high[1]
+
+
+def _cell_box(cell, hierarchy, cache):
+    """
+    Return the bounding box of the given cell in database units, or None if it is empty, and store it in the cache.
+    """
+    key = (cell.name, hierarchy)
+    if key in cache:
+        return cache[key]
+    table = cell.element_table()
+    ring_vertices, ring_offsets, ring_rows = table.rings()
+    line_vertices, line_offsets, line_rows = table.lines()
+    expansions = np.repeat(table.widths[line_rows, np.newaxis] / 2, 4, axis=1) * [-1, -1, 1, 1]
+    text_points = table.points[table.offsets[table.rows(types=(wrapper.TEXT,))]]
+    boxes = [geometry.bounding_boxes(ring_vertices, ring_offsets),
+             geometry.bounding_boxes(line_vertices, line_offsets) + expansions,
+             np.hstack((text_points, text_points))]
+    if hierarchy:
+        for row, child in table.references():
+            child_box = _cell_box(child, hierarchy, cache)
+            if child_box is None:
+                continue
+            start = table.offsets[row]
+            origin = table.points[start]
+            if table.types[row] == wrapper.CELLREF_ARRAY:
+                # The farthest instances are at the corners of the lattice.
+                last = (table.repeats[row] - 1)[:, np.newaxis] * (table.points[start + 1:start + 3] - origin)
+                translations = origin + np.array([[0, 0], last[0], last[1], last[0] + last[1]])
+            else:
+                translations = origin[np.newaxis, :]
+            boxes.append(np.array([_transformed_boxes(child_box, table.angles[row], table.scales[row],
+                                                      table.mirrors[row], translations)]))
+    boxes = np.vstack([box.reshape(-1, 4) for box in boxes])
+    if boxes.shape[0]:
+        box = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+    else:
+        box = None
+    cache[key] = box
+    return box
+
+
+def cell_bounding_box(cell, hierarchy=True, cache=None):
+    """
+    Return the bounding box of the given cell. Paths are expanded by half of their width in every direction, which
+    contains every cap style, and text is represented only by its origin.
+
+    :param cell: a wrapper.Cell object.
+    :param hierarchy: if True, include the transformed bounding boxes of all cells referenced by this cell,
+        recursively; each referenced cell is measured only once.
+    :param cache: a dict in which the bounding boxes of the cell and of the cells it references are stored in database
+        units; passing the same dict to several calls avoids measuring cells again. It must not be reused after any of
+        these cells change.
+    :return: an array (x_min, y_min, x_max, y_max) in the units of the drawing, or None if the cell is empty.
+    """
+    if cache is None:
+        cache = {}
+    box = _cell_box(cell, hierarchy, cache)
+    if box is None:
+        return None
+    return cell.drawing.from_database_units(np.array(box, dtype=np.float64))
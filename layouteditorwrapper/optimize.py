@@ -0,0 +1,220 @@
+"""
+This module replaces groups of cell references that form regular arrays with single cell reference arrays.
+
+Generators usually place repeated cells one at a time with Cell.add_cell() in nested loops, which produces one Cellref
+per instance. A CellrefArray stores the same instances as one element, which makes the cell smaller in memory and in
+GDSII files and faster to draw. find_arrays() groups the Cellrefs in an ElementTable by referenced cell and
+transformation, then finds the origins that form regular lattices using sorts over whole arrays: the origins in each
+row of equal y are split into runs with a constant x-step, and runs with the same starting x, step, and length are
+stacked into runs with a constant y-step. The same scan is repeated with columns first, and for each group the scan
+that leaves fewer elements is used. Lattices are found when their steps are along the x- and y-axes, which is how
+arrays are usually laid out.
+
+Example:
+    for cell in drawing.cells.values():
+        optimize.replace_arrays(cell)
+"""
+from __future__ import division
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import wrapper
+
+Lattice = namedtuple('Lattice', ['rows', 'cell_name', 'origin', 'step_x', 'step_y', 'repeat_x', 'repeat_y', 'angle',
+                                 'scale', 'mirror_x'])
+Lattice.__doc__ = """
+A group of cell references that can be replaced by one cell reference array. The rows array contains the ElementTable
+rows of the references. The origin and steps are integer tuples in database units, repeat_x and repeat_y are the
+numbers of columns and rows, and the remaining fields are the shared transformation of the references.
+"""
+
+
+def array_origins(table, rows=None):
+    """
+    Return the origins of all of the instances in the given cell reference arrays, computed with whole-array
+    operations.
+
+    :param table: a wrapper.ElementTable.
+    :param rows: an iterable of rows of cell reference arrays, or None to use all of them.
+    :return: a tuple (origins, owners) where origins is an integer array with shape (K, 2) in database units and owners
+        contains the table row of each origin. The instances of each array are in row-major order.
+    """
+    if rows is None:
+        rows = table.rows(types=(wrapper.CELLREF_ARRAY,))
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = table.offsets[rows]
+    origins = table.points[starts]
+    # The points stored by pylayout are the origin and the origin displaced by one step in each direction.
+    steps_x = table.points[starts + 1] - origins
+    steps_y = table.points[starts + 2] - origins
+    counts = np.prod(table.repeats[rows], axis=1)
+    owners = np.repeat(np.arange(rows.size), counts)
+    instances = np.arange(owners.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows_index, columns = np.divmod(instances, table.repeats[rows, 0][owners])
+    result = origins[owners] + columns[:, np.newaxis] * steps_x[owners] + rows_index[:, np.newaxis] * steps_y[owners]
+    return result, rows[owners]
+
+
+def _arithmetic_runs(segments, values):
+    """
+    Split sorted values into runs with a constant step, within each segment.
+
+    :param segments: integer segment labels, which must be sorted.
+    :param values: the values, which must be sorted and distinct within each segment.
+    :return: a tuple (run_ids, starts, counts, steps) where run_ids labels each value with its run, and the other arrays
+        contain the index of the first value, the number of values, and the step of each run, which is 0 for runs of a
+        single value.
+    """
+    size = values.size
+    new_segment = np.concatenate(([True], segments[1:] != segments[:-1]))
+    differences = np.diff(values)
+    # The greedy split starts a new run at a value whose step from the previous value differs from the step before it,
+    # unless the previous value itself started a run. Within a stretch of consecutive changes of step the starts
+    # therefore alternate, beginning with a start, which can be computed without a loop.
+    changes = np.zeros(size, dtype=bool)
+    if size > 2:
+        changes[2:] = ~new_segment[2:] & ~new_segment[1:-1] & (differences[1:] != differences[:-1])
+    stretch_starts = changes & ~np.concatenate(([False], changes[:-1]))
+    stretch_first = np.maximum.accumulate(np.where(stretch_starts, np.arange(size), 0))
+    starts = new_segment | (changes & ((np.arange(size) - stretch_first) % 2 == 0))
+    run_ids = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    counts = np.diff(np.append(first, size))
+    steps = np.zeros(first.size, dtype=values.dtype)
+    multiple = counts > 1
+    steps[multiple] = differences[first[multiple]]
+    return run_ids, first, counts, steps
+
+
+def _labels(*keys):
+    """
+    :return: an integer array that labels each row with the rank of its distinct combination of the given keys.
+    """
+    order = np.lexsort(keys[::-1])
+    different = np.zeros(order.size, dtype=bool)
+    for key in keys:
+        different[1:] |= key[order][1:] != key[order][:-1]
+    labels = np.empty(order.size, dtype=np.int64)
+    labels[order] = np.cumsum(different)
+    return labels
+
+
+def _axis_lattices(groups, origins):
+    """
+    Split the given origins into lattices whose rows are along the x-axis and whose columns are along the y-axis.
+
+    :param groups: the sorted group labels of the origins.
+    :param origins: an integer array with shape (K, 2), sorted by y and then by x within each group, with no duplicates.
+    :return: a tuple (labels, corners, steps_x, steps_y, repeats_x, repeats_y) where labels contains the lattice of each
+        origin and the other arrays contain, for each lattice, the index of its lower-left origin, its steps, and its
+        numbers of columns and rows.
+    """
+    # Split each row of equal y into runs along x.
+    x_runs, x_starts, x_counts, x_steps = _arithmetic_runs(_labels(groups, origins[:, 1]), origins[:, 0])
+    run_groups = groups[x_starts]
+    run_x = origins[x_starts, 0]
+    run_y = origins[x_starts, 1]
+    # Stack the runs that have the same group, starting x, step, and length into runs along y.
+    order = np.lexsort((run_y, x_counts, x_steps, run_x, run_groups))
+    y_runs, y_starts, y_counts, y_steps = _arithmetic_runs(_labels(run_groups, run_x, x_steps, x_counts)[order],
+                                                           run_y[order])
+    lattice_of_run = np.empty(x_starts.size, dtype=np.int64)
+    lattice_of_run[order] = y_runs
+    first_runs = order[y_starts]
+    return lattice_of_run[x_runs], x_starts[first_runs], x_steps[first_runs], y_steps, x_counts[first_runs], y_counts
+
+
+def find_arrays(table, min_count=2):
+    """
+    Find the groups of cell references in the given table that can be replaced by cell reference arrays; see the
+    module docstring. Each reference belongs to at most one group; references with the same cell, transformation, and
+    origin as another reference are never grouped.
+
+    :param table: a wrapper.ElementTable.
+    :param min_count: the smallest number of references to replace with an array.
+    :return: a list of Lattice tuples.
+    """
+    rows = table.rows(types=(wrapper.CELLREF,))
+    if not rows.size:
+        return []
+    names = np.array([table.cell_names[row] for row in rows])
+    groups = _labels(np.unique(names, return_inverse=True)[1].ravel(), table.angles[rows], table.scales[rows],
+                     table.mirrors[rows].astype(np.int8))
+    origins = table.points[table.offsets[rows]]
+    order = np.lexsort((origins[:, 0], origins[:, 1], groups))
+    rows, groups, origins = rows[order], groups[order], origins[order]
+    distinct = np.concatenate(([True], (groups[1:] != groups[:-1]) | np.any(origins[1:] != origins[:-1], axis=1)))
+    rows, groups, origins = rows[distinct], groups[distinct], origins[distinct]
+    # Scan each group both along rows first and along columns first, and keep whichever leaves fewer elements.
+    by_rows = _axis_lattices(groups, origins)
+    transposed = np.lexsort((origins[:, 1], origins[:, 0], groups))
+    labels, corners, steps_y, steps_x, repeats_y, repeats_x = _axis_lattices(groups[transposed],
+                                                                             origins[transposed, ::-1])
+    by_columns = (labels[np.argsort(transposed)], transposed[corners], steps_x, steps_y, repeats_x, repeats_y)
+    remaining = []
+    for labels, corners, steps_x, steps_y, repeats_x, repeats_y in (by_rows, by_columns):
+        sizes = repeats_x * repeats_y
+        kept = np.where(sizes >= min_count, 1, sizes)
+        remaining.append(np.bincount(groups[corners], weights=kept, minlength=groups[-1] + 1))
+    use_columns = remaining[1] < remaining[0]
+    result = []
+    for columns, (labels, corners, steps_x, steps_y, repeats_x, repeats_y) in enumerate((by_rows, by_columns)):
+        chosen = use_columns[groups[corners]] == bool(columns)
+        members = np.argsort(labels, kind='stable')
+        boundaries = np.searchsorted(labels[members], np.arange(corners.size + 1))
+        for lattice in np.flatnonzero(chosen & (repeats_x * repeats_y >= min_count)):
+            row = rows[corners[lattice]]
+            result.append(Lattice(rows=np.sort(rows[members[boundaries[lattice]:boundaries[lattice + 1]]]),
+                                  cell_name=table.cell_names[row],
+                                  origin=tuple(int(value) for value in origins[corners[lattice]]),
+                                  step_x=(int(steps_x[lattice]), 0), step_y=(0, int(steps_y[lattice])),
+                                  repeat_x=int(repeats_x[lattice]), repeat_y=int(repeats_y[lattice]),
+                                  angle=float(table.angles[row]), scale=float(table.scales[row]),
+                                  mirror_x=bool(table.mirrors[row])))
+    return result
+
+
+def _delete_addresses(cell, addresses):
+    """
+    Delete the elements with the given addresses from the given cell with one walk over its element list.
+    """
+    addresses = set(addresses)
+    cell.pyl.deselectAll()
+    current = cell.pyl.firstElement
+    while current is not None:
+        if wrapper.address(current.thisElement) in addresses:
+            current.thisElement.select()
+        current = current.nextElement
+    cell.pyl.deleteSelect()
+
+
+def replace_arrays(cell, min_count=2):
+    """
+    Replace each group of cell references in the given cell that forms a regular array with a single cell reference
+    array; see find_arrays(). This clears the current selection in the cell.
+
+    :param cell: a wrapper.Cell.
+    :param min_count: the smallest number of references to replace with an array.
+    :return: a list of the new CellrefArray objects.
+    """
+    table = cell.element_table()
+    lattices = find_arrays(table, min_count=min_count)
+    if not lattices:
+        return []
+    drawing = cell.drawing
+    cells = dict((child.name, child) for row, child in table.references())
+    arrays = []
+    for lattice in lattices:
+        origin, step_x, step_y = drawing.from_database_units(np.array([lattice.origin, lattice.step_x,
+                                                                       lattice.step_y]))
+        array = cell.add_cell_array(cells[lattice.cell_name], origin, step_x, step_y, lattice.repeat_x,
+                                    lattice.repeat_y, lattice.angle)
+        if lattice.scale != 1:
+            array.scale = lattice.scale
+        if lattice.mirror_x:
+            array.mirror_x = True
+        arrays.append(array)
+    _delete_addresses(cell, np.concatenate([table.addresses[lattice.rows] for lattice in lattices]).tolist())
+    return arrays
@@ -5,9 +5,13 @@ The phrase 'package format' refers to the two-element (x, y) numpy array point f
 """
 from __future__ import division
 
+import hashlib
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
 
-from . import wrapper
+from . import cache, geometry, spatial, wrapper
 
 
 def from_increments(increments, origin=(0, 0)):
@@ -29,7 +33,43 @@ def from_increments(increments, origin=(0, 0)):
     return points
 
 
-def smooth_path(points, radius, points_per_radian):
+def transform(points, angle=0, origin=(0, 0)):
+    """
+    Rotate the given points counterclockwise about (0, 0) by the given angle, then translate them by the given origin,
+    using a single matrix multiplication.
+
+    :param points: an array with shape (..., 2), such as (N, 2) for a list of points or (M, N, 2) for a stack of M
+        polygons, or anything that can be converted to such an array.
+    :param angle: the rotation angle in radians.
+    :param origin: a point that is added to all of the rotated points.
+    :return: a float array with the same shape as the given points.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if angle:
+        cosine, sine = np.cos(angle), np.sin(angle)
+        points = np.dot(points, np.array([[cosine, sine],
+                                          [-sine, cosine]]))
+    return points + np.asarray(origin, dtype=np.float64)
+
+
+def arc_segments(radius, angle, tolerance):
+    """
+    Return the number of straight segments needed to approximate a circular arc so that the maximum distance between
+    the arc and each segment, called the sagitta, is at most the given tolerance.
+
+    :param radius: the radius of the arc.
+    :param angle: the angle subtended by the arc, in radians; the sign is ignored. This may be an array.
+    :param tolerance: the maximum sagitta, in the same units as the radius.
+    :return: the number of segments, which is at least 1, as an int or int array.
+    """
+    if tolerance >= radius:
+        step = np.pi
+    else:
+        step = 2 * np.arccos(1 - tolerance / radius)
+    return np.maximum(1, np.ceil(np.abs(angle) / step)).astype(np.int64)
+
+
+def smooth_path(points, radius, points_per_radian, tolerance=None, round_to=None):
     """
     Return a list of smoothed points constructed by adding points to change the given corners into arcs.
 
@@ -42,6 +82,10 @@ def smooth_path(points, radius, points_per_radian):
     :param points: a list of points in package format.
     :param radius: the radius of the circular arcs used to connect the straight segments.
     :param points_per_radian: the number of points per radian of arc radius; usually 60 (about 1 per degree) is fine.
+    :param tolerance: if not None, ignore points_per_radian and instead use the smallest number of points for which the
+        maximum distance between each arc and its chords is at most this value; see arc_segments().
+    :param round_to: if not None, round the arc points to this grid spacing and merge adjacent points that round to the
+        same point; this is done for all arcs at once after they are computed.
     :return: a list of smoothed points.
     """
     bends = []
@@ -62,15 +106,187 @@ def smooth_path(points, radius, points_per_radian):
                      bend_angle / 2 + np.sign(bend_angle) * np.pi / 2)
             # The offset of the arc center relative to the corner
             offset = h * np.array([np.cos(theta), np.sin(theta)])
+            if tolerance is None:
+                num_segments = int(np.ceil(np.abs(bend_angle) * points_per_radian))
+            else:
+                num_segments = int(arc_segments(radius, bend_angle, tolerance))
             # The absolute angles of the new points (at least two), using the absolute center as origin
-            arc_angles = (theta + np.pi + np.linspace(-bend_angle / 2, bend_angle / 2,
-                                                      np.ceil(np.abs(bend_angle) * points_per_radian) + 1))
-            bend = [current + offset + radius * np.array([np.cos(phi), np.sin(phi)]) for phi in arc_angles]
-            bends.append(bend)
+            arc_angles = theta + np.pi + np.linspace(-bend_angle / 2, bend_angle / 2, num_segments + 1)
+            bends.append(current + offset + radius * np.column_stack((np.cos(arc_angles), np.sin(arc_angles))))
             angles.append(bend_angle)
             corners.append(current)
             offsets.append(offset)
-    return bends, angles, corners, offsets
+    if round_to is not None and bends:
+        counts = [bend.shape[0] for bend in bends]
+        snapped = round_to * np.round(np.vstack(bends) / round_to)
+        bends = np.split(snapped, np.cumsum(counts)[:-1])
+        bends = [bend[np.concatenate(([True], np.any(np.diff(bend, axis=0) != 0, axis=1)))] for bend in bends]
+    return [list(bend) for bend in bends], angles, corners, offsets
+
+
+def _cached_smooth_path(points, radius, points_per_radian, tolerance=None, round_to=None):
+    """
+    Return the result of smooth_path(), read from the active geometry cache if it contains it; see cache.py.
+    """
+    geometry_cache = cache.active()
+    if geometry_cache is None:
+        return smooth_path(points, radius, points_per_radian, tolerance=tolerance, round_to=round_to)
+    name = cache.key('smooth_path', points, radius, points_per_radian, tolerance, round_to)
+    entry = geometry_cache.get(name)
+    if entry is None:
+        bends, angles, corners, offsets = smooth_path(points, radius, points_per_radian, tolerance=tolerance,
+                                                      round_to=round_to)
+        vertices, bend_offsets = geometry.concatenate(bends)
+        geometry_cache.put(name, OrderedDict([('vertices', vertices), ('bend_offsets', bend_offsets),
+                                              ('angles', np.array(angles, dtype=np.float64)),
+                                              ('corners', np.array(corners, dtype=np.float64).reshape(-1, 2)),
+                                              ('offsets', np.array(offsets, dtype=np.float64).reshape(-1, 2))]))
+        return bends, angles, corners, offsets
+    arrays = entry.arrays
+    bend_offsets = arrays['bend_offsets']
+    bends = [list(arrays['vertices'][start:stop]) for start, stop in zip(bend_offsets[:-1], bend_offsets[1:])]
+    return bends, list(arrays['angles']), list(arrays['corners']), list(arrays['offsets'])
+
+
+def evaluate_segments(segments, distances):
+    """
+    Return the points and tangent angles at the given distances along the given segments.
+
+    A segment table describes a curve as a sequence of straight segments and circular arcs. Each row is
+    (x, y, heading, length, curvature), where (x, y) is the start point, heading is the angle in radians of the tangent
+    at the start point, and curvature is 0 for a straight segment or the signed inverse of the radius for an arc, which
+    is positive if the arc turns counterclockwise.
+
+    :param segments: an array with shape (N, 5) containing one segment for each distance.
+    :param distances: an array with shape (N,) containing the distance along each segment.
+    :return: a tuple (points, angles) of arrays with shapes (N, 2) and (N,), with angles in radians.
+    """
+    x, y, heading, _, curvature = np.asarray(segments, dtype=np.float64).T
+    distances = np.asarray(distances, dtype=np.float64)
+    angles = heading + curvature * distances
+    straight = curvature == 0
+    inverse = 1 / np.where(straight, 1, curvature)
+    dx = np.where(straight, distances * np.cos(heading), (np.sin(angles) - np.sin(heading)) * inverse)
+    dy = np.where(straight, distances * np.sin(heading), (np.cos(heading) - np.cos(angles)) * inverse)
+    return np.column_stack((x + dx, y + dy)), angles
+
+
+def _straight_segments(vertices):
+    """
+    :param vertices: an array with shape (N, 2) containing the vertices of a polyline.
+    :return: the segment table for the polyline, omitting segments with zero length.
+    """
+    differences = np.diff(vertices, axis=0)
+    lengths = np.hypot(differences[:, 0], differences[:, 1])
+    nonzero = lengths > 0
+    return np.column_stack((vertices[:-1][nonzero], np.arctan2(differences[nonzero, 1], differences[nonzero, 0]),
+                            lengths[nonzero], np.zeros(np.count_nonzero(nonzero))))
+
+
+def _read_only(array):
+    """
+    Return the given array after making it read-only, so that cached values cannot be modified in place.
+    """
+    array.flags.writeable = False
+    return array
+
+
+class _cached_property(object):
+    """
+    A read-only property whose value is computed on first access and then stored in the cache of the instance. This is
+    safe only because Element instances are immutable after construction.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.name = method.__name__
+        self.__doc__ = method.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        cache = instance.__dict__.setdefault('_cache', {})
+        try:
+            return cache[self.name]
+        except KeyError:
+            value = cache[self.name] = self.method(instance)
+            return value
+
+    def __set__(self, instance, value):
+        raise AttributeError("{} is read-only.".format(self.name))
+
+
+class _Frozen(type):
+    """
+    This metaclass freezes each instance after the constructor of its most derived class returns, so that subclass
+    constructors can set attributes both before and after calling the constructor of their parent class.
+    """
+
+    def __call__(cls, *args, **kwargs):
+        instance = super(_Frozen, cls).__call__(*args, **kwargs)
+        object.__setattr__(instance, '_frozen', True)
+        return instance
+
+
+def straight_mesh(start, end, spacing, first_row, num_rows):
+    """
+    Return the mesh hole centers along both sides of a straight section of a path.
+
+    :param start: the start point of the section.
+    :param end: the end point of the section.
+    :param spacing: the distance between adjacent holes.
+    :param first_row: the distance from the center line to the first row of holes on each side.
+    :param num_rows: the number of rows of holes on each side.
+    :return: an array with shape (K, 2) containing the hole centers.
+    """
+    start = np.asarray(start, dtype=np.float64)
+    v = np.asarray(end, dtype=np.float64) - start
+    length = np.hypot(v[0], v[1])
+    num_columns = int(np.floor(length / spacing))
+    if num_columns == 0:
+        return np.empty((0, 2))
+    elif num_columns == 1:
+        x = np.array([length / 2])
+    else:
+        x = np.linspace(spacing / 2, length - spacing / 2, num_columns)
+    y = first_row + spacing * np.arange(num_rows)
+    xx, yy = np.meshgrid(x, np.concatenate((y, -y)))
+    return transform(np.column_stack((xx.ravel(), yy.ravel())), np.arctan2(v[1], v[0]), start)
+
+
+def arc_mesh(corner, offset, angle, radius, spacing, first_row, num_rows):
+    """
+    Return the mesh hole centers along both sides of a bend of a path, for all rows at once. Rows whose radius is less
+    than half the spacing are omitted. The holes in each row are centered in the bend, with an angular spacing as close
+    as possible to the given spacing.
+
+    :param corner: the corner point of the bend; see smooth_path().
+    :param offset: the offset of the arc center from the corner.
+    :param angle: the bend angle in radians.
+    :param radius: the radius of the arc of the center line.
+    :param spacing: the distance between adjacent holes.
+    :param first_row: the distance from the center line to the first row of holes on each side.
+    :param num_rows: the number of rows of holes on each side.
+    :return: an array with shape (K, 2) containing the hole centers.
+    """
+    center = np.asarray(corner, dtype=np.float64) + offset
+    distances = first_row + spacing * np.arange(num_rows)
+    radii = np.concatenate((radius - distances, radius + distances))
+    radii = radii[radii >= spacing / 2]
+    counts = np.round(radii * np.abs(angle) / spacing).astype(np.int64)
+    indices, rows = geometry.expand_ranges(np.zeros_like(counts), counts)
+    # The points of each row divide the arc into equal parts and are offset from its ends by half a part.
+    phi = np.arctan2(-offset[1], -offset[0]) + angle * ((indices + 0.5) / counts[rows] - 0.5)
+    return center + radii[rows, np.newaxis] * np.column_stack((np.cos(phi), np.sin(phi)))
+
+
+def _mesh_task(task):
+    """
+    Call the mesh function in the given (function, arguments) task; this is module-level so that the tasks can be sent
+    to a process pool.
+    """
+    function, arguments = task
+    return function(*arguments)
 
 
 # ToDo: split this into separate classes
@@ -79,72 +295,78 @@ class Mesh(object):
     This is a mix-in class that allows Element subclasses that have the same outlines to share mesh code.
     """
 
-    def path_mesh(self):
-        mesh_centers = []
+    def path_mesh(self, workers=None, pool=None, exclusions=()):
+        """
+        Return the mesh hole centers of a smoothed element. Each straight section and each bend is meshed
+        independently, so the sections can be meshed in parallel, and the results are concatenated in order: first the
+        straight sections, then the bends. Holes that are closer than half the mesh spacing to an earlier hole, which
+        happens where a bend meets a straight section, are removed, as are holes inside any of the given exclusion
+        polygons.
+
+        :param workers: if greater than 1, mesh the sections using a thread pool with this many threads.
+        :param pool: an object with a map() method, such as a multiprocessing.Pool, used instead of creating a thread
+            pool; the tasks can be pickled, so a process pool works.
+        :param exclusions: an iterable of polygons, in the coordinates of this element, inside which no holes are made.
+        :return: an array with shape (K, 2) containing the hole centers.
+        """
+        exclusions = [np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for polygon in exclusions]
+        geometry_cache = cache.active()
+        if geometry_cache is not None:
+            # The arc geometry determines the mesh, so it is part of the key in place of the outline and its options.
+            name = cache.key('path_mesh', self.start, self.end, self.bends, self.angles, self.corners, self.offsets,
+                             self.radius, self.width, self.gap, self.mesh_border, self.mesh_spacing,
+                             self.num_mesh_rows, exclusions)
+            entry = geometry_cache.get(name)
+            if entry is not None:
+                return entry.arrays['centers']
         center_to_first_row = self.width / 2 + self.gap + self.mesh_border
-        # Mesh the straight sections
         starts = [self.start] + [bend[-1] for bend in self.bends]
         ends = [bend[0] for bend in self.bends] + [self.end]
-        for start, end in zip(starts, ends):
-            v = end - start
-            length = np.linalg.norm(v)
-            phi = np.arctan2(v[1], v[0])
-            R = np.array([[np.cos(phi), -np.sin(phi)],
-                          [np.sin(phi), np.cos(phi)]])
-            num_mesh_columns = np.floor(length / self.mesh_spacing)
-            if num_mesh_columns == 0:
-                continue
-            elif num_mesh_columns == 1:
-                x = np.array([length / 2])
-            else:
-                x = np.linspace(self.mesh_spacing / 2, length - self.mesh_spacing / 2, num_mesh_columns)
-            y = center_to_first_row + self.mesh_spacing * np.arange(self.num_mesh_rows)
-            xx, yy = np.meshgrid(np.concatenate((x, x)), np.concatenate((y, -y)))
-            Rxy = np.dot(R, np.vstack((xx.flatten(), yy.flatten())))
-            mesh_centers.extend(zip(start[0] + Rxy[0, :], start[1] + Rxy[1, :]))
-        # Mesh the curved sections
-        for row in range(self.num_mesh_rows):
-            center_to_row = center_to_first_row + row * self.mesh_spacing
-            for radius in [self.radius - center_to_row, self.radius + center_to_row]:
-                if radius < self.mesh_spacing / 2:
-                    continue
-                for angle, corner, offset in zip(self.angles, self.corners, self.offsets):
-                    num_points = np.round(radius * np.abs(angle) / self.mesh_spacing)
-                    if num_points == 1:
-                        max_angle = 0
-                    else:
-                        max_angle = (1 - 1 / num_points) * angle / 2
-                    mesh_centers.extend([corner + offset +
-                                         radius * np.array([np.cos(phi), np.sin(phi)]) for phi in
-                                         (np.arctan2(-offset[1], -offset[0]) +
-                                          np.linspace(-max_angle, max_angle, num_points))])
-        return mesh_centers
+        tasks = [(straight_mesh, (start, end, self.mesh_spacing, center_to_first_row, self.num_mesh_rows))
+                 for start, end in zip(starts, ends)]
+        tasks.extend((arc_mesh, (corner, offset, angle, self.radius, self.mesh_spacing, center_to_first_row,
+                                 self.num_mesh_rows))
+                     for angle, corner, offset in zip(self.angles, self.corners, self.offsets))
+        if pool is not None:
+            results = pool.map(_mesh_task, tasks)
+        elif workers is not None and workers > 1:
+            thread_pool = ThreadPool(workers)
+            try:
+                results = thread_pool.map(_mesh_task, tasks)
+            finally:
+                thread_pool.close()
+        else:
+            results = [_mesh_task(task) for task in tasks]
+        centers = np.vstack([np.empty((0, 2))] + list(results))
+        keep = spatial.separated(centers, self.mesh_spacing / 2)
+        if exclusions:
+            vertices, offsets = geometry.concatenate(exclusions)
+            keep &= ~spatial.inside_rings(centers, vertices, offsets)
+        centers = centers[keep]
+        if geometry_cache is not None:
+            geometry_cache.put(name, {'centers': centers})
+        return centers
 
     def trapezoid_mesh(self):
-        mesh_centers = []
         v = self.end - self.start
         length = np.linalg.norm(v)
-        phi = np.arctan2(v[1], v[0])
-        R = np.array([[np.cos(phi), -np.sin(phi)],
-                      [np.sin(phi), np.cos(phi)]])
         start_to_first_row = self.start_width / 2 + self.start_gap + self.start_mesh_border
         difference_to_first_row = self.end_width / 2 + self.end_gap + self.end_mesh_border - start_to_first_row
-        num_mesh_columns = np.floor(length / self.mesh_spacing)
+        num_mesh_columns = int(np.floor(length / self.mesh_spacing))
         if num_mesh_columns == 0:
             return []
         elif num_mesh_columns == 1:
             x = np.array([length / 2])
         else:
             x = np.linspace(self.mesh_spacing / 2, length - self.mesh_spacing / 2, num_mesh_columns)
-        y = self.mesh_spacing * np.arange(self.num_mesh_rows, dtype=np.float)
+        y = self.mesh_spacing * np.arange(self.num_mesh_rows, dtype=np.float64)
         xxp, yyp = np.meshgrid(x, y)  # These correspond to the positive y-values
         y_shift = start_to_first_row + difference_to_first_row * x / length
         yyp += y_shift
         xx = np.concatenate((xxp, xxp))
         yy = np.concatenate((yyp, -yyp))  # The negative y-values are reflected
-        Rxy = np.dot(R, np.vstack((xx.flatten(), yy.flatten())))
-        mesh_centers.extend(zip(self.start[0] + Rxy[0, :], self.start[1] + Rxy[1, :]))
-        return mesh_centers
+        return [tuple(center) for center in transform(np.column_stack((xx.flatten(), yy.flatten())),
+                                                      np.arctan2(v[1], v[0]), self.start)]
 
 
 class Path(list):
@@ -152,24 +374,112 @@ class Path(list):
     This class is a list subclass intended to hold Elements that are joined sequentially to form a path.
     """
 
-    def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
+    def __init__(self, elements=()):
+        super(Path, self).__init__(elements)
+        # A list of (key, cell, shapes) tuples, one per element, recorded by incremental drawing.
+        self._drawn = []
+
+    def draw(self, cell, origin, positive_layer, negative_layer, result_layer, incremental=False):
         """
         Draw all of the elements contained in this Path into the given cell. The Elements are drawn so that the origin
         of each element after the first is the end of the previous element.
 
+        In incremental mode, this Path records which shapes each element added to the cell, along with a key that
+        contains the element fingerprint, its origin, the cell, and the layers. On the next incremental draw, only the
+        elements whose key has changed are redrawn: their old shapes are deleted and the element is drawn again, while
+        the shapes of all other elements are left alone. Elements are matched by position, so replacing an element
+        redraws only that element if its end point is unchanged, and otherwise also every element after it. The first
+        incremental draw draws everything. The recorded shapes must not be deleted by other code between draws.
+
         :param cell: The Cell into which the result is drawn.
         :param origin: The point to use for the origin of the first Element.
         :param positive_layer: An int representing the positive layer for boolean operations.
         :param negative_layer: An int representing the negative layer for boolean operations.
         :param result_layer: An int that is the layer on which the final result is drawn.
-        :return: None.
+        :param incremental: if True, draw only the elements that have changed since the last incremental draw.
+        :return: if incremental is True, a list of the wrapper Elements added to the cell by this call; otherwise None.
         """
-        # It's crucial to avoiding input modification that this also makes a copy.
-        point = wrapper.to_point(origin)
-        for element in self:
-            element.draw(cell, point, positive_layer, negative_layer, result_layer)
-            # NB: using += produces an error when casting int to float.
-            point = point + element.end
+        # The origins are accumulated in integer database units so that each element starts exactly where the previous
+        # one ends, then converted back so that each element converts its origin to the same integer point.
+        drawing = cell.drawing
+        steps = np.zeros((len(self), 2), dtype=np.int64)
+        if len(self) > 1:
+            np.cumsum([element.database_points(drawing)[-1] for element in self[:-1]], axis=0, out=steps[1:])
+        origins = drawing.from_database_units(drawing.to_database_units(wrapper.to_point(origin)) + steps)
+        if not incremental:
+            for element, point in zip(self, origins):
+                element.draw(cell, point, positive_layer, negative_layer, result_layer)
+            return None
+        layers = (positive_layer, negative_layer, result_layer)
+        keys = [(cell.name, layers, element.fingerprint, tuple(point.tolist()))
+                for element, point in zip(self, origins)]
+        records = []
+        stale = {}
+        for index, key in enumerate(keys):
+            if index < len(self._drawn) and self._drawn[index][0] == key:
+                records.append(self._drawn[index])
+            else:
+                records.append(None)
+        for index, record in enumerate(self._drawn):
+            if index >= len(records) or records[index] is None:
+                _, old_cell, shapes = record
+                stale.setdefault(old_cell.name, (old_cell, []))[1].extend(shapes)
+        for old_cell, shapes in stale.values():
+            old_cell.delete_elements(shapes)
+        added = []
+        for index, element in enumerate(self):
+            if records[index] is None:
+                marker = cell.marker()
+                element.draw(cell, origins[index], positive_layer, negative_layer, result_layer)
+                shapes = cell.elements_since(marker)
+                records[index] = (keys[index], cell, shapes)
+                added.extend(shapes)
+        self._drawn = records
+        return added
+
+    @property
+    def _index(self):
+        """
+        The prefix sums of the element ends and lengths, which are computed when first needed after any change to the
+        list of elements. Since elements are immutable, this is the only way the sums can change.
+
+        :return: a tuple (ends, lengths) of arrays with shapes (n + 1, 2) and (n + 1,) that start with zeros, where n
+            is the number of elements.
+        """
+        index = self.__dict__.get('_prefix_sums')
+        if index is None:
+            ends = np.zeros((len(self) + 1, 2))
+            lengths = np.zeros(len(self) + 1)
+            if len(self):
+                np.cumsum([element.end for element in self], axis=0, out=ends[1:])
+                np.cumsum([element.length for element in self], out=lengths[1:])
+            index = self.__dict__['_prefix_sums'] = (_read_only(ends), _read_only(lengths))
+        return index
+
+    @property
+    def _segment_index(self):
+        """
+        The segment tables of all elements, shifted by the element origins and concatenated, along with the cumulative
+        lengths of the segments. This is computed when first needed after any change to the list of elements.
+
+        :return: a tuple (segments, lengths) of arrays with shapes (M, 5) and (M + 1,).
+        """
+        index = self.__dict__.get('_segment_sums')
+        if index is None:
+            tables = [np.empty((0, 5))]
+            for element, origin in zip(self, self.origins):
+                table = np.array(element.segments)
+                table[:, :2] += origin
+                tables.append(table)
+            segments = np.vstack(tables)
+            lengths = np.zeros(segments.shape[0] + 1)
+            np.cumsum(segments[:, 3], out=lengths[1:])
+            index = self.__dict__['_segment_sums'] = (_read_only(segments), _read_only(lengths))
+        return index
+
+    def _invalidate(self):
+        self.__dict__.pop('_prefix_sums', None)
+        self.__dict__.pop('_segment_sums', None)
 
     @property
     def start(self):
@@ -177,7 +487,7 @@ class Path(list):
 
     @property
     def end(self):
-        return np.sum(np.vstack(element.end for element in self), axis=0)
+        return self._index[0][-1]
 
     @property
     def span(self):
@@ -185,21 +495,142 @@ class Path(list):
 
     @property
     def length(self):
-        return np.sum([element.length for element in self])
+        return self._index[1][-1]
+
+    @property
+    def origins(self):
+        """
+        :return: an array with shape (n, 2) whose row k is the origin of element k relative to the origin of the path.
+        """
+        return self._index[0][:-1]
+
+    @property
+    def cumulative_lengths(self):
+        """
+        :return: an array with shape (n + 1,) whose entry k is the total length of the elements before element k.
+        """
+        return self._index[1]
+
+    def element_at(self, length):
+        """
+        Return the index of the element that contains the point at the given length along the path, and the length
+        along that element, using a binary search. A length that falls exactly on the boundary between two elements
+        belongs to the later element, except at the end of the path.
+
+        :param length: a length, or an array of lengths, between 0 and self.length.
+        :return: a tuple (index, remainder) of ints and floats, or of arrays if an array was given.
+        :raises ValueError: if any length is outside the path.
+        """
+        cumulative = self.cumulative_lengths
+        length = np.asarray(length, dtype=np.float64)
+        if len(self) == 0 or np.any(length < 0) or np.any(length > cumulative[-1]):
+            raise ValueError("Length is outside the path.")
+        index = np.minimum(np.searchsorted(cumulative, length, side='right') - 1, len(self) - 1)
+        remainder = length - cumulative[index]
+        if index.ndim == 0:
+            return int(index), float(remainder)
+        return index, remainder
+
+    @property
+    def arc_length(self):
+        """
+        The length of the path measured along exact circular arcs at the bends. This is the length used by locate(),
+        and it differs slightly from self.length, which is measured along the drawn points.
+        """
+        return self._segment_index[1][-1]
+
+    def locate(self, lengths):
+        """
+        Return the points and tangent angles at the given arc lengths along the path, relative to the path origin. All
+        of the positions are calculated at once using a binary search over the cumulative lengths of the straight and
+        arc segments of all elements.
+
+        :param lengths: a length, or an iterable of N lengths, between 0 and self.arc_length.
+        :return: a tuple (points, angles) of arrays with shapes (N, 2) and (N,), with angles in radians measured
+            counterclockwise from the x-axis.
+        :raises ValueError: if any length is outside the path.
+        """
+        segments, cumulative = self._segment_index
+        lengths = np.atleast_1d(np.asarray(lengths, dtype=np.float64))
+        if segments.shape[0] == 0 or np.any(lengths < 0) or np.any(lengths > cumulative[-1]):
+            raise ValueError("Length is outside the path.")
+        index = np.minimum(np.searchsorted(cumulative, lengths, side='right') - 1, segments.shape[0] - 1)
+        return evaluate_segments(segments[index], lengths - cumulative[index])
+
+    def place(self, cell, reference, lengths, origin=(0, 0), angle=0, rotate=True):
+        """
+        Add references to the given cell at the given arc lengths along this path, all in one call.
+
+        :param cell: the Cell into which the references are added.
+        :param reference: the Cell to be referenced.
+        :param lengths: an iterable of arc lengths along the path; see locate().
+        :param origin: the point used as the origin of the path when it was drawn.
+        :param angle: the orientation of the references in degrees, relative to the path direction if rotate is True.
+        :param rotate: if True, rotate each reference to follow the direction of the path.
+        :return: a list of Cellref objects.
+        """
+        points, angles = self.locate(lengths)
+        if rotate:
+            angle = np.degrees(angles) + angle
+        return cell.add_cells(reference, wrapper.to_point(origin) + points, angle)
+
+
+def _invalidating(name):
+    """
+    Return a version of the given list method that invalidates the cached prefix sums of a Path.
+    """
+    method = getattr(list, name)
+
+    def invalidating_method(self, *args, **kwargs):
+        self._invalidate()
+        return method(self, *args, **kwargs)
+
+    invalidating_method.__name__ = name
+    invalidating_method.__doc__ = method.__doc__
+    return invalidating_method
+
 
+for _name in ('__setitem__', '__delitem__', '__setslice__', '__delslice__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'pop', 'remove', 'reverse', 'sort', 'clear'):
+    if hasattr(list, _name):
+        setattr(Path, _name, _invalidating(_name))
 
-class Element(object):
+
+class Element(_Frozen('_FrozenElement', (object,), {})):
+    """
+    The base class for the components of a Path.
+
+    Elements are immutable after construction, so their points, length, and other derived values are computed only
+    once. To change an element, create a new one and replace the old one in the Path.
+    """
 
     def __init__(self, points, round_to=None):
-        points = wrapper.to_point_list(points)
+        points = np.array(wrapper.to_point_list(points), dtype=np.float64).reshape(-1, 2)
         if round_to is not None:
-            points = [round_to * np.round(p / round_to) for p in points]
-        self._points = points
+            points = round_to * np.round(points / round_to)
+        self._points = tuple(_read_only(p) for p in points)
 
-    @property
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("{} instances are immutable.".format(self.__class__.__name__))
+        super(Element, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("{} instances are immutable.".format(self.__class__.__name__))
+        super(Element, self).__delattr__(name)
+
+    @_cached_property
     def points(self):
         return self._points
 
+    @_cached_property
+    def vertices(self):
+        """
+        :return: a read-only array with shape (N, 2) containing the points of this element.
+        """
+        return _read_only(np.array(self.points, dtype=np.float64).reshape(-1, 2))
+
     @property
     def start(self):
         return self._points[0]
@@ -210,35 +641,113 @@ class Element(object):
 
     @property
     def x(self):
-        return np.array([point[0] for point in self.points])
+        return self.vertices[:, 0]
 
     @property
     def y(self):
-        return np.array([point[1] for point in self.points])
+        return self.vertices[:, 1]
 
-    @property
+    @_cached_property
     def length(self):
         return np.sum(np.hypot(np.diff(self.x), np.diff(self.y)))
 
+    @_cached_property
+    def segments(self):
+        """
+        The segment table of this element relative to its origin; see evaluate_segments(). The base class treats the
+        points as a polyline.
+
+        :return: a read-only array with shape (M, 5).
+        """
+        return _read_only(_straight_segments(self.vertices))
+
+    def database_points(self, drawing, origin=(0, 0)):
+        """
+        Return the points of this element, drawn at the given origin, in integer database units. The points relative
+        to the origin are converted once per database grid and cached, and the origin is converted separately, so two
+        elements whose origins differ by the converted end point of the first share that vertex exactly; Path.draw()
+        accumulates the origins this way.
+
+        :param drawing: the Drawing that determines the units.
+        :param origin: the origin point, in the units of the drawing.
+        :return: an int64 array with shape (N, 2).
+        """
+        cache = self.__dict__.setdefault('_cache', {})
+        key = ('database_points', drawing.grid)
+        if key not in cache:
+            cache[key] = _read_only(drawing.to_database_units(self.vertices))
+        return cache[key] + drawing.to_database_units(np.asarray(origin, dtype=np.float64))
+
+    @_cached_property
+    def fingerprint(self):
+        """
+        A hash of the class and all attributes of this element. Elements with equal fingerprints draw the same shapes
+        when drawn at the same origin.
+
+        :return: a string containing the hexadecimal digest.
+        """
+        sha = hashlib.sha1(type(self).__name__.encode())
+        cache.update_hash(sha, dict((key, value) for key, value in vars(self).items()
+                                    if key not in ('_cache', '_frozen')))
+        return sha.hexdigest()
+
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
         pass
 
 
 class SmoothedElement(Element):
 
-    def __init__(self, outline, radius, points_per_radian, round_to=None):
+    def __init__(self, outline, radius, points_per_radian, round_to=None, tolerance=None):
+        """
+        :param outline: the points of the element before smoothing.
+        :param radius: the radius of the arcs at the bends.
+        :param points_per_radian: the number of points per radian of arc, used if tolerance is None.
+        :param round_to: if not None, round the outline points and the arc points to this grid spacing; adjacent arc
+            points that round to the same point are merged. Using drawing.grid puts every point on the database grid.
+        :param tolerance: if not None, use adaptive mode, in which the number of points in each arc is the smallest
+            number for which the distance between the arc and its chords is at most this value. This is in the same
+            units as the outline, so a tolerance of half a database unit is 0.5 * drawing.grid.
+        """
         super(SmoothedElement, self).__init__(points=outline, round_to=round_to)
         self.radius = radius
         self.points_per_radian = points_per_radian
-        self.bends, self.angles, self.corners, self.offsets = smooth_path(self._points, radius, points_per_radian)
-
-    @property
+        self.tolerance = tolerance
+        bends, angles, corners, offsets = _cached_smooth_path(self._points, radius, points_per_radian,
+                                                              tolerance=tolerance, round_to=round_to)
+        self.bends = tuple(tuple(_read_only(p) for p in bend) for bend in bends)
+        self.angles = tuple(angles)
+        self.corners = tuple(corners)
+        self.offsets = tuple(_read_only(offset) for offset in offsets)
+
+    @_cached_property
     def points(self):
         p = [self.start]
         for bend in self.bends:
             p.extend(bend)
         p.append(self.end)
-        return p
+        return tuple(p)
+
+    @_cached_property
+    def segments(self):
+        """
+        The segment table of this element relative to its origin; see evaluate_segments(). Unlike the points, this
+        uses exact circular arcs for the bends.
+
+        :return: a read-only array with shape (M, 5).
+        """
+        rows = []
+        previous = self.start
+        for angle, corner, offset in zip(self.angles, self.corners, self.offsets):
+            center = corner + offset
+            first = np.arctan2(offset[1], offset[0]) + np.pi - angle / 2
+            arc_start = center + self.radius * np.array([np.cos(first), np.sin(first)])
+            rows.append(_straight_segments(np.vstack((previous, arc_start))))
+            heading = first + np.sign(angle) * np.pi / 2
+            rows.append(np.array([[arc_start[0], arc_start[1], np.arctan2(np.sin(heading), np.cos(heading)),
+                                   self.radius * np.abs(angle), np.sign(angle) / self.radius]]))
+            previous = center + self.radius * np.array([np.cos(first + angle), np.sin(first + angle)])
+        rows.append(_straight_segments(np.vstack((previous, self.end))))
+        return _read_only(np.vstack(rows))
 
 
 class Trace(SmoothedElement):
@@ -249,79 +758,91 @@ class Trace(SmoothedElement):
     """
 
     def __init__(self, outline, width, start_overlap=0, end_overlap=0, radius=None, points_per_radian=60,
-                 round_to=None):
+                 round_to=None, tolerance=None):
         self.width = width
         self.start_overlap = start_overlap
         self.end_overlap = end_overlap
         if radius is None:
             radius = 2 * width
         super(Trace, self).__init__(outline=outline, radius=radius, points_per_radian=points_per_radian,
-                                    round_to=round_to)
+                                    round_to=round_to, tolerance=tolerance)
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
-        origin = wrapper.to_point(origin)
-        points = [origin + point for point in self.points]
-        cell.add_path(points=points, layer=result_layer, width=self.width)
+        drawing = cell.drawing
+        points = self.database_points(drawing, origin)
+        cell.add_path(points=points, layer=result_layer, width=self.width, database=True)
         # Note that the overlap points are not stored or counted in the calculation of the length.
         if self.start_overlap > 0:
             v_start = points[0] - points[1]
             phi_start = np.arctan2(v_start[1], v_start[0])
-            start_points = [points[0],
-                            points[0] + self.start_overlap * np.array([np.cos(phi_start), np.sin(phi_start)])]
-            cell.add_path(points=start_points, layer=result_layer, width=self.width)
+            start_points = [points[0], points[0] + drawing.to_database_units(
+                self.start_overlap * np.array([np.cos(phi_start), np.sin(phi_start)]))]
+            cell.add_path(points=start_points, layer=result_layer, width=self.width, database=True)
         if self.end_overlap > 0:
             v_end = points[-1] - points[-2]
             phi_end = np.arctan2(v_end[1], v_end[0])
-            end_points = [points[-1],
-                          points[-1] + self.end_overlap * np.array([np.cos(phi_end), np.sin(phi_end)])]
-            cell.add_path(points=end_points, layer=result_layer, width=self.width)
+            end_points = [points[-1], points[-1] + drawing.to_database_units(
+                self.end_overlap * np.array([np.cos(phi_end), np.sin(phi_end)]))]
+            cell.add_path(points=end_points, layer=result_layer, width=self.width, database=True)
 
 
 class CPW(SmoothedElement):
 
-    def __init__(self, outline, width, gap, radius=None, points_per_radian=60, round_to=None):
+    def __init__(self, outline, width, gap, radius=None, points_per_radian=60, round_to=None, tolerance=None):
         self.width = width
         self.gap = gap
         if radius is None:
             radius = width / 2 + gap
         super(CPW, self).__init__(outline=outline, radius=radius, points_per_radian=points_per_radian,
-                                  round_to=round_to)
+                                  round_to=round_to, tolerance=tolerance)
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
-        points = [wrapper.to_point(origin) + point for point in self.points]
-        cell.add_path(points, negative_layer, self.width)
-        cell.add_path(points, positive_layer, self.width + 2 * self.gap)
+        points = self.database_points(cell.drawing, origin)
+        cell.add_path(points, negative_layer, self.width, database=True)
+        cell.add_path(points, positive_layer, self.width + 2 * self.gap, database=True)
         cell.subtract(positive_layer=positive_layer, negative_layer=negative_layer, result_layer=result_layer)
 
 
 class CPWBlank(SmoothedElement):
 
-    def __init__(self, outline, width, gap, radius=None, points_per_radian=60, round_to=None):
+    def __init__(self, outline, width, gap, radius=None, points_per_radian=60, round_to=None, tolerance=None):
         self.width = width
         self.gap = gap
         if radius is None:
             radius = width / 2 + gap
         super(CPWBlank, self).__init__(outline=outline, radius=radius, points_per_radian=points_per_radian,
-                                       round_to=round_to)
+                                       round_to=round_to, tolerance=tolerance)
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
-        points = [wrapper.to_point(origin) + point for point in self.points]
-        cell.add_path(points, positive_layer, self.width + 2 * self.gap)
+        points = self.database_points(cell.drawing, origin)
+        cell.add_path(points, positive_layer, self.width + 2 * self.gap, database=True)
         cell.subtract(positive_layer=positive_layer, negative_layer=negative_layer, result_layer=result_layer)
 
 
 class CPWMesh(CPW, Mesh):
 
     def __init__(self, outline, width, gap, mesh_spacing, mesh_border, mesh_radius, num_circle_points, num_mesh_rows,
-                 radius=None, points_per_radian=60, round_to=None):
+                 radius=None, points_per_radian=60, round_to=None, tolerance=None, mesh_workers=None,
+                 mesh_exclusions=()):
+        """
+        See SmoothedElement and Mesh.path_mesh() for the arguments that are not specific to this class.
+
+        :param mesh_workers: if greater than 1, mesh the sections of this element in parallel using this many threads;
+            this does not change the result.
+        :param mesh_exclusions: an iterable of polygons, in the coordinates of this element, inside which no mesh holes
+            are made, such as the outlines of other components that overlap the ground plane.
+        """
         super(CPWMesh, self).__init__(outline=outline, width=width, gap=gap, radius=radius,
-                                      points_per_radian=points_per_radian, round_to=round_to)
+                                      points_per_radian=points_per_radian, round_to=round_to, tolerance=tolerance)
         self.mesh_spacing = mesh_spacing
         self.mesh_radius = mesh_radius
         self.mesh_border = mesh_border
         self.num_circle_points = num_circle_points
         self.num_mesh_rows = num_mesh_rows
-        self.mesh_centers = self.path_mesh()
+        self.mesh_exclusions = tuple(_read_only(np.array(polygon, dtype=np.float64).reshape(-1, 2))
+                                     for polygon in mesh_exclusions)
+        self.mesh_centers = tuple(map(tuple, self.path_mesh(workers=mesh_workers,
+                                                            exclusions=self.mesh_exclusions).tolist()))
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
         super(CPWMesh, self).draw(cell=cell, origin=origin, positive_layer=positive_layer,
@@ -334,15 +855,27 @@ class CPWMesh(CPW, Mesh):
 class CPWBlankMesh(CPWBlank, Mesh):
 
     def __init__(self, outline, width, gap, mesh_spacing, mesh_border, mesh_radius, num_circle_points, num_mesh_rows,
-                 radius=None, points_per_radian=60, round_to=None):
+                 radius=None, points_per_radian=60, round_to=None, tolerance=None, mesh_workers=None,
+                 mesh_exclusions=()):
+        """
+        See SmoothedElement and Mesh.path_mesh() for the arguments that are not specific to this class.
+
+        :param mesh_workers: if greater than 1, mesh the sections of this element in parallel using this many threads;
+            this does not change the result.
+        :param mesh_exclusions: an iterable of polygons, in the coordinates of this element, inside which no mesh holes
+            are made, such as the outlines of other components that overlap the ground plane.
+        """
         super(CPWBlankMesh, self).__init__(outline=outline, width=width, gap=gap, radius=radius,
-                                           points_per_radian=points_per_radian, round_to=round_to)
+                                           points_per_radian=points_per_radian, round_to=round_to, tolerance=tolerance)
         self.mesh_spacing = mesh_spacing
         self.mesh_radius = mesh_radius
         self.mesh_border = mesh_border
         self.num_circle_points = num_circle_points
         self.num_mesh_rows = num_mesh_rows
-        self.mesh_centers = self.path_mesh()
+        self.mesh_exclusions = tuple(_read_only(np.array(polygon, dtype=np.float64).reshape(-1, 2))
+                                     for polygon in mesh_exclusions)
+        self.mesh_centers = tuple(map(tuple, self.path_mesh(workers=mesh_workers,
+                                                            exclusions=self.mesh_exclusions).tolist()))
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
         super(CPWBlankMesh, self).draw(cell=cell, origin=origin, positive_layer=positive_layer,
@@ -355,23 +888,24 @@ class CPWBlankMesh(CPWBlank, Mesh):
 class CPWElbowCoupler(SmoothedElement):
 
     def __init__(self, tip_point, elbow_point, joint_point, width, gap, radius=None, points_per_radian=60,
-                 round_to=None):
+                 round_to=None, tolerance=None):
         self.width = width
         self.gap = gap
         if radius is None:
             radius = width / 2 + gap
         super(CPWElbowCoupler, self).__init__(outline=[tip_point, elbow_point, joint_point], radius=radius,
-                                              points_per_radian=points_per_radian, round_to=round_to)
+                                              points_per_radian=points_per_radian, round_to=round_to,
+                                              tolerance=tolerance)
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer, round_tip=True):
-        points = [wrapper.to_point(origin) + point for point in self.points]
-        cell.add_path(points, negative_layer, self.width)
-        cell.add_path(points, positive_layer, self.width + 2 * self.gap)
+        points = self.database_points(cell.drawing, origin)
+        cell.add_path(points, negative_layer, self.width, database=True)
+        cell.add_path(points, positive_layer, self.width + 2 * self.gap, database=True)
         if round_tip:
             v = points[0] - points[1]
             theta = np.degrees(np.arctan2(v[1], v[0]))
-            cell.add_polygon_arc(points[0], self.width / 2, self.width / 2 + self.gap, result_layer,
-                                 theta - 90, theta + 90)
+            tip = cell.drawing.from_database_units(points[0])
+            cell.add_polygon_arc(tip, self.width / 2, self.width / 2 + self.gap, result_layer, theta - 90, theta + 90)
         else:
             raise NotImplementedError("Need to code this up.")
         cell.subtract(positive_layer=positive_layer, negative_layer=negative_layer, result_layer=result_layer)
@@ -380,21 +914,23 @@ class CPWElbowCoupler(SmoothedElement):
 class CPWElbowCouplerBlank(SmoothedElement):
 
     def __init__(self, tip_point, elbow_point, joint_point, width, gap, radius=None, points_per_radian=60,
-                 round_to=None):
+                 round_to=None, tolerance=None):
         self.width = width
         self.gap = gap
         if radius is None:
             radius = width / 2 + gap
         super(CPWElbowCouplerBlank, self).__init__(outline=[tip_point, elbow_point, joint_point], radius=radius,
-                                                   points_per_radian=points_per_radian, round_to=round_to)
+                                                   points_per_radian=points_per_radian, round_to=round_to,
+                                                   tolerance=tolerance)
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer, round_tip=True):
-        points = [wrapper.to_point(origin) + point for point in self.points]
-        cell.add_path(points, result_layer, self.width + 2 * self.gap)
+        points = self.database_points(cell.drawing, origin)
+        cell.add_path(points, result_layer, self.width + 2 * self.gap, database=True)
         if round_tip:
             v = points[0] - points[1]
             theta = np.degrees(np.arctan2(v[1], v[0]))
-            cell.add_polygon_arc(points[0], 0, self.width / 2 + self.gap, result_layer, theta - 90, theta + 90)
+            tip = cell.drawing.from_database_units(points[0])
+            cell.add_polygon_arc(tip, 0, self.width / 2 + self.gap, result_layer, theta - 90, theta + 90)
         else:
             raise NotImplementedError("Need to code this up.")
 
@@ -416,45 +952,89 @@ class CPWTransition(Element):
         self.end_width = end_width
         self.end_gap = end_gap
 
-    def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
+    @_cached_property
+    def direction(self):
+        """
+        :return: the angle in radians from the start point to the end point, measured counterclockwise from the x-axis.
+        """
         v = self.end - self.start
-        phi = np.arctan2(v[1], v[0])
-        rotation = np.array([[np.cos(phi), -np.sin(phi)],
-                             [np.sin(phi), np.cos(phi)]])
-        upper = [(0, self.start_width / 2),
-                 (0, self.start_width / 2 + self.start_gap),
-                 (self.length, self.end_width / 2 + self.end_gap),
-                 (self.length, self.end_width / 2)]
-        lower = [(x, -y) for x, y in upper]
-        upper_rotated = [np.dot(rotation, wrapper.to_point(p).T).T for p in upper]
-        lower_rotated = [np.dot(rotation, wrapper.to_point(p).T).T for p in lower]
-        upper_rotated_shifted = [wrapper.to_point(origin) + self.start + p for p in upper_rotated]
-        lower_rotated_shifted = [wrapper.to_point(origin) + self.start + p for p in lower_rotated]
-        cell.add_polygon(upper_rotated_shifted, result_layer)
-        cell.add_polygon(lower_rotated_shifted, result_layer)
-
-
-class CPWTransitionBlank(Element):
+        return np.arctan2(v[1], v[0])
 
-    def __init__(self, start_point, end_point, start_width, end_width, start_gap, end_gap, round_to=None):
-        super(CPWTransitionBlank, self).__init__(points=[start_point, end_point], round_to=round_to)
-        self.start_width = start_width
-        self.start_gap = start_gap
-        self.end_width = end_width
-        self.end_gap = end_gap
+    @_cached_property
+    def outlines(self):
+        """
+        The polygons of this transition in a frame in which it starts at (0, 0) and points along the x-axis.
+
+        :return: a read-only array with shape (2, 4, 2) containing the upper and lower gap polygons.
+        """
+        upper = np.array([(0, self.start_width / 2),
+                          (0, self.start_width / 2 + self.start_gap),
+                          (self.length, self.end_width / 2 + self.end_gap),
+                          (self.length, self.end_width / 2)])
+        return _read_only(np.stack((upper, upper * np.array([1, -1]))))
+
+    @_cached_property
+    def polygons(self):
+        """
+        :return: a read-only array containing the polygons of this transition relative to its origin.
+        """
+        return _read_only(transform(self.outlines, self.direction, self.start))
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
-        v = self.end - self.start
-        phi = np.arctan2(v[1], v[0])
-        rotation = np.array([[np.cos(phi), -np.sin(phi)],
-                             [np.sin(phi), np.cos(phi)]])
-        poly = [(0, self.start_width / 2 + self.start_gap),
-                (self.length, self.end_width / 2 + self.end_gap),
-                (self.length, -self.end_width / 2 - self.end_gap),
-                (0, -self.start_width / 2 - self.start_gap)]
-        poly_rotated = [np.dot(rotation, wrapper.to_point(p).T).T for p in poly]
-        poly_rotated_shifted = [wrapper.to_point(origin) + self.start + p for p in poly_rotated]
-        cell.add_polygon(poly_rotated_shifted, result_layer)
+        drawing = cell.drawing
+        polygons = drawing.to_database_units(self.polygons) + drawing.to_database_units(wrapper.to_point(origin))
+        for polygon in polygons:
+            cell.add_polygon(polygon, result_layer, database=True)
+
+
+class CPWTransitionBlank(CPWTransition):
+
+    @_cached_property
+    def outlines(self):
+        """
+        The polygon of this transition in a frame in which it starts at (0, 0) and points along the x-axis.
+
+        :return: a read-only array with shape (1, 4, 2) containing the polygon that covers the trace and gaps.
+        """
+        return _read_only(np.array([[(0, self.start_width / 2 + self.start_gap),
+                                     (self.length, self.end_width / 2 + self.end_gap),
+                                     (self.length, -self.end_width / 2 - self.end_gap),
+                                     (0, -self.start_width / 2 - self.start_gap)]]))
+
+
+def transition_polygons(transitions, origins=(0, 0)):
+    """
+    Return the polygons of many transitions at once. The outlines of all transitions are stacked and then rotated and
+    translated with a single vectorized matrix multiplication. Mesh holes are not included.
+
+    :param transitions: a sequence of M CPWTransition objects, including any subclasses.
+    :param origins: a single point, or an array with shape (M, 2) containing the origin of each transition.
+    :return: an array with shape (K, 4, 2) containing the polygons of all transitions, in order.
+    """
+    if not len(transitions):
+        return np.empty((0, 4, 2))
+    outlines = [transition.outlines for transition in transitions]
+    counts = [outline.shape[0] for outline in outlines]
+    angles = np.repeat([transition.direction for transition in transitions], counts)
+    shifts = np.repeat(np.vstack([transition.start for transition in transitions]) +
+                       np.asarray(origins, dtype=np.float64), counts, axis=0)
+    cosine, sine = np.cos(angles), np.sin(angles)
+    rotations = np.stack((np.column_stack((cosine, -sine)), np.column_stack((sine, cosine))), axis=1)
+    return np.einsum('kij,kvj->kvi', rotations, np.concatenate(outlines)) + shifts[:, np.newaxis, :]
+
+
+def draw_transitions(cell, transitions, origins, layer):
+    """
+    Draw the polygons of many transitions into the given cell; see transition_polygons().
+
+    :param cell: the Cell into which the polygons are drawn.
+    :param transitions: a sequence of M CPWTransition objects, including any subclasses.
+    :param origins: a single point, or an array with shape (M, 2) containing the origin of each transition.
+    :param layer: the layer on which the polygons are drawn.
+    :return: a list of the Polygon objects.
+    """
+    polygons = cell.drawing.to_database_units(transition_polygons(transitions, origins))
+    return [cell.add_polygon(polygon, layer, database=True) for polygon in polygons]
 
 
 class CPWTransitionMesh(CPWTransition, Mesh):
@@ -470,7 +1050,7 @@ class CPWTransitionMesh(CPWTransition, Mesh):
         self.mesh_radius = mesh_radius
         self.num_circle_points = num_circle_points
         self.num_mesh_rows = num_mesh_rows
-        self.mesh_centers = self.trapezoid_mesh()
+        self.mesh_centers = tuple(self.trapezoid_mesh())
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
         super(CPWTransitionMesh, self).draw(cell=cell, origin=origin, positive_layer=positive_layer,
@@ -493,7 +1073,7 @@ class CPWTransitionBlankMesh(CPWTransitionBlank, Mesh):
         self.mesh_radius = mesh_radius
         self.num_circle_points = num_circle_points
         self.num_mesh_rows = num_mesh_rows
-        self.mesh_centers = self.trapezoid_mesh()
+        self.mesh_centers = tuple(self.trapezoid_mesh())
 
     def draw(self, cell, origin, positive_layer, negative_layer, result_layer):
         super(CPWTransitionBlankMesh, self).draw(cell=cell, origin=origin, positive_layer=positive_layer,
@@ -0,0 +1,113 @@
+"""
+This module packs many cells of different sizes onto a die.
+
+The cells are represented by their bounding boxes, from metrics.cell_bounding_box(), and packed with the skyline
+bottom-left heuristic: the cells are sorted by decreasing height, and each is placed at the lowest position along the
+upper outline of the cells already placed (the skyline) where it fits, preferring the leftmost such position. Each cell
+is surrounded by a keep-out margin, and the die edges can have a margin of their own. The skyline contains at most one
+segment per cell along the top of the packing, and each placement examines it with whole-array operations, so the time
+is dominated by the initial sort even for thousands of cells. The references are then added with one Cell.add_cells()
+call for each distinct cell.
+
+Example:
+    result = placement.place(die, test_structures, die_box=(0, 0, 10000, 10000), margin=50, edge_margin=500)
+    result.placed  # False for any cell that did not fit.
+"""
+from __future__ import division
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import metrics
+
+Placement = namedtuple('Placement', ['origins', 'placed', 'cellrefs'])
+Placement.__doc__ = """
+The result of place(). The origins array with shape (N, 2) contains the origin of the reference to each cell, and
+placed is a boolean array that is False for the cells that did not fit on the die, whose origins are NaN. The cellrefs
+list contains the new Cellref for each placed cell, or None.
+"""
+
+
+def pack(sizes, width, height):
+    """
+    Pack rectangles into a larger rectangle with the skyline bottom-left heuristic; see the module docstring.
+
+    :param sizes: an array with shape (N, 2) containing the width and height of each rectangle.
+    :param width: the width of the rectangle into which they are packed.
+    :param height: the height of the rectangle into which they are packed.
+    :return: a tuple (positions, placed) where positions is an array with shape (N, 2) containing the lower left
+        corner of each rectangle relative to the lower left corner of the packing area, or NaN for the rectangles that
+        did not fit, and placed is a boolean array.
+    """
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    positions = np.full(sizes.shape, np.nan)
+    placed = np.zeros(sizes.shape[0], dtype=bool)
+    # Segment k of the skyline starts at starts[k], ends where the next one starts or at the width, and has the given
+    # height; the final -inf is a sentinel that lets np.maximum.reduceat() take the maximum over overlapping ranges.
+    starts = np.zeros(1)
+    heights = np.array([0, -np.inf])
+    for index in np.lexsort((-sizes[:, 0], -sizes[:, 1])):
+        w, h = sizes[index]
+        stops = starts + w
+        lasts = np.searchsorted(starts, stops, side='left') - 1
+        # The rectangle must rest on the highest segment that it spans.
+        bounds = np.column_stack((np.arange(starts.size), lasts + 1)).ravel()
+        bases = np.maximum.reduceat(heights, bounds)[::2]
+        fits = (stops <= width) & (bases + h <= height)
+        if not fits.any():
+            continue
+        best = np.flatnonzero(fits)[np.argmin(bases[fits])]
+        x = starts[best]
+        y = bases[best]
+        positions[index] = x, y
+        placed[index] = True
+        last = lasts[best]
+        end = starts[last + 1] if last + 1 < starts.size else width
+        new_starts = [starts[:best], [x]]
+        new_heights = [heights[:best], [y + h]]
+        if end > x + w:
+            new_starts.append([x + w])
+            new_heights.append([heights[last]])
+        starts = np.concatenate(new_starts + [starts[last + 1:]])
+        heights = np.concatenate(new_heights + [heights[last + 1:]])
+        # Merge neighboring segments with equal heights, which keeps the skyline short.
+        keep = np.concatenate(([True], heights[1:-1] != heights[:-2], [True]))
+        starts = starts[keep[:-1]]
+        heights = heights[keep]
+    return positions, placed
+
+
+def place(cell, cells, die_box, margin=0, edge_margin=0, box_cache=None):
+    """
+    Pack references to the given cells into the given die area of a cell; see the module docstring.
+
+    :param cell: the Cell to which the references are added.
+    :param cells: a list of the Cells to place; a cell may appear more than once.
+    :param die_box: the area available for the cells, as (x_min, y_min, x_max, y_max).
+    :param margin: the minimum space between the bounding boxes of neighboring cells.
+    :param edge_margin: the minimum space between the bounding boxes of the cells and the edges of the die area.
+    :param box_cache: a dict of bounding boxes to reuse; see metrics.cell_bounding_box().
+    :return: a Placement tuple.
+    """
+    if box_cache is None:
+        box_cache = {}
+    boxes = OrderedDict()
+    for child in cells:
+        if child.name not in boxes:
+            box = metrics.cell_bounding_box(child, cache=box_cache)
+            boxes[child.name] = np.zeros(4) if box is None else box
+    cell_boxes = np.array([boxes[child.name] for child in cells]).reshape(-1, 4)
+    x_min, y_min, x_max, y_max = die_box
+    # Each cell is padded by the margin on its right and top, so the area is extended by the margin to match.
+    sizes = cell_boxes[:, 2:] - cell_boxes[:, :2] + margin
+    positions, placed = pack(sizes, x_max - x_min - 2 * edge_margin + margin, y_max - y_min - 2 * edge_margin + margin)
+    origins = positions + np.array([x_min + edge_margin, y_min + edge_margin]) - cell_boxes[:, :2]
+    cellrefs = [None] * len(cells)
+    names = np.array([child.name for child in cells])
+    unique = OrderedDict((child.name, child) for child in cells)
+    for name, child in unique.items():
+        indices = np.flatnonzero((names == name) & placed)
+        for index, cellref in zip(indices, cell.add_cells(child, origins[indices])):
+            cellrefs[index] = cellref
+    return Placement(origins=origins, placed=placed, cellrefs=cellrefs)
@@ -0,0 +1,305 @@
+"""
+This module renders a cell to an image, for previews on machines without LayoutEditor.
+
+The image is computed directly from the cell geometry. Each layer is rasterized to a boolean mask by a scanline fill:
+each edge of each shape is intersected with the horizontal lines through the centers of the pixel rows that it crosses,
+the crossings are sorted and paired within each shape and row, and each pair fills the pixels whose centers lie between
+them. All of the shapes on a layer are filled together with whole-array operations. A shape that is smaller than one
+pixel in either direction, such as a mesh hole in a full chip preview, is simplified to the pixels touched by its
+bounding box, or omitted.
+
+Each referenced cell is rendered once at the scale of the image, as a thumbnail with a mask for each layer, and the
+thumbnail is copied into the image at each instance of the reference, so a cell array with thousands of instances costs
+little more than a single instance. Thumbnails are aligned to the pixel grid of the cell that they come from, and each
+instance is placed at the nearest whole pixel, so shapes in referenced cells can be displaced by up to half a pixel.
+Rotated and mirrored references are handled by resampling the thumbnail, and scaled references by rendering a thumbnail
+at the corresponding scale.
+
+The layers are drawn in increasing order, each blended over the layers below it with a fixed opacity. The image can be
+saved as a PNG file, which is written with zlib, without any imaging library.
+
+Example:
+    image = render.render(chip, width=2000)
+    render.save_png('chip.png', image)
+"""
+from __future__ import division
+
+import struct
+import zlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import geometry, metrics, wrapper
+
+# The colors of the layers, which are used in turn in order of layer number.
+PALETTE = ((31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40), (148, 103, 189), (140, 86, 75),
+           (227, 119, 194), (127, 127, 127), (188, 189, 34), (23, 190, 207))
+
+Raster = namedtuple('Raster', ['column', 'row', 'layers', 'masks'])
+Raster.__doc__ = """
+A cell rendered with a given pixel size. The masks array has shape (L, H, W) and contains a boolean mask for each of
+the L layers in the layers tuple. Row 0 is at the bottom. Pixel (i, j) of each mask covers the square of cell
+coordinates whose lower left corner is ((column + j) * pixel, (row + i) * pixel), so the pixel grid is aligned to the
+cell origin.
+"""
+
+
+def _fill(mask, column, row, vertices, offsets, pixel, small):
+    """
+    Fill the given rings into a mask in place; see the module docstring.
+
+    :param mask: a boolean array with shape (H, W) whose pixel (0, 0) is pixel (column, row) of the grid.
+    :param vertices: the (N, 2) vertex array of the rings, in database units.
+    :param offsets: the offsets array of M closed shapes.
+    :param pixel: the size of a pixel in database units.
+    :param small: 'box' to draw shapes smaller than a pixel as the pixels touched by their bounding boxes, or 'cull' to
+        omit them.
+    """
+    height, width = mask.shape
+    points = np.asarray(vertices, dtype=np.float64) / pixel - [column, row]
+    boxes = geometry.bounding_boxes(points, offsets)
+    visible = (boxes[:, 2] >= 0) & (boxes[:, 0] <= width) & (boxes[:, 3] >= 0) & (boxes[:, 1] <= height)
+    tiny = (boxes[:, 2] - boxes[:, 0] < 1) | (boxes[:, 3] - boxes[:, 1] < 1)
+    # Each filled run of pixels adds 1 at its first pixel and subtracts 1 after its last, in a row with one extra pixel.
+    runs = []
+    if small == 'box':
+        low = np.floor(boxes[visible & tiny]).astype(np.int64)
+        rows, owners = geometry.expand_ranges(np.clip(low[:, 1], 0, height), np.clip(low[:, 3] + 1, 0, height))
+        runs.append((rows, np.clip(low[owners, 0], 0, width), np.clip(low[owners, 2] + 1, 0, width)))
+    elif small != 'cull':
+        raise ValueError("small must be 'box' or 'cull'.")
+    points, offsets = geometry.select(points, offsets, np.flatnonzero(visible & ~tiny))
+    following = np.arange(1, points.shape[0] + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    owners = geometry.shape_indices(offsets)
+    a = points
+    b = points[following]
+    low_y = np.minimum(a[:, 1], b[:, 1])
+    high_y = np.maximum(a[:, 1], b[:, 1])
+    # An edge crosses the center of each row with low_y <= row + 0.5 < high_y, so each shape crosses each row an even
+    # number of times.
+    rows, edges = geometry.expand_ranges(np.clip(np.ceil(low_y - 0.5), 0, height).astype(np.int64),
+                                         np.clip(np.ceil(high_y - 0.5), 0, height).astype(np.int64))
+    a = a[edges]
+    b = b[edges]
+    x = a[:, 0] + (rows + 0.5 - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+    order = np.lexsort((x, rows, owners[edges]))
+    rows = rows[order[0::2]]
+    starts = np.clip(np.ceil(x[order[0::2]] - 0.5), 0, width).astype(np.int64)
+    stops = np.clip(np.ceil(x[order[1::2]] - 0.5), 0, width).astype(np.int64)
+    runs.append((rows, starts, stops))
+    rows, starts, stops = [np.concatenate(arrays) for arrays in zip(*runs)]
+    size = height * (width + 1)
+    changes = (np.bincount(rows * (width + 1) + starts, minlength=size) -
+               np.bincount(rows * (width + 1) + stops, minlength=size))
+    mask |= np.cumsum(changes.reshape(height, width + 1), axis=1)[:, :width] > 0
+
+
+def _transform(raster, angle, mirror_x):
+    """
+    Return a raster mirrored about the x-axis, if mirror_x is True, and then rotated by the given angle in degrees about
+    the origin, by sampling the nearest pixel.
+    """
+    if angle % 360 == 0 and not mirror_x:
+        return raster
+    _, height, width = raster.masks.shape
+    radians = np.radians(angle)
+    rotation = np.array([[np.cos(radians), -np.sin(radians)], [np.sin(radians), np.cos(radians)]])
+    # Rotations by multiples of 90 degrees are exact, so that they do not shift any pixels.
+    rotation = np.where(np.abs(rotation) < 1e-12, 0, rotation)
+    flip = np.array([1, -1 if mirror_x else 1])
+    corners = np.array([[0, 0], [width, 0], [width, height], [0, height]]) + [raster.column, raster.row]
+    corners = (corners * flip).dot(rotation.T)
+    low = np.floor(corners.min(axis=0) + 1e-9).astype(np.int64)
+    high = np.ceil(corners.max(axis=0) - 1e-9).astype(np.int64)
+    columns, rows = np.meshgrid(np.arange(low[0], high[0]), np.arange(low[1], high[1]))
+    centers = np.column_stack((columns.ravel(), rows.ravel())) + 0.5
+    # The inverse of a rotation is its transpose, and the mirror is its own inverse.
+    sources = np.floor(centers.dot(rotation) * flip).astype(np.int64) - [raster.column, raster.row]
+    inside = (sources[:, 0] >= 0) & (sources[:, 0] < width) & (sources[:, 1] >= 0) & (sources[:, 1] < height)
+    masks = np.zeros((len(raster.layers), columns.size), dtype=bool)
+    masks[:, inside] = raster.masks[:, sources[inside, 1], sources[inside, 0]]
+    return Raster(column=int(low[0]), row=int(low[1]), layers=raster.layers, masks=masks.reshape(-1, *columns.shape))
+
+
+def _instances(table, row):
+    """
+    :return: an array with shape (K, 2) containing the translation of each instance of the reference in the given row,
+        in database units.
+    """
+    start = table.offsets[row]
+    origin = table.points[start].astype(np.float64)
+    if table.types[row] != wrapper.CELLREF_ARRAY:
+        return origin[np.newaxis, :]
+    steps = table.points[start + 1:start + 3] - origin
+    j, i = np.meshgrid(np.arange(table.repeats[row, 1]), np.arange(table.repeats[row, 0]))
+    return origin + i.reshape(-1, 1) * steps[0] + j.reshape(-1, 1) * steps[1]
+
+
+def _raster(cell, pixel, layers, small, cache, window=None):
+    """
+    Render the given cell, and the cells that it references, with the given pixel size.
+
+    :param layers: a sorted tuple of the layers to render, or None for all layers.
+    :param cache: a dict of the rasters of referenced cells.
+    :param window: if not None, a tuple (column, row, width, height) of the pixels to render; otherwise all of the
+        pixels that the cell covers are rendered, and the result is stored in the cache.
+    :return: a Raster, or None if the cell has no shapes on the given layers.
+    """
+    key = (cell.name, pixel, layers, small)
+    if window is None and key in cache:
+        return cache[key]
+    table = cell.element_table()
+    vertices, offsets, rows = table.outlines(layers)
+    shape_layers = table.layers[rows]
+    # Each placement is a tuple (raster, column, row) of a transformed thumbnail and the pixel at which it is placed.
+    placements = []
+    for row, child in table.references():
+        thumbnail = _raster(child, pixel / table.scales[row], layers, small, cache)
+        if thumbnail is None:
+            continue
+        thumbnail = _transform(thumbnail, table.angles[row], table.mirrors[row])
+        for shift in np.rint(_instances(table, row) / pixel).astype(np.int64).tolist():
+            placements.append((thumbnail, thumbnail.column + shift[0], thumbnail.row + shift[1]))
+    all_layers = sorted(set(shape_layers.tolist()).union(*[placement[0].layers for placement in placements]))
+    if window is not None:
+        column, row, width, height = window
+    elif all_layers:
+        boxes = np.floor(geometry.bounding_boxes(vertices, offsets) / pixel).astype(np.int64)
+        boxes[:, 2:] += 1
+        boxes = np.vstack([boxes] + [[c, r, c + raster.masks.shape[2], r + raster.masks.shape[1]]
+                                     for raster, c, r in placements])
+        column, row = boxes[:, :2].min(axis=0)
+        width, height = boxes[:, 2:].max(axis=0) - [column, row]
+    else:
+        cache[key] = None
+        return None
+    masks = np.zeros((len(all_layers), height, width), dtype=bool)
+    for index, layer in enumerate(all_layers):
+        selected = np.flatnonzero(shape_layers == layer)
+        if selected.size:
+            _fill(masks[index], column, row, *geometry.select(vertices, offsets, selected), pixel=pixel, small=small)
+    for raster, c, r in placements:
+        # Clip the thumbnail to the masks.
+        _, h, w = raster.masks.shape
+        x0 = max(c, column)
+        y0 = max(r, row)
+        x1 = min(c + w, column + width)
+        y1 = min(r + h, row + height)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        indices = [all_layers.index(layer) for layer in raster.layers]
+        masks[indices, y0 - row:y1 - row, x0 - column:x1 - column] |= raster.masks[:, y0 - r:y1 - r, x0 - c:x1 - c]
+    result = Raster(column=int(column), row=int(row), layers=tuple(all_layers), masks=masks)
+    if window is None:
+        cache[key] = result
+    return result
+
+
+def layer_masks(cell, width=1024, box=None, layers=None, small='box', cache=None):
+    """
+    Rasterize each layer of a cell and of the cells that it references; see the module docstring.
+
+    :param cell: a wrapper.Cell.
+    :param width: the width of the image in pixels; the height follows from the box.
+    :param box: the area to render as (x_min, y_min, x_max, y_max) in the units of the drawing; if None, the bounding
+        box of the cell is used.
+    :param layers: an iterable of the layers to render, or None for all layers.
+    :param small: 'box' to draw shapes smaller than a pixel as the pixels touched by their bounding boxes, or 'cull' to
+        omit them.
+    :param cache: a dict in which the thumbnails of referenced cells are stored; passing the same dict to several calls
+        with the same width and box avoids rendering the cells again. It must not be reused after any of these cells
+        change.
+    :return: an OrderedDict with integer layer keys, in increasing order, and boolean arrays with shape (height, width),
+        whose first row is at the top of the image.
+    """
+    if cache is None:
+        cache = {}
+    if box is None:
+        box = metrics.cell_bounding_box(cell)
+        if box is None:
+            return OrderedDict()
+    x_min, y_min, x_max, y_max = cell.drawing.units.to_database(box)
+    pixel = max(x_max - x_min, 1) / width
+    column = int(np.floor(x_min / pixel))
+    row = int(np.floor(y_min / pixel))
+    height = max(int(np.ceil((y_max - y_min) / pixel)), 1)
+    if layers is not None:
+        layers = tuple(sorted(set(int(layer) for layer in layers)))
+    raster = _raster(cell, pixel, layers, small, cache, window=(column, row, int(width), height))
+    if raster is None:
+        return OrderedDict()
+    return OrderedDict((layer, mask[::-1]) for layer, mask in zip(raster.layers, raster.masks))
+
+
+def render(cell, width=1024, box=None, layers=None, colors=None, background=(255, 255, 255), opacity=0.6,
+           small='box', cache=None):
+    """
+    Render a cell and the cells that it references to an RGB image; see the module docstring and layer_masks().
+
+    :param cell: a wrapper.Cell.
+    :param width: the width of the image in pixels; the height follows from the box.
+    :param box: the area to render as (x_min, y_min, x_max, y_max) in the units of the drawing; if None, the bounding
+        box of the cell is used.
+    :param layers: an iterable of the layers to render, or None for all layers.
+    :param colors: a dict from layer numbers to (red, green, blue) tuples; layers that it does not contain are colored
+        from PALETTE.
+    :param background: the (red, green, blue) color of the background.
+    :param opacity: the opacity of each layer, from 0 to 1.
+    :param small: 'box' or 'cull'; see layer_masks().
+    :param cache: a dict of thumbnails; see layer_masks().
+    :return: a uint8 array with shape (height, width, 3), whose first row is at the top of the image.
+    """
+    if colors is None:
+        colors = {}
+    masks = layer_masks(cell, width=width, box=box, layers=layers, small=small, cache=cache)
+    shape = next(iter(masks.values())).shape if masks else (1, int(width))
+    image = np.empty(shape + (3,))
+    image[:] = background
+    for layer, mask in masks.items():
+        color = np.asarray(colors.get(layer, PALETTE[layer % len(PALETTE)]), dtype=np.float64)
+        image[mask] = (1 - opacity) * image[mask] + opacity * color
+    return np.rint(image).astype(np.uint8)
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def png_bytes(image, level=6):
+    """
+    Encode an image as a PNG file.
+
+    :param image: a uint8 array with shape (H, W) for grayscale, (H, W, 3) for RGB, or (H, W, 4) for RGBA.
+    :param level: the zlib compression level, from 0 to 9.
+    :return: the bytes of the file.
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    if image.ndim == 2:
+        color_type = 0
+    elif image.ndim == 3 and image.shape[2] == 3:
+        color_type = 2
+    elif image.ndim == 3 and image.shape[2] == 4:
+        color_type = 6
+    else:
+        raise ValueError("The image must have shape (H, W), (H, W, 3), or (H, W, 4).")
+    height, width = image.shape[:2]
+    # Each row starts with a byte that selects no filter.
+    rows = np.hstack((np.zeros((height, 1), dtype=np.uint8), image.reshape(height, -1)))
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    data = zlib.compress(rows.tobytes(), level)
+    return b''.join((b'\x89PNG\r\n\x1a\n', _chunk(b'IHDR', header), _chunk(b'IDAT', data), _chunk(b'IEND', b'')))
+
+
+def save_png(filename, image, level=6):
+    """
+    Write an image to a PNG file; see png_bytes().
+
+    :param filename: the name of the file.
+    :param image: a uint8 array with shape (H, W), (H, W, 3), or (H, W, 4).
+    :param level: the zlib compression level, from 0 to 9.
+    :return: None
+    """
+    with open(filename, 'wb') as f:
+        f.write(png_bytes(image, level))
@@ -0,0 +1,178 @@
+"""
+This module finds nearby pairs of shapes without comparing every shape to every other shape.
+
+Shapes are represented by their axis-aligned bounding boxes, as returned by geometry.bounding_boxes(): an array with
+shape (M, 4) whose rows are (x_min, y_min, x_max, y_max). Each box is registered in every cell of a uniform grid that
+it overlaps, and candidate pairs are the boxes that share a grid cell. All of the steps are sorts and searches over
+whole arrays, so the cost grows with the number of boxes and the number of nearby pairs rather than with the square of
+the number of boxes.
+
+The grid has several levels, each with cells twice as large as the level below it, and each box is assigned to the
+lowest level whose cells are at least as large as the box, so that it is registered in at most four cells. Each pair of
+boxes is found on the higher of their two levels. A box that is much larger than the others, such as a ground plane
+under a chip, therefore occupies a few coarse cells instead of a huge number of fine ones.
+"""
+from __future__ import division
+
+import numpy as np
+
+from . import geometry
+
+
+def _grid_cell_size(boxes, margin):
+    """
+    Choose a grid cell size that is comparable to a typical box, so that most boxes occupy only a few cells.
+    """
+    extents = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    size = float(np.median(extents)) + margin
+    if size > 0:
+        return size
+    # All of the boxes are points and the margin is zero, so any size works.
+    return 1
+
+
+def _grid_entries(boxes, size, origin):
+    """
+    Return one entry for each grid cell that each box overlaps.
+
+    :return: a tuple (keys, owners) of integer arrays, where keys identifies the grid cell and owners contains the index
+        of the box.
+    """
+    low = np.floor((boxes[:, :2] - origin) / size).astype(np.int64)
+    high = np.floor((boxes[:, 2:] - origin) / size).astype(np.int64)
+    columns, owners = geometry.expand_ranges(low[:, 0], high[:, 0] + 1)
+    heights = (high - low + 1)[owners, 1]
+    rows, entries = geometry.expand_ranges(low[owners, 1], low[owners, 1] + heights)
+    columns = columns[entries]
+    owners = owners[entries]
+    # The grid indices are nonnegative and less than 2 ** 32, so the keys are unique.
+    return columns * 2 ** 32 + rows, owners
+
+
+def _levels(boxes, size):
+    """
+    :return: an integer array containing the level of each box, which is the lowest level whose grid cell size, size *
+        2 ** level, is at least the larger side of the box.
+    """
+    extents = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    return np.ceil(np.log2(np.maximum(extents / size, 1))).astype(np.int64)
+
+
+def _grid_candidates(boxes_a, boxes_b, size, origin):
+    """
+    :return: a tuple (i, j) of integer arrays containing one entry for each grid cell shared by boxes_a[i] and
+        boxes_b[j].
+    """
+    a_keys, a_owners = _grid_entries(boxes_a, size, origin)
+    b_keys, b_owners = _grid_entries(boxes_b, size, origin)
+    order = np.argsort(b_keys, kind='stable')
+    b_keys = b_keys[order]
+    b_owners = b_owners[order]
+    positions, entries = geometry.expand_ranges(np.searchsorted(b_keys, a_keys, side='left'),
+                                                np.searchsorted(b_keys, a_keys, side='right'))
+    return a_owners[entries], b_owners[positions]
+
+
+def box_pairs(boxes_a, boxes_b=None, margin=0, cell_size=None):
+    """
+    Find all pairs of boxes that overlap or that are separated by at most the given margin in both x and y.
+
+    :param boxes_a: an array with shape (M, 4).
+    :param boxes_b: an array with shape (K, 4), or None to find pairs of distinct boxes within boxes_a.
+    :param margin: the maximum separation between boxes that are considered a pair.
+    :param cell_size: the cell size of the lowest grid level; if None, it is chosen from the median box size.
+    :return: a tuple (i, j) of integer arrays with the same length, such that boxes_a[i[k]] and boxes_b[j[k]] are a
+        pair; each pair appears once. If boxes_b is None then the indices are both into boxes_a and i < j.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    self_pairs = boxes_b is None
+    if self_pairs:
+        boxes_b = boxes_a
+    else:
+        boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    if not (boxes_a.shape[0] and boxes_b.shape[0]):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # Only the boxes in a are expanded by the margin, which is enough to find every pair.
+    expanded = boxes_a + np.array([-margin, -margin, margin, margin])
+    if cell_size is None:
+        cell_size = _grid_cell_size(np.vstack((boxes_a, boxes_b)), margin)
+    origin = np.minimum(expanded[:, :2].min(axis=0), boxes_b[:, :2].min(axis=0))
+    a_levels = _levels(expanded, cell_size)
+    b_levels = _levels(boxes_b, cell_size)
+    i = [np.empty(0, dtype=np.int64)]
+    j = [np.empty(0, dtype=np.int64)]
+    for level in np.union1d(a_levels, b_levels).tolist():
+        # The boxes in a on this level are paired with the boxes in b on this level and below, and the boxes in a below
+        # this level are paired with the boxes in b on this level.
+        for a_mask, b_mask in ((a_levels == level, b_levels <= level), (a_levels < level, b_levels == level)):
+            a_rows = np.flatnonzero(a_mask)
+            b_rows = np.flatnonzero(b_mask)
+            if a_rows.size and b_rows.size:
+                level_i, level_j = _grid_candidates(expanded[a_rows], boxes_b[b_rows], cell_size * 2 ** level,
+                                                    origin)
+                i.append(a_rows[level_i])
+                j.append(b_rows[level_j])
+    i = np.concatenate(i)
+    j = np.concatenate(j)
+    if self_pairs:
+        keep = i < j
+        i = i[keep]
+        j = j[keep]
+    # Boxes that share several grid cells produce the same pair more than once.
+    keys = np.unique(i * boxes_b.shape[0] + j)
+    i, j = np.divmod(keys, boxes_b.shape[0])
+    a = expanded[i]
+    b = boxes_b[j]
+    overlap = (a[:, 0] <= b[:, 2]) & (b[:, 0] <= a[:, 2]) & (a[:, 1] <= b[:, 3]) & (b[:, 1] <= a[:, 3])
+    return i[overlap], j[overlap]
+
+
+def segment_boxes(starts, ends):
+    """
+    :param starts: an array with shape (K, 2) containing the start points of K segments.
+    :param ends: an array with shape (K, 2) containing the end points of K segments.
+    :return: an array with shape (K, 4) containing the bounding box of each segment.
+    """
+    return np.hstack((np.minimum(starts, ends), np.maximum(starts, ends)))
+
+
+def point_boxes(points):
+    """
+    :param points: an array with shape (K, 2).
+    :return: an array with shape (K, 4) containing the degenerate bounding box of each point.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.hstack((points, points))
+
+
+def separated(points, distance):
+    """
+    Return a mask that removes each point that is closer than the given distance to any earlier point, which removes
+    duplicates and near-duplicates while keeping the first point of each cluster.
+
+    :param points: an array with shape (K, 2).
+    :param distance: the minimum separation.
+    :return: a boolean array with shape (K,) that is True for the points to keep.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    i, j = box_pairs(point_boxes(points), margin=distance)
+    d = points[j] - points[i]
+    keep = np.ones(points.shape[0], dtype=bool)
+    keep[j[np.hypot(d[:, 0], d[:, 1]) < distance]] = False
+    return keep
+
+
+def inside_rings(points, vertices, offsets):
+    """
+    Return a mask that is True for each point that is inside any of the given rings; see geometry.rings_contain().
+
+    :param points: an array with shape (K, 2).
+    :param vertices: the (N, 2) vertex array of the rings.
+    :param offsets: the offsets array of M closed shapes.
+    :return: a boolean array with shape (K,).
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    i, j = box_pairs(point_boxes(points), geometry.bounding_boxes(vertices, offsets))
+    inside = np.zeros(points.shape[0], dtype=bool)
+    inside[i[geometry.rings_contain(vertices, offsets, j, points[i])]] = True
+    return inside
@@ -0,0 +1,187 @@
+"""
+This module writes a layout to a GDSII file while it is being generated, so that peak memory use does not grow with
+the size of the design.
+
+A StreamingDrawing behaves like a Drawing, except that each of its cells is *finalized* once it is complete: the cell
+is written to the output file and all of its elements are deleted from pylayout. The empty pylayout cell remains as a
+lightweight handle, so references to it can still be created and are written to the file by name. By default a cell is
+finalized automatically when it is first referenced from another cell, which matches the usual pattern of creating a
+component cell, drawing it completely, and then placing it; cells can also be finalized explicitly, and all remaining
+cells are finalized when the drawing is closed. Adding elements to a finalized cell raises a RuntimeError.
+
+Example:
+    with stream.StreamingDrawing(layout.pyl.drawing, 'chip.gds') as drawing:
+        idc = components.interdigitated_capacitor(drawing, ...)
+        top = drawing.add_cell('top')
+        top.add_cell(idc, (0, 0))  # idc is finalized here.
+    # top is finalized and the file is closed here.
+"""
+from __future__ import division
+
+from . import gds, wrapper
+
+
+def write_element(writer, element):
+    """
+    Write the given element to the current structure of the given writer.
+
+    :param writer: a gds.Writer instance.
+    :param element: a wrapper.Element instance.
+    :return: None
+    """
+    points = element.database_points
+    if isinstance(element, wrapper.Box):
+        (x0, y0), (x1, y1) = points[:2].tolist()
+        writer.boundary(element.layer, element.data_type, [(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+    elif isinstance(element, (wrapper.Polygon, wrapper.Circle)):
+        writer.boundary(element.layer, element.data_type, points)
+    elif isinstance(element, wrapper.Path):
+        writer.path(element.layer, element.data_type, points, element.pyl.getWidth(), element.cap)
+    elif isinstance(element, wrapper.Text):
+        writer.text(element.layer, element.data_type, points[0], element.text, element.pyl.getWidth())
+    elif isinstance(element, wrapper.CellrefArray):
+        # pylayout stores the origin displaced by one step in each direction, but GDSII uses the whole displacement.
+        repeat_x = element.repeat_x
+        repeat_y = element.repeat_y
+        origin = points[0]
+        points = [origin, origin + repeat_x * (points[1] - origin), origin + repeat_y * (points[2] - origin)]
+        writer.array_reference(element.cell.name, points, repeat_x, repeat_y, element.angle, element.scale,
+                               element.mirror_x)
+    elif isinstance(element, wrapper.Cellref):
+        writer.reference(element.cell.name, points[0], element.angle, element.scale, element.mirror_x)
+    else:
+        raise ValueError("Unknown element: {}".format(element))
+
+
+def write_cell(writer, cell):
+    """
+    Write the given cell as a complete structure.
+
+    :param writer: a gds.Writer instance.
+    :param cell: a wrapper.Cell instance.
+    :return: None
+    """
+    writer.begin_structure(cell.name)
+    for element in cell.elements:
+        write_element(writer, element)
+    writer.end_structure()
+
+
+class StreamingCell(wrapper.Cell):
+    """
+    A Cell that refuses new elements once it has been finalized, and that finalizes the cells it references.
+    """
+
+    def _check_open(self):
+        if self.drawing.is_finalized(self):
+            raise RuntimeError("Cell {} has been finalized and written.".format(self.name))
+
+    def finalize(self):
+        """
+        Write this cell to the output file and delete its elements; see StreamingDrawing.finalize().
+        """
+        self.drawing.finalize(self)
+
+    def add_cell(self, cell, origin, angle=0):
+        self._check_open()
+        self.drawing._referenced(cell)
+        return super(StreamingCell, self).add_cell(cell, origin, angle=angle)
+
+    def add_cells(self, cell, origins, angles=0):
+        self._check_open()
+        self.drawing._referenced(cell)
+        return super(StreamingCell, self).add_cells(cell, origins, angles=angles)
+
+    def add_cell_array(self, cell, *args, **kwargs):
+        self._check_open()
+        self.drawing._referenced(cell)
+        return super(StreamingCell, self).add_cell_array(cell, *args, **kwargs)
+
+
+def _checked(name):
+    """
+    Return a version of the given Cell method that first checks that the cell has not been finalized.
+    """
+    method = getattr(wrapper.Cell, name)
+
+    def checked_method(self, *args, **kwargs):
+        self._check_open()
+        return method(self, *args, **kwargs)
+
+    checked_method.__name__ = name
+    checked_method.__doc__ = method.__doc__
+    return checked_method
+
+
+for _name in ('add_box', 'add_circle', 'add_polygon', 'add_polygon_arc', 'add_path', 'add_text', 'add_texts',
+              'subtract'):
+    setattr(StreamingCell, _name, _checked(_name))
+
+
+class StreamingDrawing(wrapper.Drawing):
+    """
+    A Drawing that writes each cell to a GDSII file as soon as the cell is complete; see the module docstring.
+    """
+
+    cell_class = StreamingCell
+
+    def __init__(self, pyl_drawing, filename, library_name='LIB', use_user_unit=True, auto_number=False,
+                 auto_finalize=True, max_vertices=gds.MAX_BOUNDARY_POINTS - 1):
+        """
+        :param pyl_drawing: a pylayout.drawingField instance.
+        :param filename: the name of the GDSII file to write, or a binary file-like object.
+        :param library_name: the GDSII library name.
+        :param use_user_unit: see Drawing.
+        :param auto_number: see Drawing.
+        :param auto_finalize: if True, finalize each cell when it is first referenced by another cell; if False, cells
+            are finalized only explicitly or when the drawing is closed.
+        :param max_vertices: the largest number of vertices in a written boundary; see gds.Writer.
+        """
+        super(StreamingDrawing, self).__init__(pyl_drawing, use_user_unit=use_user_unit, auto_number=auto_number)
+        self.auto_finalize = auto_finalize
+        self.writer = gds.Writer(filename, library_name=library_name, user_unit=self.user_unit,
+                                 database_unit=self.database_unit, max_vertices=max_vertices)
+        self._finalized = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_finalized(self, cell):
+        """
+        :param cell: a Cell in this drawing.
+        :return: True if the given cell has been written to the file.
+        """
+        return cell.name in self._finalized
+
+    def _referenced(self, cell):
+        if self.auto_finalize:
+            self.finalize(cell)
+
+    def finalize(self, cell):
+        """
+        Write the given cell to the output file, then delete its elements so that their memory is released. This
+        does nothing if the cell has already been finalized.
+
+        :param cell: a Cell in this drawing.
+        :return: None
+        """
+        if self.is_finalized(cell):
+            return
+        write_cell(self.writer, cell)
+        cell.clear()
+        self._finalized.add(cell.name)
+
+    def close(self):
+        """
+        Finalize every cell that has not yet been finalized and finish writing the file.
+
+        :return: None
+        """
+        if self.writer.closed:
+            return
+        for cell in self.cells.values():
+            self.finalize(cell)
+        self.writer.close()
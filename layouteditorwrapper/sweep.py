@@ -0,0 +1,195 @@
+"""
+This module lays out parameter sweeps of component generators, such as a chip of interdigitated capacitors with many
+tine lengths and spacings, with one call per chip.
+
+A component is any function that is called as component(drawing, **parameters) and returns a new Cell, such as the
+functions in components.py. The variants of a sweep are the Cartesian product of lists of values for some parameters,
+combined with fixed values for the others. Variants with equal parameters share a single cell, and a cache dict can be
+passed to reuse cells between sweeps. The geometry of the variants can be computed in parallel threads: each variant is
+drawn into a jobs.RecordingDrawing, and the recorded calls are then replayed into the real drawing in order, because
+pylayout objects can only be used from one thread.
+
+The cells are placed on a grid in which each column is as wide as its widest cell and each row is as tall as its
+tallest cell, so cells of very different sizes are packed without wasting space, and each cell can be labeled with the
+values of the parameters that vary.
+
+Example:
+    result = sweep.sweep(drawing, components.interdigitated_capacitor,
+                         OrderedDict([('length', [100, 200, 300]), ('turns', [5, 10])]),
+                         fixed=dict(space=2, width=2, base=10, offset=5, layer=1), label_layer=10, spacing=50)
+    result.cell  # The new top cell, named 'sweep'.
+"""
+from __future__ import division
+
+import itertools
+from collections import OrderedDict, namedtuple
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from . import jobs, metrics
+
+Sweep = namedtuple('Sweep', ['cell', 'variants', 'cells', 'origins'])
+Sweep.__doc__ = """
+The result of sweep(). The cell is the new top cell; variants is a list of OrderedDicts of the swept parameters; cells
+is a list containing the Cell of each variant, in the same order, where equal variants share a Cell; origins is an
+array with shape (N, 2) containing the origin of the reference to each variant.
+"""
+
+
+def variants(parameters):
+    """
+    Return the Cartesian product of the given parameter values.
+
+    :param parameters: an OrderedDict, or a list of (name, values) pairs, containing a list of values for each name;
+        a plain dict is used in order of its sorted keys. The last parameter varies fastest.
+    :return: a list of OrderedDicts with one entry for each name.
+    """
+    if isinstance(parameters, dict) and not isinstance(parameters, OrderedDict):
+        parameters = sorted(parameters.items())
+    parameters = OrderedDict(parameters)
+    return [OrderedDict(zip(parameters, values)) for values in itertools.product(*parameters.values())]
+
+
+def _hashable(value):
+    if isinstance(value, np.ndarray):
+        return value.shape, tuple(value.ravel().tolist())
+    elif isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    elif isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _key(component, parameters):
+    return component, tuple(sorted((name, _hashable(value)) for name, value in parameters.items()))
+
+
+def label(variant):
+    """
+    :param variant: an OrderedDict of parameter values.
+    :return: a string such as 'length=100, turns=5', in which floats are written in the shortest form and all other
+        values, including ints and bools, are written in full.
+    """
+    return ', '.join('{}={}'.format(name, '{:g}'.format(value) if isinstance(value, (float, np.floating)) else value)
+                     for name, value in variant.items())
+
+
+def generate(drawing, component, parameter_list, workers=None, cache=None):
+    """
+    Create the cell for each of the given parameter dicts, creating each distinct cell only once.
+
+    :param drawing: the Drawing to which the cells are added.
+    :param component: a function that is called as component(drawing, **parameters) and returns a new Cell.
+    :param parameter_list: a list of dicts of keyword arguments for the component.
+    :param workers: if not None, the number of threads in which to compute the cells; the recorded cells are then
+        inserted into the drawing from the calling thread. The component must then only add to the drawing; see jobs.py.
+    :param cache: a dict in which the cells are stored, keyed by the component and its parameters; passing the same
+        dict to several calls reuses the cells that were already created. If None, cells are shared only within this
+        call.
+    :return: a list of the Cell for each parameter dict.
+    """
+    if cache is None:
+        cache = {}
+    keys = [_key(component, parameters) for parameters in parameter_list]
+    new = OrderedDict((key, parameters) for key, parameters in zip(keys, parameter_list) if key not in cache)
+    if workers is None:
+        for key, parameters in new.items():
+            cache[key] = component(drawing, **parameters)
+    elif new:
+        def record(parameters):
+            recording = jobs.RecordingDrawing(drawing)
+            return recording, component(recording, **parameters)
+
+        pool = ThreadPool(workers)
+        try:
+            recorded = pool.map(record, list(new.values()))
+        finally:
+            pool.close()
+        # pylayout calls are made serially from this thread, in the order of the parameter list.
+        for key, (recording, returned) in zip(new, recorded):
+            cache[key] = jobs.resolve(jobs.replay(drawing, recording), returned)
+    return [cache[key] for key in keys]
+
+
+def grid_origins(boxes, columns, spacing=0, label_space=0):
+    """
+    Return the origins at which to place cells with the given bounding boxes on a grid that is filled row by row,
+    from the top left, so that each column is as wide as its widest cell and each row is as tall as its tallest cell
+    plus the label space. The cells are aligned to the lower left corners of their grid positions, and the upper left
+    corner of the grid is at (0, 0).
+
+    :param boxes: an array with shape (N, 4) containing the bounding box (x_min, y_min, x_max, y_max) of each cell.
+    :param columns: the number of columns.
+    :param spacing: the space between columns and between rows.
+    :param label_space: the extra height above each cell that is reserved for a label.
+    :return: a tuple (origins, label_origins) of arrays with shape (N, 2), where each label origin is at the upper left
+        of the space reserved above the cell.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    count = boxes.shape[0]
+    if count == 0:
+        return np.zeros((0, 2)), np.zeros((0, 2))
+    rows = -(-count // columns)
+    widths = np.zeros(rows * columns)
+    heights = np.zeros(rows * columns)
+    widths[:count] = boxes[:, 2] - boxes[:, 0]
+    heights[:count] = boxes[:, 3] - boxes[:, 1] + label_space
+    column_widths = widths.reshape(rows, columns).max(axis=0)
+    row_heights = heights.reshape(rows, columns).max(axis=1)
+    lefts = np.concatenate(([0], np.cumsum(column_widths + spacing)[:-1]))
+    bottoms = -np.cumsum(row_heights + spacing) + spacing
+    row, column = np.divmod(np.arange(count), columns)
+    lower_left = np.column_stack((lefts[column], bottoms[row]))
+    origins = lower_left - boxes[:, :2]
+    label_origins = lower_left + np.column_stack((np.zeros(count), boxes[:, 3] - boxes[:, 1] + label_space))
+    return origins, label_origins
+
+
+def sweep(drawing, component, parameters, fixed=None, cell_name='sweep', columns=None, spacing=0, label_layer=None,
+          label_height=None, workers=None, cache=None, box_cache=None):
+    """
+    Create a cell containing one instance of the given component for each variant of the given parameters, placed on
+    a packed grid and optionally labeled; see the module docstring.
+
+    :param drawing: the Drawing to which the cells are added.
+    :param component: a function that is called as component(drawing, **parameters) and returns a new Cell.
+    :param parameters: the values to sweep; see variants().
+    :param fixed: a dict of keyword arguments that are the same for all variants.
+    :param cell_name: the name of the new top cell.
+    :param columns: the number of grid columns; the default makes the grid roughly square.
+    :param spacing: the space between columns and between rows.
+    :param label_layer: if not None, label each instance on this layer with the swept parameter values.
+    :param label_height: the height of the labels, which is also reserved above each cell; see Cell.add_text().
+    :param workers: if not None, the number of threads in which to compute the cells; see generate().
+    :param cache: a dict of cells to reuse; see generate().
+    :param box_cache: a dict of bounding boxes to reuse; see metrics.cell_bounding_box().
+    :return: a Sweep tuple.
+    """
+    fixed = fixed or {}
+    variant_list = variants(parameters)
+    parameter_list = []
+    for variant in variant_list:
+        parameters = dict(fixed)
+        parameters.update(variant)
+        parameter_list.append(parameters)
+    cells = generate(drawing, component, parameter_list, workers=workers, cache=cache)
+    if box_cache is None:
+        box_cache = {}
+    unique = OrderedDict((cell.name, cell) for cell in cells)
+    boxes = dict((name, metrics.cell_bounding_box(cell, cache=box_cache)) for name, cell in unique.items())
+    empty = np.zeros(4)
+    if columns is None:
+        columns = int(np.ceil(np.sqrt(len(cells))))
+    label_space = 0
+    if label_layer is not None and label_height is not None and label_height > 0:
+        label_space = label_height
+    origins, label_origins = grid_origins([empty if boxes[cell.name] is None else boxes[cell.name] for cell in cells],
+                                          max(columns, 1), spacing=spacing, label_space=label_space)
+    top = drawing.add_cell(cell_name)
+    names = np.array([cell.name for cell in cells])
+    for name, cell in unique.items():
+        top.add_cells(cell, origins[names == name])
+    if label_layer is not None:
+        top.add_texts(label_origins, [label(variant) for variant in variant_list], label_layer, height=label_height)
+    return Sweep(cell=top, variants=variant_list, cells=cells, origins=origins)
@@ -0,0 +1,193 @@
+"""
+This module runs an operation on the shapes of a large cell one square tile at a time, optionally in several processes,
+and stitches the results together.
+
+The bounding box of the shapes is divided into a grid of tiles, and each tile is extended on every side by a halo
+margin, so that an operation that looks at the neighborhood of a point, such as a spacing check, sees every shape that
+it needs near the edges of the tile. The shapes whose bounding boxes overlap each extended tile are found with
+spatial.box_pairs(), and the operation is called once per tile with only those shapes. The outlines of all of the
+shapes are copied once into shared memory buffers, which the worker processes read without copying, so each task sends
+only the indices of its shapes to a worker.
+
+An operation takes a Tile and returns a tuple (anchors, items): anchors is an array with shape (K, 2) containing a point
+for each of the K results, and items is a list or an array with K rows. A result found near a tile edge may also be
+found by the tiles whose halos cover it, so only the results whose anchors lie in the tile itself, not in its halo, are
+kept; the tiles do not overlap, so each result is kept exactly once. For example, a spacing violation can be anchored at
+the midpoint between the two edges, and a polygon clipped to the tile can be anchored at the center of the tile.
+
+The operation must be a function defined at the top level of a module, or a functools.partial of one, so that it can
+be sent to the worker processes.
+
+Example:
+    def large_shapes(tile, area):
+        areas = geometry.ring_areas(tile.vertices, tile.offsets)
+        vertices, offsets = geometry.select(tile.vertices, tile.offsets, np.flatnonzero(areas > area))
+        return geometry.bounding_boxes(vertices, offsets)[:, :2], tile.ids[areas > area]
+
+    anchors, rows = tiling.run_cell(cell, [1], functools.partial(large_shapes, area=1e6), tile_size=1000, workers=8)
+"""
+from __future__ import division
+
+import ctypes
+import multiprocessing
+from collections import namedtuple
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from . import geometry, spatial
+
+Tile = namedtuple('Tile', ['index', 'box', 'halo_box', 'vertices', 'offsets', 'labels', 'ids'])
+Tile.__doc__ = """
+The input to an operation. The index is the position of the tile in the grid, box is the tile as (x_min, y_min, x_max,
+y_max), and halo_box is the tile extended by the halo. The vertices and offsets contain the outlines of the shapes whose
+bounding boxes overlap the halo box, in the concatenated format described in geometry.py, and labels and ids contain
+the label and the identifier of each shape given to run(), such as its layer and its element table row.
+"""
+
+# The arrays of the shapes in a worker process, set by _initialize().
+_shared = {}
+
+
+def grid(boxes, tile_size):
+    """
+    :param boxes: an array with shape (M, 4) containing bounding boxes.
+    :param tile_size: the side of each square tile.
+    :return: an array with shape (T, 4) containing the tiles, row by row from the lower left, that cover the given
+        boxes; the upper and right edges of the boxes are inside the grid, not on its edge.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    low = boxes[:, :2].min(axis=0)
+    high = boxes[:, 2:].max(axis=0)
+    columns, rows = (np.floor((high - low) / tile_size) + 1).astype(np.int64)
+    x, y = np.meshgrid(np.arange(columns), np.arange(rows))
+    corners = low + tile_size * np.column_stack((x.ravel(), y.ravel()))
+    return np.hstack((corners, corners + tile_size))
+
+
+def _share(array, ctype):
+    """
+    Copy the given array into a new shared memory buffer.
+    """
+    # A buffer cannot be empty, so it has at least one element.
+    buffer_ = RawArray(ctype, max(array.size, 1))
+    np.ctypeslib.as_array(buffer_)[:array.size] = array.ravel()
+    return buffer_
+
+
+def _initialize(vertices, offsets, labels, ids, sizes):
+    """
+    Store numpy views of the shared buffers in a worker process.
+    """
+    vertex_count, shape_count = sizes
+    _shared['vertices'] = np.ctypeslib.as_array(vertices)[:2 * vertex_count].reshape(-1, 2)
+    _shared['offsets'] = np.ctypeslib.as_array(offsets)[:shape_count + 1]
+    _shared['labels'] = np.ctypeslib.as_array(labels)[:shape_count]
+    _shared['ids'] = np.ctypeslib.as_array(ids)[:shape_count]
+
+
+def _run_tile(task, shared=None):
+    """
+    Call the operation of the given task on its tile.
+
+    :param task: a tuple (operation, index, box, halo_box, rows).
+    :param shared: a dict of the arrays of the shapes, or None to use those of this worker process.
+    :return: a tuple (index, anchors, items) containing only the results anchored in the tile.
+    """
+    if shared is None:
+        shared = _shared
+    operation, index, box, halo_box, rows = task
+    vertices, offsets = geometry.select(shared['vertices'], shared['offsets'], rows)
+    anchors, items = operation(Tile(index=index, box=box, halo_box=halo_box, vertices=vertices, offsets=offsets,
+                                    labels=shared['labels'][rows], ids=shared['ids'][rows]))
+    anchors = np.asarray(anchors, dtype=np.float64).reshape(-1, 2)
+    # The tiles are closed on the lower and left edges and open on the upper and right edges, so they do not overlap.
+    keep = np.all((anchors >= box[:2]) & (anchors < box[2:]), axis=1)
+    if isinstance(items, np.ndarray):
+        items = items[keep]
+    else:
+        items = [item for item, kept in zip(items, keep) if kept]
+    return index, anchors[keep], items
+
+
+def _stitch(results):
+    """
+    Concatenate the results of all of the tiles, in order of tile index.
+    """
+    results = sorted(results, key=lambda result: result[0])
+    anchors = np.vstack([np.empty((0, 2))] + [result[1] for result in results])
+    if results and all(isinstance(result[2], np.ndarray) for result in results):
+        return anchors, np.concatenate([result[2] for result in results])
+    return anchors, [item for result in results for item in result[2]]
+
+
+def run(operation, vertices, offsets, tile_size, labels=None, ids=None, halo=0, workers=None):
+    """
+    Run an operation on each tile of the given shapes and stitch the results; see the module docstring.
+
+    :param operation: a function that takes a Tile and returns a tuple (anchors, items).
+    :param vertices: the (N, 2) vertex array of the outlines of the shapes.
+    :param offsets: the offsets array of M closed shapes.
+    :param tile_size: the side of each square tile.
+    :param labels: an integer array containing a label for each shape, which is passed to the operation, or None.
+    :param ids: an integer array containing an identifier for each shape, which is passed to the operation, or None
+        to use the index of each shape.
+    :param halo: the margin by which each tile is extended on every side.
+    :param workers: if greater than 1, the number of processes in which to run the operation.
+    :return: a tuple (anchors, items) containing the kept results of all of the tiles, in order of tile index; items
+        is an array if the operation returns arrays, and otherwise a list.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if labels is None:
+        labels = np.zeros(offsets.size - 1, dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.int64)
+    if ids is None:
+        ids = np.arange(offsets.size - 1)
+    ids = np.asarray(ids, dtype=np.int64)
+    if offsets.size < 2:
+        return _stitch([])
+    boxes = geometry.bounding_boxes(vertices, offsets)
+    tiles = grid(boxes, tile_size)
+    halo_boxes = tiles + np.array([-halo, -halo, halo, halo])
+    tile_indices, rows = spatial.box_pairs(halo_boxes, boxes)
+    order = np.lexsort((rows, tile_indices))
+    tile_indices = tile_indices[order]
+    rows = rows[order]
+    bounds = np.flatnonzero(np.concatenate(([True], tile_indices[1:] != tile_indices[:-1], [True])))
+    tasks = [(operation, int(tile_indices[start]), tiles[tile_indices[start]], halo_boxes[tile_indices[start]],
+              rows[start:stop]) for start, stop in zip(bounds[:-1], bounds[1:])]
+    if workers is None or workers <= 1:
+        shared = {'vertices': vertices, 'offsets': offsets, 'labels': labels, 'ids': ids}
+        return _stitch([_run_tile(task, shared) for task in tasks])
+    buffers = (_share(vertices, ctypes.c_double), _share(offsets, ctypes.c_int64), _share(labels, ctypes.c_int64),
+               _share(ids, ctypes.c_int64), (vertices.shape[0], offsets.size - 1))
+    pool = multiprocessing.Pool(workers, initializer=_initialize, initargs=buffers)
+    try:
+        results = pool.map(_run_tile, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return _stitch(results)
+
+
+def run_cell(cell, layers, operation, tile_size, halo=0, workers=None):
+    """
+    Run an operation on each tile of the shapes on the given layers of a cell; see run(). The shapes are the outlines
+    from ElementTable.outlines(), in database units, the labels are their layers, and the identifiers are their element
+    table rows. Shapes in referenced cells are not included.
+
+    :param cell: a wrapper.Cell.
+    :param layers: an iterable of layer numbers.
+    :param operation: a function that takes a Tile and returns a tuple (anchors, items).
+    :param tile_size: the side of each square tile, in the units of the drawing.
+    :param halo: the margin by which each tile is extended on every side, in the units of the drawing.
+    :param workers: if greater than 1, the number of processes in which to run the operation.
+    :return: a tuple (anchors, items), as returned by run().
+    """
+    table = cell.element_table()
+    vertices, offsets, rows = table.outlines(layers)
+    units = cell.drawing.units
+    return run(operation, vertices, offsets, units.to_database(tile_size), labels=table.layers[rows], ids=rows,
+               halo=units.to_database(halo), workers=workers)
+
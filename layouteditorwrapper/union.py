@@ -0,0 +1,414 @@
+"""
+This module merges all of the shapes on a layer of a cell into non-overlapping polygons, which reduces the number of
+elements; for example, the overlap paths that Trace.draw() adds at each end of a trace are absorbed into the polygon of
+the trace.
+
+The union is computed by a sweep over horizontal slabs. The edges of all of the shapes are compared with their
+neighbors, found with spatial.box_pairs(), to find the points where they cross, and the horizontal lines through these
+points and through all of the vertices divide the plane into slabs within which no two edges cross. Shapes whose
+bounding boxes touch are grouped into clusters, and each cluster is divided into slabs of its own, so the number of
+slabs that an edge crosses depends only on the shapes near it. Within each slab the crossing edges are sorted by
+position, and a running sum of their directions, with every ring oriented counterclockwise, gives the intervals in which
+the winding number is nonzero: these are the trapezoids of the union. The boundary of the union consists of the left and
+right sides of these trapezoids and of the horizontal pieces along each slab boundary that are covered on one side only.
+The boundary pieces are linked end to start into rings, turning as far left as possible where rings touch, so that the
+region is always on the left: outer rings are counterclockwise and holes are clockwise. The input is in integer database
+units and the result is rounded back to integers. All of the steps are sorts and searches over whole arrays.
+
+Polygons with holes cannot be stored by pylayout, so each of them is cut into hole-free pieces with fracture.fracture().
+
+A very large cell can be merged one square tile at a time with tiling.py, which bounds the memory used by the sweep and
+can merge the tiles in several processes: only the shapes that overlap a tile are processed with it, and they are
+clipped to the tile, so the result polygons are split along the tile edges.
+
+Example:
+    union.merge(cell, layer=1)  # Replace every shape on layer 1 by the polygons of their union.
+"""
+from __future__ import division
+
+import functools
+
+import numpy as np
+
+from . import fracture, gds, geometry, layers, spatial, tiling, wrapper
+
+# The distance in database units from a hole edge to the point used to find the outer ring that contains the hole.
+_HOLE_TEST_DISTANCE = 1e-3
+
+
+def _cross(u, v):
+    return u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+
+
+def _clusters(boxes):
+    """
+    :return: an integer array containing a label for each box, which is shared by all boxes connected through boxes
+        that overlap or touch.
+    """
+    i, j = spatial.box_pairs(boxes)
+    labels = np.arange(boxes.shape[0])
+    while i.size:
+        smaller = np.minimum(labels[i], labels[j])
+        if np.all(labels[i] == smaller) and np.all(labels[j] == smaller):
+            break
+        np.minimum.at(labels, i, smaller)
+        np.minimum.at(labels, j, smaller)
+        labels = labels[labels]
+    return labels
+
+
+def _crossing_heights(starts, ends, owners):
+    """
+    :return: a tuple (heights, owners) of arrays containing the y-coordinate of each point at which two of the given
+        segments cross at a point that is not an end point of either, and the owner of the first of the two segments.
+    """
+    i, j = spatial.box_pairs(spatial.segment_boxes(starts, ends))
+    a = starts[i]
+    b = ends[i]
+    c = starts[j]
+    d = ends[j]
+    c_side = _cross(b - a, c - a)
+    d_side = _cross(b - a, d - a)
+    crossing = (c_side * d_side < 0) & (_cross(d - c, a - c) * _cross(d - c, b - c) < 0)
+    t = c_side[crossing] / (c_side[crossing] - d_side[crossing])
+    return c[crossing, 1] + t * (d[crossing, 1] - c[crossing, 1]), owners[i[crossing]]
+
+
+def _vertical_crossing_heights(starts, ends, owners, x):
+    """
+    :return: a tuple (heights, owners) of arrays containing the y-coordinate of each point at which one of the given
+        segments crosses the vertical line at the given x-coordinate, and the owner of the segment.
+    """
+    crossing = (starts[:, 0] - x) * (ends[:, 0] - x) < 0
+    s = starts[crossing]
+    e = ends[crossing]
+    return s[:, 1] + (x - s[:, 0]) * (e[:, 1] - s[:, 1]) / (e[:, 0] - s[:, 0]), owners[crossing]
+
+
+def _union_trapezoids(vertices, offsets, clusters, window=None):
+    """
+    Return the trapezoids of the union of the given counterclockwise rings; see the module docstring. Each cluster of
+    rings has slab boundaries of its own, so that the number of slabs that an edge crosses does not grow with the
+    number of distant shapes.
+
+    :param clusters: an integer array containing the label of the cluster of each ring, from _clusters().
+    :param window: if not None, a box (x_min, y_min, x_max, y_max) to which the union is clipped.
+    :return: a tuple (level_y, levels, left0, right0, left1, right1) where level_y contains the y-coordinates of the
+        slab boundaries of each cluster, sorted by cluster and then by y, and the other arrays have one entry per
+        trapezoid, sorted by slab and then by x: levels is the index in level_y of the bottom of the slab, and left0,
+        right0, left1, right1 are the x-coordinates of the bottom-left, bottom-right, top-left, and top-right corners.
+    """
+    following = np.arange(1, vertices.shape[0] + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    vertex_owners = clusters[geometry.shape_indices(offsets)]
+    starts = vertices
+    ends = vertices[following]
+    # Horizontal edges lie along slab boundaries and do not affect the winding number within any slab.
+    sloped = starts[:, 1] != ends[:, 1]
+    starts = starts[sloped]
+    ends = ends[sloped]
+    owners = vertex_owners[sloped]
+    # Crossing a downward edge from left to right enters a counterclockwise ring.
+    directions = np.where(ends[:, 1] < starts[:, 1], 1, -1)
+    heights = [(vertices[:, 1], vertex_owners), _crossing_heights(starts, ends, owners)]
+    if window is not None:
+        x_min, y_min, x_max, y_max = window
+        labels = np.unique(clusters)
+        heights.extend([(np.full(labels.size, y_min), labels), (np.full(labels.size, y_max), labels),
+                        _vertical_crossing_heights(starts, ends, owners, x_min),
+                        _vertical_crossing_heights(starts, ends, owners, x_max)])
+    # Each slab boundary is identified by an integer key made from its cluster and the rank of its y-coordinate.
+    values = np.unique(np.concatenate([y for y, _ in heights]))
+
+    def keys(y, labels):
+        return labels * values.size + np.searchsorted(values, y)
+
+    level_keys = np.unique(np.concatenate([keys(y, labels) for y, labels in heights]))
+    level_y = values[level_keys % values.size]
+    low = np.searchsorted(level_keys, keys(np.minimum(starts[:, 1], ends[:, 1]), owners))
+    high = np.searchsorted(level_keys, keys(np.maximum(starts[:, 1], ends[:, 1]), owners))
+    levels, edges = geometry.expand_ranges(low, high)
+    if window is not None:
+        inside = (level_y[levels] >= y_min) & (level_y[levels + 1] <= y_max)
+        levels = levels[inside]
+        edges = edges[inside]
+    a = starts[edges]
+    b = ends[edges]
+    x0 = geometry.segment_x_at(a, b, level_y[levels])
+    x1 = geometry.segment_x_at(a, b, level_y[levels + 1])
+    # Where two edges coincide, the edge that enters is sorted first, so that shapes that abut are not separated.
+    order = np.lexsort((-directions[edges], x0 + x1, levels))
+    levels = levels[order]
+    x0 = x0[order]
+    x1 = x1[order]
+    steps = directions[edges[order]]
+    # The directions within each slab sum to zero, so the running total returns to zero at the end of every slab.
+    totals = np.cumsum(steps)
+    previous = totals - steps
+    begins = np.flatnonzero((previous == 0) & (totals != 0))
+    stops = np.flatnonzero((previous != 0) & (totals == 0))
+    levels = levels[begins]
+    left0 = x0[begins]
+    left1 = x1[begins]
+    right0 = x0[stops]
+    right1 = x1[stops]
+    if levels.size:
+        # Join intervals that touch, which rounding can separate where edges cross.
+        joined = (levels[1:] == levels[:-1]) & (left0[1:] <= right0[:-1]) & (left1[1:] <= right1[:-1])
+        first = np.flatnonzero(np.concatenate(([True], ~joined)))
+        right0 = np.maximum.reduceat(right0, first)
+        right1 = np.maximum.reduceat(right1, first)
+        levels = levels[first]
+        left0 = left0[first]
+        left1 = left1[first]
+        # Edges that cross just inside a slab because their crossing height was rounded leave intervals that overlap,
+        # or that are reversed, by a rounding error at one end. Clamp them, so that the intervals in each slab are
+        # disjoint and the boundary found by _boundary() is closed.
+        same = np.concatenate(([False], levels[1:] == levels[:-1]))
+        while True:
+            right0 = np.maximum(right0, left0)
+            right1 = np.maximum(right1, left1)
+            clamped0 = np.where(same, np.maximum(left0, np.roll(right0, 1)), left0)
+            clamped1 = np.where(same, np.maximum(left1, np.roll(right1, 1)), left1)
+            if np.array_equal(clamped0, left0) and np.array_equal(clamped1, left1):
+                break
+            left0 = clamped0
+            left1 = clamped1
+    if window is not None:
+        left0, right0, left1, right1 = [np.clip(x, x_min, x_max) for x in (left0, right0, left1, right1)]
+        keep = (right0 > left0) | (right1 > left1)
+        levels, left0, right0, left1, right1 = [array[keep] for array in (levels, left0, right0, left1, right1)]
+    return level_y, levels, left0, right0, left1, right1
+
+
+def _boundary(level_y, levels, left0, right0, left1, right1):
+    """
+    Return the boundary of a union of trapezoids from _union_trapezoids() as directed segments, with the region on
+    their left.
+
+    :return: a tuple (starts, ends) of arrays with shape (K, 2).
+    """
+    y0 = level_y[levels]
+    y1 = level_y[levels + 1]
+    # The left sides run down and the right sides run up.
+    starts = [np.column_stack((left1, y1)), np.column_stack((right0, y0))]
+    ends = [np.column_stack((left0, y0)), np.column_stack((right1, y1))]
+    # Along each slab boundary, compare the coverage by the tops of the trapezoids below with the coverage by the
+    # bottoms of the trapezoids above. The changes at each boundary sum to zero, so the running totals need no reset.
+    count = levels.size
+    ones = np.ones(count, dtype=np.int64)
+    zeros = np.zeros(count, dtype=np.int64)
+    event_levels = np.concatenate((levels + 1, levels + 1, levels, levels))
+    event_x = np.concatenate((left1, right1, left0, right0))
+    below = np.concatenate((ones, -ones, zeros, zeros))
+    above = np.concatenate((zeros, zeros, ones, -ones))
+    order = np.lexsort((event_x, event_levels))
+    event_levels = event_levels[order]
+    event_x = event_x[order]
+    below = np.cumsum(below[order])[:-1]
+    above = np.cumsum(above[order])[:-1]
+    piece = (event_levels[1:] == event_levels[:-1]) & (event_x[1:] > event_x[:-1])
+    y = level_y[event_levels[:-1]]
+    low_x = np.column_stack((event_x[:-1], y))
+    high_x = np.column_stack((event_x[1:], y))
+    # A piece that is covered only from below is a top side, which runs in the -x direction, and a piece that is
+    # covered only from above is a bottom side, which runs in the +x direction.
+    top = piece & (below > 0) & (above == 0)
+    bottom = piece & (above > 0) & (below == 0)
+    starts.extend([high_x[top], low_x[bottom]])
+    ends.extend([low_x[top], high_x[bottom]])
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+def _link(starts, ends):
+    """
+    Link directed segments that form closed boundaries into rings. Where more than one segment leaves a point, each
+    segment that arrives there is followed by the segment that turns farthest to the left.
+
+    :return: a tuple (vertices, offsets).
+    """
+    count = starts.shape[0]
+    if not count:
+        return np.empty((0, 2)), np.zeros(1, dtype=np.int64)
+    points = np.concatenate((starts, ends))
+    order = np.lexsort((points[:, 1], points[:, 0]))
+    point_ids = np.empty(order.size, dtype=np.int64)
+    point_ids[order] = np.cumsum(np.concatenate(([False], np.any(np.diff(points[order], axis=0) != 0, axis=1))))
+    # Each segment is a ray leaving its start point and, reversed, a ray leaving its end point.
+    segment_ids = np.tile(np.arange(count), 2)
+    arriving = np.repeat([False, True], count)
+    d = np.concatenate((ends - starts, starts - ends))
+    order = np.lexsort((np.arctan2(d[:, 1], d[:, 0]), point_ids))
+    point_ids = point_ids[order]
+    segment_ids = segment_ids[order]
+    arriving = arriving[order]
+    first = np.concatenate(([True], point_ids[1:] != point_ids[:-1]))
+    group_starts = np.flatnonzero(first)
+    groups = np.cumsum(first) - 1
+    group_lasts = np.append(group_starts[1:], order.size) - 1
+    # Around a point, the rays alternate between arriving and leaving, and the leftmost turn after arriving is the next
+    # ray in clockwise order.
+    previous = np.where(first, group_lasts[groups], np.arange(order.size) - 1)
+    bad = np.zeros(group_starts.size, dtype=bool)
+    bad[groups[arriving & arriving[previous]]] = True
+    following = np.empty(count, dtype=np.int64)
+    good = arriving & ~bad[groups]
+    following[segment_ids[good]] = segment_ids[previous[good]]
+    # Where the rays do not alternate, such as where segments coincide, pair the rays in order of angle instead.
+    rays = np.flatnonzero(bad[groups])
+    if rays.size:
+        rays = rays[np.lexsort((arriving[rays], groups[rays]))]
+        half = (np.bincount(groups[rays], minlength=group_starts.size) // 2)[groups[rays]]
+        arrivals = np.flatnonzero(arriving[rays])
+        following[segment_ids[rays[arrivals]]] = segment_ids[rays[arrivals - half[arrivals]]]
+    # Pointer doubling labels each ring by its smallest segment and finds the distance of each segment from it.
+    labels = np.arange(count)
+    jumps = following
+    steps = int(np.ceil(np.log2(count))) + 1
+    for _ in range(steps):
+        labels = np.minimum(labels, labels[jumps])
+        jumps = jumps[jumps]
+    roots = labels == np.arange(count)
+    distances = np.where(roots, 0, 1)
+    jumps = np.where(roots, np.arange(count), following)
+    for _ in range(steps):
+        distances = distances + distances[jumps]
+        jumps = jumps[jumps]
+    ring_labels, counts = np.unique(labels, return_counts=True)
+    lengths = counts[np.searchsorted(ring_labels, labels)]
+    order = np.lexsort(((lengths - distances) % lengths, labels))
+    return starts[order], geometry.offsets_from_counts(counts)
+
+
+def union(vertices, offsets, window=None):
+    """
+    Return the union of the given rings as non-overlapping rings; see the module docstring.
+
+    :param vertices: the (N, 2) vertex array, in database units.
+    :param offsets: the offsets array of M closed shapes, which may overlap and may have either orientation.
+    :param window: if not None, a box (x_min, y_min, x_max, y_max) to which the union is clipped.
+    :return: a tuple (vertices, offsets) in which vertices is an int64 array, outer rings are counterclockwise, and
+        holes are clockwise.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets)
+    nonempty = np.flatnonzero(np.diff(offsets) > 0)
+    vertices, offsets = geometry.select(vertices, offsets, nonempty)
+    if not nonempty.size:
+        return np.empty((0, 2), dtype=np.int64), offsets
+    vertices, offsets = geometry.normalize_rings(vertices, offsets)
+    clusters = _clusters(geometry.bounding_boxes(vertices, offsets))
+    starts, ends = _boundary(*_union_trapezoids(vertices, offsets, clusters, window))
+    vertices, offsets = _link(starts, ends)
+    vertices = np.rint(vertices)
+    # Removing a collinear vertex can leave a repeated vertex, and so on, where rounding has flattened a sliver.
+    count = -1
+    while vertices.shape[0] != count:
+        count = vertices.shape[0]
+        vertices, offsets = fracture._simplify(vertices, offsets)
+    # Rounding can collapse slivers to rings without area.
+    valid = np.flatnonzero((np.diff(offsets) >= 3) & (geometry.ring_signed_areas(vertices, offsets) != 0))
+    vertices, offsets = geometry.select(vertices, offsets, valid)
+    return vertices.astype(np.int64), offsets
+
+
+def _hole_parents(vertices, offsets, outers, holes):
+    """
+    :return: an array containing, for each hole, the index of the smallest outer ring that contains it, or -1.
+    """
+    # Test a point just inside each hole, beside the middle of its first edge; the inside of a clockwise ring is on the
+    # right.
+    p = vertices[offsets[holes]].astype(np.float64)
+    q = vertices[offsets[holes] + 1].astype(np.float64)
+    d = q - p
+    normals = np.column_stack((d[:, 1], -d[:, 0])) / np.hypot(d[:, 0], d[:, 1])[:, np.newaxis]
+    points = (p + q) / 2 + _HOLE_TEST_DISTANCE * normals
+    outer_vertices, outer_offsets = geometry.select(vertices, offsets, outers)
+    i, j = spatial.box_pairs(spatial.point_boxes(points), geometry.bounding_boxes(outer_vertices, outer_offsets))
+    inside = geometry.rings_contain(outer_vertices, outer_offsets, j, points[i])
+    i = i[inside]
+    j = j[inside]
+    areas = geometry.ring_areas(outer_vertices, outer_offsets)
+    order = np.lexsort((areas[j], i))
+    holes_inside, first = np.unique(i[order], return_index=True)
+    parents = np.full(holes.size, -1, dtype=np.int64)
+    parents[holes_inside] = outers[j[order[first]]]
+    return parents
+
+
+def polygons(vertices, offsets, max_vertices=gds.MAX_BOUNDARY_POINTS - 1):
+    """
+    Convert rings from union() into polygons without holes. Each outer ring without holes is a polygon, split only if it
+    has more than the given number of vertices, and each outer ring with holes is cut into pieces with
+    fracture.fracture().
+
+    :param vertices: the (N, 2) vertex array returned by union().
+    :param offsets: the offsets array returned by union().
+    :param max_vertices: the maximum number of vertices in each polygon, which must be at least 4.
+    :return: a tuple (vertices, offsets).
+    """
+    areas = geometry.ring_signed_areas(vertices, offsets)
+    outers = np.flatnonzero(areas > 0)
+    holes = np.flatnonzero(areas < 0)
+    parents = _hole_parents(vertices, offsets, outers, holes) if holes.size and outers.size else np.full(holes.size, -1)
+    holes = holes[parents >= 0]
+    parents = parents[parents >= 0]
+    holed = np.unique(parents)
+    plain_vertices, plain_offsets, _ = fracture.split(*geometry.select(vertices, offsets, np.setdiff1d(outers, holed)),
+                                                      max_vertices=max_vertices)
+    if holed.size:
+        rings = np.concatenate((holed, holes))
+        groups = np.concatenate((np.arange(holed.size), np.searchsorted(holed, parents)))
+        piece_vertices, piece_offsets, _ = fracture.fracture(*geometry.select(vertices, offsets, rings),
+                                                             max_vertices=max_vertices, groups=groups)
+        plain_vertices = np.concatenate((plain_vertices, piece_vertices))
+        plain_offsets = np.concatenate((plain_offsets, plain_offsets[-1] + piece_offsets[1:]))
+    # Fracturing can leave pieces without area where a hole touches its outer ring.
+    return geometry.select(plain_vertices, plain_offsets, np.flatnonzero(np.diff(plain_offsets) >= 3))
+
+
+def _merge_tile(tile, max_vertices):
+    """
+    The tiling operation used by merge(): it returns the polygons of the union within the tile as a single item, which
+    is anchored at the center of the tile.
+    """
+    vertices, offsets = polygons(*union(tile.vertices, tile.offsets, window=tile.box), max_vertices=max_vertices)
+    return [(tile.box[:2] + tile.box[2:]) / 2], [(vertices, offsets)]
+
+
+def merge(cell, layer, result_layer=None, tile_size=None, max_vertices=gds.MAX_BOUNDARY_POINTS - 1, workers=None):
+    """
+    Replace the boxes, circles, polygons, and paths on a layer of the given cell by polygons that cover their union;
+    see the module docstring. Paths are replaced by their outlines from geometry.path_outline(). Text elements and cell
+    references are unchanged. This clears the current selection of the cell.
+
+    :param cell: a wrapper.Cell.
+    :param layer: the layer to merge.
+    :param result_layer: the layer on which the polygons are created; if None, it is the given layer.
+    :param tile_size: if not None, the side of the square tiles in which the shapes are merged separately; see
+        tiling.py.
+    :param max_vertices: the maximum number of vertices in each polygon; see polygons().
+    :param workers: if greater than 1 and tile_size is given, the number of processes in which to merge the tiles.
+    :return: a list of the new Polygon elements.
+    """
+    if result_layer is None:
+        result_layer = layer
+    table = cell.element_table()
+    vertices, offsets, _ = table.outlines([layer])
+    rows = table.rows(types=(wrapper.BOX, wrapper.CIRCLE, wrapper.POLYGON, wrapper.PATH), layers=[layer])
+    if not rows.size:
+        return []
+    if tile_size is None:
+        pieces = [polygons(*union(vertices, offsets), max_vertices=max_vertices)]
+    else:
+        operation = functools.partial(_merge_tile, max_vertices=max_vertices)
+        _, pieces = tiling.run(operation, vertices, offsets, cell.drawing.to_database_units(tile_size),
+                               workers=workers)
+    pyl_elements, _, _ = layers._scan(cell)
+    layers._select(cell, pyl_elements, rows)
+    cell.pyl.deleteSelect()
+    result = []
+    for piece_vertices, piece_offsets in pieces:
+        for start, stop in zip(piece_offsets[:-1], piece_offsets[1:]):
+            result.append(cell.add_polygon(np.rint(piece_vertices[start:stop]), result_layer, database=True))
+    return result
@@ -0,0 +1,93 @@
+"""
+This module converts values between the units used by the wrapper classes and the integer database units stored by
+pylayout.
+
+A Units object holds a copy of the units of a drawing, so conversions do not read them from pylayout, and each
+conversion handles scalars and arrays of any shape with the same few numpy operations. A Drawing creates its Units when
+they are first needed and discards them whenever one of its unit setters runs; see Drawing.units. Values are rounded to
+the nearest integer, with ties rounded to even, and integer results are always 64-bit. Because pylayout stores each
+coordinate in a 32-bit integer, values that would not fit, which can happen for wafer-scale layouts with a fine
+database unit, raise an OverflowError instead of wrapping around silently.
+"""
+from __future__ import division
+
+import numpy as np
+
+# The largest magnitude of a coordinate in database units that pylayout can store.
+MAX_DATABASE_UNITS = 2 ** 31 - 1
+
+
+def check_range(values):
+    """
+    Raise an OverflowError if any of the given values in database units cannot be stored by pylayout.
+
+    :param values: a number or an array of numbers in database units.
+    :return: None
+    :raises OverflowError: if any value has a magnitude larger than MAX_DATABASE_UNITS or is not finite.
+    """
+    values = np.asarray(values)
+    if values.size and not np.abs(values).max() <= MAX_DATABASE_UNITS:
+        raise OverflowError("Values are not finite or out of the range of database units: the largest magnitude is {}, "
+                            "and the limit is {}.".format(np.abs(values).max(), MAX_DATABASE_UNITS))
+
+
+class Units(object):
+    """The units of a drawing, and conversions between them; see the module docstring."""
+
+    __slots__ = ('user_unit', 'database_unit', 'use_user_unit')
+
+    def __init__(self, user_unit, database_unit, use_user_unit=True):
+        """
+        :param user_unit: the size of the database unit in user units; see Drawing.user_unit.
+        :param database_unit: the size of the database unit in meters; see Drawing.database_unit.
+        :param use_user_unit: if True, the values given to and returned by the conversions are in user units;
+            otherwise they are in database units.
+        """
+        self.user_unit = float(user_unit)
+        self.database_unit = float(database_unit)
+        self.use_user_unit = bool(use_user_unit)
+
+    def __repr__(self):
+        return 'Units(user_unit={!r}, database_unit={!r}, use_user_unit={!r})'.format(
+            self.user_unit, self.database_unit, self.use_user_unit)
+
+    @property
+    def grid(self):
+        """
+        The spacing of the database grid in the units given to the conversions; see Drawing.grid.
+        """
+        return self.user_unit if self.use_user_unit else 1
+
+    def to_database(self, value_or_array):
+        """
+        Convert the given value or array to integer database units, rounding to the nearest integer.
+
+        :param value_or_array: a number, or anything that can be converted to an array of numbers.
+        :return: an int for a scalar, or an int64 array with the same shape.
+        :raises OverflowError: if any result cannot be stored by pylayout; see check_range().
+        """
+        values = np.asarray(value_or_array, dtype=np.float64)
+        if self.use_user_unit:
+            values = values / self.user_unit
+        values = np.rint(values)
+        check_range(values)
+        if values.ndim:
+            return values.astype(np.int64)
+        return int(values)
+
+    def from_database(self, value_or_array):
+        """
+        Convert the given value or array from integer database units.
+
+        :param value_or_array: an integer, or anything that can be converted to an array of integers.
+        :return: if use_user_unit is True, a float or a float64 array in user units; otherwise an int or an int64 array.
+        """
+        values = np.asarray(value_or_array)
+        if self.use_user_unit:
+            values = values * self.user_unit
+            if values.ndim:
+                return values.astype(np.float64)
+            return float(values)
+        if values.ndim:
+            return values.astype(np.int64)
+        return int(values)
@@ -30,8 +30,11 @@ import numpy as np
 import pylayout
 sys.path.insert(0, os.path.dirname(pylayout.__file__))
 from PyQt4 import QtCore, QtGui
+import sip
 sys.path.pop(0)
 
+from . import geometry, units
+
 # The two following simple functions are available to code that uses (lists of) numpy arrays as points.
 # This makes it easy for methods to accept lists of tuples, for example.
 
@@ -56,6 +59,36 @@ def to_point_list(iterable):
     return [to_point(point) for point in iterable]
 
 
+def address(pyl_object):
+    """
+    Return the address of the C++ object wrapped by the given pylayout object. Different Python objects can wrap the
+    same pylayout object, so this is the way to tell whether two wrappers refer to the same thing. The address is
+    unique only while the object exists, since it may be reused after the object is deleted.
+
+    :param pyl_object: a pylayout object.
+    :return: an int that is the memory address of the underlying object.
+    """
+    return sip.unwrapinstance(pyl_object)
+
+
+# The element types, in the order in which they are checked; the index of each name is its code in an ElementTable.
+ELEMENT_TYPES = ('Box', 'Cellref', 'CellrefArray', 'Circle', 'Path', 'Polygon', 'Text')
+BOX, CELLREF, CELLREF_ARRAY, CIRCLE, PATH, POLYGON, TEXT = range(len(ELEMENT_TYPES))
+
+
+def element_type(pyl_element):
+    """
+    Return the type code of the given pylayout element, which is its index in ELEMENT_TYPES.
+
+    :param pyl_element: a pylayout element object.
+    :return: an int type code.
+    """
+    for code, name in enumerate(ELEMENT_TYPES):
+        if getattr(pyl_element, 'is' + name)():
+            return code
+    raise ValueError("Unknown pylayout element.")
+
+
 def instantiate_element(pyl_element, drawing):
     """
     Instantiate the appropriate wrapper class for the given pylayout element type.
@@ -64,11 +97,7 @@ def instantiate_element(pyl_element, drawing):
     :param drawing: a Drawing object.
     :return: a wrapper instance for the pylayout element.
     """
-    elements = (Box, Cellref, CellrefArray, Circle, Path, Polygon, Text)
-    for element in elements:
-        if getattr(pyl_element, 'is' + element.__name__)():
-            return element(pyl_element, drawing)
-    raise ValueError("Unknown pylayout element.")
+    return globals()[ELEMENT_TYPES[element_type(pyl_element)]](pyl_element, drawing)
 
 
 class Layout(QtCore.QObject):
@@ -106,6 +135,9 @@ class Layout(QtCore.QObject):
 class Drawing(object):
     """Wrap a pylayout.drawingField object."""
 
+    # The class used to wrap the cells in this drawing, which subclasses can replace with a Cell subclass.
+    cell_class = None  # Set to Cell below, after it is defined.
+
     def __init__(self, pyl_drawing, use_user_unit=True, auto_number=False):
         """
         :param pyl_drawing: a pylayout.drawingField instance.
@@ -117,21 +149,64 @@ class Drawing(object):
         :return: a Drawing instance.
         """
         self.pyl = pyl_drawing
-        self.use_user_unit = use_user_unit
+        self._units = None
+        self._use_user_unit = use_user_unit
         self.auto_number = auto_number
         if auto_number:
             self._cell_number = 0
 
+    def _read_units(self):
+        """
+        :return: a tuple (user_unit, database_unit) read from pylayout.
+        """
+        return self.pyl.userunits, self.pyl.databaseunits
+
+    @property
+    def units(self):
+        """
+        The units.Units object that performs all unit conversions for this drawing. It is created from the pylayout
+        units when first needed and discarded when the units are set through this drawing; call reload_units() after
+        changing the units in the LayoutEditor GUI.
+
+        :return: a units.Units instance.
+        """
+        if self._units is None:
+            user_unit, database_unit = self._read_units()
+            self._units = units.Units(user_unit, database_unit, self._use_user_unit)
+        return self._units
+
+    def reload_units(self):
+        """
+        Discard the cached units, so that they are read from pylayout again when next needed.
+
+        :return: None
+        """
+        self._units = None
+
+    @property
+    def use_user_unit(self):
+        """
+        A boolean that determines whether the values given to and returned by the classes in this module are in user
+        units or in database units.
+        """
+        return self._use_user_unit
+
+    @use_user_unit.setter
+    def use_user_unit(self, use_user_unit):
+        self._use_user_unit = use_user_unit
+        self._units = None
+
     @property
     def database_unit(self):
         """
         :return: the database unit in meters.
         """
-        return self.pyl.databaseunits
+        return self.units.database_unit
 
     @database_unit.setter
     def database_unit(self, unit):
         self.pyl.databaseunits = unit
+        self._units = None
 
     @property
     def user_unit(self):
@@ -139,11 +214,20 @@ class Drawing(object):
         This is the ratio of the database unit to the user unit. All points are saved as integer values in database
         units, so this number is the data resolution in user units.
         """
-        return self.pyl.userunits
+        return self.units.user_unit
 
     @user_unit.setter
     def user_unit(self, unit):
         self.pyl.userunits = unit
+        self._units = None
+
+    @property
+    def grid(self):
+        """
+        The spacing of the database grid in the units used by this drawing: the user unit if use_user_unit is True,
+        and 1 otherwise. This is the natural value for the round_to argument of the elements in path.py.
+        """
+        return self.units.grid
 
     def to_database_units(self, value_or_array):
         """
@@ -151,33 +235,23 @@ class Drawing(object):
         the attribute use_user_unit in the following way: if this is True, then this function expects values in user
         units, which are scaled appropriately and rounded to the nearest integer; if False, this function expects
         values in database units, which are simply rounded to the nearest integer. The return value is always an int or
-        a np.array of ints.
+        a np.array of 64-bit ints; see units.Units.to_database().
 
         :param value_or_array: a value or array to be converted to integer database units.
         :return: the converted int or int array.
+        :raises OverflowError: if a converted value is too large for pylayout.
         """
-        try:
-            if self.use_user_unit:
-                return np.round(value_or_array / self.user_unit).astype(np.int)
-            else:
-                return np.round(value_or_array).astype(np.int)
-        except AttributeError:  # not an array-like object
-            if self.use_user_unit:
-                return int(round(value_or_array / self.user_unit))
-            else:
-                return int(value_or_array)
+        return self.units.to_database(value_or_array)
 
     def from_database_units(self, value_or_array):
-        try:
-            if self.use_user_unit:
-                return (value_or_array * self.user_unit).astype(np.float)
-            else:
-                return value_or_array.astype(np.int)
-        except AttributeError:  # not an array-like object
-            if self.use_user_unit:
-                return float(value_or_array * self.user_unit)
-            else:
-                return int(value_or_array)
+        """
+        Convert the given value or array from integer database units to the units used by this drawing; see
+        units.Units.from_database().
+
+        :param value_or_array: an integer value or array in database units.
+        :return: a float or float array in user units if use_user_unit is True, and otherwise an int or int array.
+        """
+        return self.units.from_database(value_or_array)
 
     @property
     def cells(self):
@@ -191,7 +265,7 @@ class Drawing(object):
         cell_dict = OrderedDict()
         current = self.pyl.firstCell
         while current is not None:
-            cell = Cell(current.thisCell, self)
+            cell = self.cell_class(current.thisCell, self)
             cell_dict[cell.name] = cell
             n_cells += 1
             current = current.nextCell
@@ -207,22 +281,45 @@ class Drawing(object):
         database units; see __init__().
         :return: a PyQt4.QtCore.QPoint instance that contains the given coordinates in integer database units.
         """
-        return pylayout.point(self.to_database_units(array[0]), self.to_database_units(array[1]))
+        x, y = self.to_database_units(np.asarray(array, dtype=np.float64)[:2]).tolist()
+        return pylayout.point(x, y)
 
     def _pyqt_to_np(self, point):
-        return self.from_database_units(np.array([point.x(), point.y()]))
+        return self.from_database_units(np.array([point.x(), point.y()], dtype=np.int64))
+
+    def _to_point_array(self, list_of_np_arrays, database=False):
+        """
+        Create a pylayout.pointArray from the given points, converting all of them to database units at once.
 
-    def _to_point_array(self, list_of_np_arrays):
-        pa = pylayout.pointArray(len(list_of_np_arrays))
-        for i, array in enumerate(list_of_np_arrays):
-            pa.setPoint(i, self._np_to_pyqt(array))
+        :param list_of_np_arrays: an iterable of points, or an array with shape (N, 2).
+        :param database: if True, the points are already in integer database units and are used without conversion.
+        :return: a pylayout.pointArray instance.
+        """
+        if database:
+            array = np.asarray(list_of_np_arrays, dtype=np.int64).reshape(-1, 2)
+            units.check_range(array)
+        else:
+            array = self.to_database_units(np.asarray(list_of_np_arrays, dtype=np.float64).reshape(-1, 2))
+        pa = pylayout.pointArray(array.shape[0])
+        for i, (x, y) in enumerate(array.tolist()):
+            pa.setPoint(i, pylayout.point(x, y))
         return pa
 
+    def _to_np_array(self, point_array):
+        """
+        Convert a pylayout.pointArray to a numpy array without changing the units.
+
+        :param point_array: a pylayout.pointArray instance.
+        :return: an integer numpy array with shape (N, 2) containing the coordinates of the N points in database units.
+        """
+        array = np.empty((point_array.size(), 2), dtype=np.int64)
+        for i in range(array.shape[0]):
+            point = point_array.point(i)
+            array[i] = point.x(), point.y()
+        return array
+
     def _to_list_of_np_arrays(self, point_array):
-        array_list = []
-        for i in range(point_array.size()):
-            array_list.append(self._pyqt_to_np(point_array.point(i)))
-        return array_list
+        return list(self.from_database_units(self._to_np_array(point_array)))
 
     def add_cell(self, name):
         """
@@ -244,12 +341,14 @@ class Drawing(object):
         #  will operate on currentCell instead of the cell created by this method.
         # ToDo: this may no longer be necessary
         self.pyl.currentCell = pyl_cell
-        return Cell(pyl_cell, self)
+        return self.cell_class(pyl_cell, self)
 
 
 class Cell(object):
     """Wrap a pylayout.cell object."""
 
+    __slots__ = ('pyl', 'drawing')
+
     def __init__(self, pyl_cell, drawing):
         self.pyl = pyl_cell
         self.drawing = drawing
@@ -282,9 +381,66 @@ class Cell(object):
             current = current.nextElement
         return element_list
 
+    def element_table(self):
+        """
+        :return: an ElementTable containing all elements in this cell.
+        """
+        return ElementTable(self)
+
     def __str__(self):
         return 'Cell {}: {}'.format(self.name, [str(e) for e in self.elements])
 
+    def marker(self):
+        """
+        Return a marker that records the current state of this cell, for use with elements_since().
+
+        :return: the address of the most recently added element, or None if the cell is empty.
+        """
+        if self.pyl.firstElement is None:
+            return None
+        return address(self.pyl.firstElement.thisElement)
+
+    def elements_since(self, marker):
+        """
+        Return the elements that have been added to this cell since the given marker was created. Since new elements
+        are prepended to the internal linked list, this requires walking only the new part of the list.
+
+        :param marker: a value returned by marker().
+        :return: a list of Element objects, most recent first.
+        :raises RuntimeError: if the element recorded by the marker has since been deleted.
+        """
+        element_list = []
+        current = self.pyl.firstElement
+        while current is not None:
+            if marker is not None and address(current.thisElement) == marker:
+                return element_list
+            element_list.append(instantiate_element(current.thisElement, self.drawing))
+            current = current.nextElement
+        if marker is not None:
+            raise RuntimeError("The element recorded by the marker is no longer in the cell.")
+        return element_list
+
+    def clear(self):
+        """
+        Delete all elements from this cell. This clears the current selection in the cell.
+
+        :return: None
+        """
+        self.pyl.selectAll()
+        self.pyl.deleteSelect()
+
+    def delete_elements(self, elements):
+        """
+        Delete the given elements from this cell. This clears the current selection in the cell.
+
+        :param elements: an iterable of Element objects that are contained in this cell.
+        :return: None
+        """
+        self.pyl.deselectAll()
+        for element in elements:
+            element.pyl.select()
+        self.pyl.deleteSelect()
+
     def subtract(self, positive_layer, negative_layer, result_layer, delete=True):
         """
         Perform the boolean operation
@@ -318,6 +474,26 @@ class Cell(object):
         cell.angle = angle
         return cell
 
+    def add_cells(self, cell, origins, angles=0):
+        """
+        Add many references to a single cell to this cell. This is faster than calling add_cell() repeatedly because
+        all of the origins are converted to database units at once.
+
+        :param cell: the Cell object to add to this cell.
+        :param origins: an iterable of N points, such as an array with shape (N, 2), containing the origins.
+        :param angles: a float, or an iterable of N floats, representing the cell orientations in degrees.
+        :return: a list of N Cellref objects.
+        """
+        origins = self.drawing.to_database_units(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+        angles = np.broadcast_to(np.asarray(angles, dtype=np.float64), origins.shape[:1])
+        cellrefs = []
+        for (x, y), angle in zip(origins.tolist(), angles.tolist()):
+            cellref = Cellref(self.pyl.addCellref(cell.pyl, pylayout.point(x, y)), self.drawing)
+            if angle:
+                cellref.angle = angle
+            cellrefs.append(cellref)
+        return cellrefs
+
     def add_cell_array(self, cell, origin=(0, 0), step_x=(0, 0), step_y=(0, 0), repeat_x=1, repeat_y=1, angle=0):
         """
         Add an array of cells to this cell.
@@ -378,16 +554,18 @@ class Cell(object):
                                        self.drawing.to_database_units(radius), int(number_of_points))
         return Circle(pyl_circle, self.drawing)
 
-    def add_polygon(self, points, layer):
+    def add_polygon(self, points, layer, database=False):
         """
         Add a polygon to this cell and return the corresponding object. If the given list of points does not close,
         pylayout will automatically add the first point to the end of the point list in order to close it.
 
         :param points: an iterable of points that are the vertices of the polygon.
         :param layer: the layer on which the polygon is created.
+        :param database: if True, the points are integer database units, such as those returned by
+            Drawing.to_database_units(), and are used exactly as given.
         :return: a Polygon object.
         """
-        pyl_polygon = self.pyl.addPolygon(self.drawing._to_point_array(points), int(layer))
+        pyl_polygon = self.pyl.addPolygon(self.drawing._to_point_array(points, database=database), int(layer))
         return Polygon(pyl_polygon, self.drawing)
 
     def add_polygon_arc(self, center, inner_radius, outer_radius, layer, start_angle=0, stop_angle=0):
@@ -410,7 +588,7 @@ class Cell(object):
                                              float(start_angle), float(stop_angle), int(layer))
         return Polygon(pyl_polygon, self.drawing)
 
-    def add_path(self, points, layer, width=None, cap=None):
+    def add_path(self, points, layer, width=None, cap=None, database=False):
         """
         Add a path to this cell and return the corresponding object. A path may be closed or open.
 
@@ -418,9 +596,11 @@ class Cell(object):
         :param layer: the layer on which the path is created.
         :param width: the width of the path.
         :param cap: the cap style of the path; the default of None will create a path with the current default cap.
+        :param database: if True, the points are integer database units, such as those returned by
+            Drawing.to_database_units(), and are used exactly as given; the width is always in the drawing units.
         :return: a Path object.
         """
-        pyl_path = self.pyl.addPath(self.drawing._to_point_array(points), int(layer))
+        pyl_path = self.pyl.addPath(self.drawing._to_point_array(points, database=database), int(layer))
         path = Path(pyl_path, self.drawing)
         if width is not None:
             path.width = float(width)
@@ -446,13 +626,50 @@ class Cell(object):
             text_.height = height
         return text_
 
+    def add_texts(self, origins, texts, layer, height=None):
+        """
+        Add many text objects to this cell. This is faster than calling add_text() repeatedly because all of the
+        origins and the height are converted to database units at once.
+
+        :param origins: an iterable of N points, such as an array with shape (N, 2), containing the origins.
+        :param texts: an iterable of N strings.
+        :param layer: the layer on which the text is created.
+        :param height: the height of all of the text objects; see add_text().
+        :return: a list of N Text objects.
+        """
+        origins = self.drawing.to_database_units(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+        if height is not None:
+            height = self.drawing.to_database_units(height)
+        texts_ = []
+        for (x, y), text in zip(origins.tolist(), texts):
+            pyl_text = self.pyl.addText(int(layer), pylayout.point(x, y), str(text))
+            if height is not None:
+                pyl_text.setWidth(height)
+            texts_.append(Text(pyl_text, self.drawing))
+        return texts_
+
+
+Drawing.cell_class = Cell
+
 
 class Element(object):
 
+    __slots__ = ('pyl', 'drawing')
+
     def __init__(self, pyl_element, drawing):
         self.pyl = pyl_element
         self.drawing = drawing
 
+    # Wrappers are equal if they wrap the same pylayout element, so they can be stored in sets and used as dict keys.
+    def __eq__(self, other):
+        return isinstance(other, Element) and address(self.pyl) == address(other.pyl)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(address(self.pyl))
+
     @property
     def points(self):
         return self.drawing._to_list_of_np_arrays(self.pyl.getPoints())
@@ -461,6 +678,16 @@ class Element(object):
     def points(self, points):
         self.pyl.setPoints(self.drawing._to_point_array(points))
 
+    @property
+    def database_points(self):
+        """
+        The points exactly as they are stored by pylayout, which is useful for code that operates on many elements at
+        once. Note that for a CellrefArray these are the three pylayout points, not the points returned by .points.
+
+        :return: an integer numpy array with shape (N, 2) containing the points in database units.
+        """
+        return self.drawing._to_np_array(self.pyl.getPoints())
+
     @property
     def data_type(self):
         return self.pyl.getDatatype()
@@ -521,6 +748,8 @@ class LayerElement(Element):
     layer, which is all of them except for the Cellref and CellrefArray classes.
     """
 
+    __slots__ = ()
+
     @property
     def layer(self):
         return self.pyl.layerNum
@@ -532,16 +761,29 @@ class LayerElement(Element):
 
 class CellElement(Element):
     """
-    This class adds a cell attribute to Element.
+    This class adds a cell attribute to Element. The Cell wrapper is created only when it is first used.
     """
 
+    __slots__ = ('_cell',)
+
     def __init__(self, pyl_element, drawing):
         super(CellElement, self).__init__(pyl_element, drawing)
-        self.cell = Cell(pyl_element.depend(), drawing)
+        self._cell = None
+
+    @property
+    def cell(self):
+        """
+        :return: the referenced Cell.
+        """
+        if self._cell is None:
+            self._cell = self.drawing.cell_class(self.pyl.depend(), self.drawing)
+        return self._cell
 
 
 class Cellref(CellElement):
 
+    __slots__ = ()
+
     def __str__(self):
         return 'Cell {} at ({:.3f}, {:.3f})'.format(self.cell.name, self.origin[0], self.origin[1])
 
@@ -556,6 +798,8 @@ class Cellref(CellElement):
 
 class CellrefArray(CellElement):
 
+    __slots__ = ()
+
     def __str__(self):
         return 'Cell {}: {} {} by {}'.format(self.cell.name, self.points, self.repeat_x, self.repeat_y)
 
@@ -620,6 +864,8 @@ class CellrefArray(CellElement):
 
 class Box(LayerElement):
 
+    __slots__ = ()
+
     @property
     def _points(self):
         (x_upper_left, y_upper_left), (x_lower_right, y_lower_right) = self.points
@@ -655,6 +901,8 @@ class Circle(LayerElement):
     LayoutEditor considers any regular polygon with more than 8 points to be a circle.
     """
 
+    __slots__ = ()
+
     @property
     def center(self):
         # The last point is always the same as the first.
@@ -681,9 +929,14 @@ class Circle(LayerElement):
 
 class Path(LayerElement):
 
+    __slots__ = ()
+
     @property
     def width(self):
-        return self.pyl.getWidth()
+        """
+        The width of the path in the units of the drawing.
+        """
+        return self.drawing.from_database_units(self.pyl.getWidth())
 
     @width.setter
     def width(self, width):
@@ -710,6 +963,8 @@ class Path(LayerElement):
 
 class Polygon(LayerElement):
 
+    __slots__ = ()
+
     @property
     def perimeter(self):
         """
@@ -725,6 +980,8 @@ class Polygon(LayerElement):
 
 class Text(LayerElement):
 
+    __slots__ = ()
+
     def __str__(self):
         return 'Text "{}" at ({:.3f}, {:.3f})'.format(self.text, self.origin[0], self.origin[1])
 
@@ -751,3 +1008,172 @@ class Text(LayerElement):
     @origin.setter
     def origin(self, origin):
         self.points = [to_point(origin)]
+
+
+class ElementTable(object):
+    """
+    A structure-of-arrays view of all of the elements in a cell, for code that analyzes many elements at once.
+
+    The table is built with a single walk over the pylayout element list, without creating any Element wrappers, and
+    it is a snapshot: it does not change if the cell changes. Row i of each array describes element i, in the same
+    order as Cell.elements. All values are in database units. The points of all elements are stored in the
+    concatenated format described in geometry.py, so the points of element i are points[offsets[i]:offsets[i + 1]];
+    these are the points stored by pylayout, as returned by Element.database_points.
+
+    The attributes are the following arrays, each with one row per element:
+    types: the type codes; see ELEMENT_TYPES.
+    layers: the layer numbers, or -1 for cell references.
+    data_types: the data type numbers.
+    widths: the widths of paths and the heights of text, and 0 for other elements.
+    caps: the cap codes of paths, and 0 for other elements.
+    offsets: the offsets into the points array, which has one more entry than the number of elements.
+    points: an integer array with shape (N, 2) containing the points of all elements.
+    repeats: an integer array with shape (M, 2) containing the numbers of columns and rows of cell reference arrays,
+        and (1, 1) for all other elements.
+    angles: the rotation angles of cell references in degrees, and 0 for other elements.
+    scales: the scales of cell references, and 1 for other elements.
+    mirrors: booleans that are True for cell references that are mirrored about the x-axis.
+    cell_names: a list containing the name of the referenced cell for cell references, and None for other elements.
+    addresses: the addresses of the pylayout elements, which identify them; see address().
+    """
+
+    __slots__ = ('cell', 'types', 'layers', 'data_types', 'widths', 'caps', 'offsets', 'points', 'repeats', 'angles',
+                 'scales', 'mirrors', 'cell_names', 'addresses', '_pyl_cells')
+
+    def __init__(self, cell):
+        """
+        :param cell: the Cell from which to build the table.
+        """
+        self.cell = cell
+        drawing = cell.drawing
+        types = []
+        layers = []
+        data_types = []
+        widths = []
+        caps = []
+        point_arrays = []
+        addresses = []
+        references = {}
+        current = cell.pyl.firstElement
+        while current is not None:
+            pyl_element = current.thisElement
+            code = element_type(pyl_element)
+            types.append(code)
+            addresses.append(address(pyl_element))
+            data_types.append(pyl_element.getDatatype())
+            point_arrays.append(drawing._to_np_array(pyl_element.getPoints()))
+            if code in (CELLREF, CELLREF_ARRAY):
+                layers.append(-1)
+                widths.append(0)
+                caps.append(0)
+                references[len(types) - 1] = pyl_element
+            else:
+                layers.append(pyl_element.layerNum)
+                widths.append(pyl_element.getWidth() if code in (PATH, TEXT) else 0)
+                caps.append(pyl_element.getCap() if code == PATH else 0)
+            current = current.nextElement
+        self.types = np.array(types, dtype=np.int8)
+        self.addresses = np.array(addresses, dtype=np.int64)
+        self.layers = np.array(layers, dtype=np.int64)
+        self.data_types = np.array(data_types, dtype=np.int64)
+        self.widths = np.array(widths, dtype=np.int64)
+        self.caps = np.array(caps, dtype=np.int8)
+        self.offsets = np.zeros(len(types) + 1, dtype=np.int64)
+        np.cumsum([array.shape[0] for array in point_arrays], out=self.offsets[1:])
+        if point_arrays:
+            self.points = np.concatenate(point_arrays)
+        else:
+            self.points = np.empty((0, 2), dtype=np.int64)
+        self.repeats = np.ones((len(types), 2), dtype=np.int64)
+        self.angles = np.zeros(len(types))
+        self.scales = np.ones(len(types))
+        self.mirrors = np.zeros(len(types), dtype=bool)
+        self.cell_names = [None] * len(types)
+        self._pyl_cells = {}
+        for row, pyl_element in references.items():
+            transformation = pyl_element.getTrans()
+            self.angles[row] = transformation.getAngle()
+            self.scales[row] = transformation.getScale()
+            self.mirrors[row] = transformation.getMirror_x()
+            if self.types[row] == CELLREF_ARRAY:
+                self.repeats[row] = pyl_element.getNx(), pyl_element.getNy()
+            self._pyl_cells[row] = pyl_element.depend()
+            self.cell_names[row] = Cell(self._pyl_cells[row], drawing).name
+
+    def __len__(self):
+        return self.types.size
+
+    def rows(self, types=None, layers=None):
+        """
+        :param types: if not None, an iterable of type codes to select.
+        :param layers: if not None, an iterable of layer numbers to select.
+        :return: an integer array containing the indices of the selected rows, in increasing order.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if types is not None:
+            mask &= np.isin(self.types, list(types))
+        if layers is not None:
+            mask &= np.isin(self.layers, list(layers))
+        return np.flatnonzero(mask)
+
+    def element_rows(self, elements):
+        """
+        :param elements: an iterable of Element instances.
+        :return: an integer array containing the indices of the rows that describe the given elements, in increasing
+            order; elements that are not in the table are ignored.
+        """
+        return np.flatnonzero(np.isin(self.addresses, [address(element.pyl) for element in elements]))
+
+    def rings(self, layers=None):
+        """
+        Return the outlines of all closed shapes, which are boxes, circles, and polygons, in the concatenated format.
+        Boxes are expanded from two corners to four vertices.
+
+        :param layers: if not None, an iterable of layer numbers to select.
+        :return: a tuple (vertices, offsets, rows) where rows contains the table row of each ring.
+        """
+        box_rows = self.rows(types=(BOX,), layers=layers)
+        other_rows = self.rows(types=(CIRCLE, POLYGON), layers=layers)
+        vertices, offsets = geometry.select(self.points, self.offsets, other_rows)
+        corners = np.stack((self.points[self.offsets[box_rows]], self.points[self.offsets[box_rows] + 1]), axis=1)
+        box_vertices = geometry.box_rings(corners).reshape(-1, 2)
+        vertices = np.concatenate((vertices, box_vertices.astype(vertices.dtype)))
+        offsets = np.concatenate((offsets, offsets[-1] + 4 * np.arange(1, box_rows.size + 1)))
+        return vertices, offsets, np.concatenate((other_rows, box_rows))
+
+    def lines(self, layers=None):
+        """
+        Return the center lines of all paths in the concatenated format.
+
+        :param layers: if not None, an iterable of layer numbers to select.
+        :return: a tuple (vertices, offsets, rows) where rows contains the table row of each path.
+        """
+        rows = self.rows(types=(PATH,), layers=layers)
+        vertices, offsets = geometry.select(self.points, self.offsets, rows)
+        return vertices, offsets, rows
+
+    def outlines(self, layers=None):
+        """
+        Return the outlines of all shapes that have area: the rings of boxes, circles, and polygons, followed by the
+        outlines of paths from geometry.path_outline(). Paths without area are omitted.
+
+        :param layers: if not None, an iterable of layer numbers to select.
+        :return: a tuple (vertices, offsets, rows) where vertices is a float array and rows contains the table row of
+            each outline.
+        """
+        ring_vertices, ring_offsets, ring_rows = self.rings(layers)
+        line_vertices, line_offsets, line_rows = self.lines(layers)
+        outlines = [geometry.path_outline(line_vertices[start:stop], self.widths[row], self.caps[row])
+                    for start, stop, row in zip(line_offsets[:-1], line_offsets[1:], line_rows)]
+        line_rows = line_rows[[outline.shape[0] > 0 for outline in outlines]]
+        outline_vertices, outline_offsets = geometry.concatenate([outline for outline in outlines if outline.shape[0]])
+        vertices = np.concatenate((ring_vertices.astype(np.float64), outline_vertices))
+        offsets = np.concatenate((ring_offsets, ring_offsets[-1] + outline_offsets[1:]))
+        return vertices, offsets, np.concatenate((ring_rows, line_rows))
+
+    def references(self):
+        """
+        :return: a list of (row, Cell) tuples, one for each cell reference or cell reference array.
+        """
+        drawing = self.cell.drawing
+        return [(row, drawing.cell_class(self._pyl_cells[row], drawing)) for row in sorted(self._pyl_cells)]
@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(scope='session')
+def layout():
+    """
+    A LayoutEditor instance without a window; the tests that use it are skipped if pylayout is not installed.
+    """
+    wrapper = pytest.importorskip('layouteditorwrapper.wrapper')
+    return wrapper.Layout(gui=False)
+
+
+@pytest.fixture
+def cell(layout, request):
+    """
+    A new empty cell in a drawing that uses database units, named after the test.
+    """
+    return layout.drawing(use_user_unit=False).add_cell(request.node.name)
@@ -0,0 +1,58 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+cache = pytest.importorskip('layouteditorwrapper.cache')
+wrapper = pytest.importorskip('layouteditorwrapper.wrapper')
+
+
+def _shapes(drawing):
+    cell = drawing.add_cell('shapes')
+    cell.add_box(10, 20, 30, 40, 1)
+    cell.add_box(-5, -7, 3, 200, 2)
+    cell.add_polygon([(0, 0), (100, 0), (50, 80)], 3)
+    cell.add_path([(0, 0), (100, 0), (100, 100)], 4, width=6)
+    return cell
+
+
+def test_cached_cell_matches_original(layout, tmpdir):
+    drawing = layout.drawing(use_user_unit=False, auto_number=True)
+    with cache.GeometryCache(str(tmpdir)):
+        original = cache.call(drawing, _shapes)
+        restored = cache.call(drawing, _shapes)
+    assert restored.name != original.name
+    a = original.element_table()
+    b = restored.element_table()
+    for name in ('types', 'layers', 'data_types', 'widths', 'caps', 'offsets', 'points'):
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+    boxes = [(element.x, element.y, element.width, element.height) for element in restored.elements
+             if isinstance(element, wrapper.Box)]
+    assert sorted(boxes) == [(-5, -7, 3, 200), (10, 20, 30, 40)]
+
+
+def test_function_key_includes_defaults_and_closure():
+    def a(drawing, n=1):
+        return n
+
+    first = cache.function_key(a)
+
+    def a(drawing, n=1):
+        return n
+
+    assert cache.function_key(a) == first
+
+    def a(drawing, n=2):
+        return n
+
+    assert cache.function_key(a) != first
+
+    def make(m):
+        def b(drawing, n=1, *args, **kwargs):
+            return m * n
+
+        return b
+
+    assert cache.function_key(make(1)) == cache.function_key(make(1))
+    assert cache.function_key(make(1)) != cache.function_key(make(2))
+    assert cache.function_key(make(np.zeros)) == cache.function_key(make(np.zeros))
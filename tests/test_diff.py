@@ -0,0 +1,80 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+diff = pytest.importorskip('layouteditorwrapper.diff')
+
+
+@pytest.fixture
+def drawing(layout):
+    return layout.drawing(use_user_unit=False)
+
+
+def _lower_left(element):
+    return tuple(np.min(element.points, axis=0).tolist())
+
+
+def test_normalized_shapes_are_equal(drawing, request):
+    old = drawing.add_cell(request.node.name + '_old')
+    old.add_polygon([(0, 0), (30, 0), (30, 10), (0, 20)], 1)
+    old.add_path([(0, 0), (100, 0), (100, 100)], 2, width=4)
+    old.add_box(50, 50, 10, 10, 1)
+    new = drawing.add_cell(request.node.name + '_new')
+    new.add_box(50, 50, 10, 10, 1)
+    # The polygon starts at a different vertex and runs the other way, and the path runs the other way.
+    new.add_path([(100, 100), (100, 0), (0, 0)], 2, width=4)
+    new.add_polygon([(30, 10), (30, 0), (0, 0), (0, 20)], 1)
+    assert diff.diff_cells(old, new) == {}
+    hashes = diff.cell_hashes(drawing)
+    assert hashes[old.name] == hashes[new.name]
+
+
+def test_added_removed_and_moved(drawing, request):
+    old = drawing.add_cell(request.node.name + '_old')
+    old.add_box(0, 0, 10, 10, 1)
+    old.add_box(100, 0, 20, 20, 1)
+    old.add_box(0, 100, 5, 5, 2)
+    new = drawing.add_cell(request.node.name + '_new')
+    new.add_box(0, 100, 5, 5, 2)
+    new.add_box(10, 5, 10, 10, 1)
+    new.add_box(300, 300, 30, 30, 3)
+    result = diff.diff_cells(old, new)
+    assert list(result) == [1, 3]
+    old_elements = old.elements
+    new_elements = new.elements
+    assert [_lower_left(old_elements[index]) for index in result[1].removed] == [(100, 0)]
+    assert result[1].added == []
+    (old_index, new_index, displacement), = result[1].moved
+    assert _lower_left(old_elements[old_index]) == (0, 0)
+    assert _lower_left(new_elements[new_index]) == (10, 5)
+    assert displacement == (10, 5)
+    assert [_lower_left(new_elements[index]) for index in result[3].added] == [(300, 300)]
+    # A shape that moved farther than max_move is reported as removed and added.
+    limited = diff.diff_cells(old, new, max_move=5)
+    assert limited[1].moved == []
+    assert len(limited[1].removed) == 2 and len(limited[1].added) == 1
+
+
+def test_diff_hierarchy(drawing, request):
+    shared = drawing.add_cell(request.node.name + '_shared')
+    shared.add_box(0, 0, 10, 10, 1)
+    old_child = drawing.add_cell(request.node.name + '_old_child')
+    old_child.add_box(0, 0, 5, 5, 1)
+    new_child = drawing.add_cell(request.node.name + '_new_child')
+    new_child.add_box(0, 0, 5, 5, 1)
+    old = drawing.add_cell(request.node.name + '_old')
+    new = drawing.add_cell(request.node.name + '_new')
+    for cell, child in ((old, old_child), (new, new_child)):
+        cell.add_cell(shared, (0, 0))
+        cell.add_cell(child, (100, 0))
+    # The children have equal contents, so the references hash equally although the names differ.
+    result = diff.diff_hierarchy(old, new)
+    assert result.changed == {} and result.unchanged == [new.name]
+    new.add_box(500, 500, 1, 1, 4)
+    result = diff.diff_hierarchy(old, new)
+    assert list(result.changed) == [new.name]
+    assert list(result.changed[new.name]) == [4]
+    assert result.added == [new_child.name]
+    assert result.removed == [old_child.name]
+    assert result.unchanged == [shared.name]
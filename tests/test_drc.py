@@ -0,0 +1,86 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+from layouteditorwrapper import drc
+
+
+def _width_violations(cell, width):
+    return drc.check(cell, [drc.Rule(drc.WIDTH, 1, width)])
+
+
+@pytest.mark.parametrize('width, height', [(100, 1), (1, 100)])
+def test_min_width_box_orientation(cell, width, height):
+    cell.add_box(0, 0, width, height, 1)
+    violations = _width_violations(cell, 4)
+    assert len(violations) == 1
+    assert violations[0].value == pytest.approx(1)
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+@pytest.mark.parametrize('angle', [0, 30, 45, 90, 135, 200, 315])
+def test_min_width_rotated_sliver(cell, angle, reverse):
+    radians = np.radians(angle)
+    direction = np.array([np.cos(radians), np.sin(radians)])
+    normal = np.array([-direction[1], direction[0]])
+    points = np.array([[0, 0], 1000 * direction, 1000 * direction + 2 * normal, 2 * normal]) + 5000
+    if reverse:
+        points = points[::-1]
+    cell.add_polygon(np.round(points).tolist(), 1, database=True)
+    violations = _width_violations(cell, 4)
+    assert len(violations) >= 1
+    assert all(0 < violation.value < 4 for violation in violations)
+
+
+def test_min_width_wide_box(cell):
+    cell.add_box(0, 0, 100, 10, 1)
+    assert _width_violations(cell, 4) == []
+
+
+def test_min_width_ignores_exterior_notch(cell):
+    # A U shape whose arms are wide but whose slot, which is outside the polygon, is narrow.
+    cell.add_polygon([(0, 0), (30, 0), (30, 100), (21, 100), (21, 10), (19, 10), (19, 100), (0, 100)], 1,
+                     database=True)
+    assert _width_violations(cell, 4) == []
+
+
+@pytest.mark.parametrize('vertical', [False, True])
+def test_min_spacing(cell, vertical):
+    boxes = [(0, 0, 100, 10), (0, 13, 100, 10), (0, 100, 100, 10), (0, 110, 100, 10)]
+    for x, y, width, height in boxes:
+        if vertical:
+            x, y, width, height = y, x, height, width
+        cell.add_box(x, y, width, height, 1)
+    violations = drc.check(cell, [drc.Rule(drc.SPACING, 1, 5)])
+    # The boxes that abut are connected, so only the gap of 3 is a violation.
+    assert violations and all(violation.value == pytest.approx(3) for violation in violations)
+
+
+def test_min_enclosure(cell):
+    cell.add_box(0, 0, 100, 100, 2)
+    cell.add_box(10, 10, 20, 20, 3)
+    cell.add_box(97, 40, 2, 2, 3)
+    cell.add_box(200, 200, 5, 5, 3)
+    violations = drc.check(cell, [drc.Rule(drc.ENCLOSURE, 2, 5, inner_layer=3)])
+    # The box outside the outer layer is reported at its first vertex, and every edge of the box near the outer edge
+    # is reported with its distance; the box well inside is not reported.
+    assert set(violation.value for violation in violations) == {0, 1, 3}
+    (x, y), = [violation.location for violation in violations if violation.value == 0]
+    assert 200 <= x <= 205 and 200 <= y <= 205
+    assert all(violation.location[0] > 90 for violation in violations)
+
+
+def test_min_area(cell):
+    cell.add_box(0, 0, 10, 10, 1)
+    cell.add_box(10, 0, 10, 10, 1)
+    cell.add_box(100, 100, 10, 10, 1)
+    violations = drc.check(cell, [drc.Rule(drc.AREA, 1, 150)])
+    assert [violation.value for violation in violations] == [pytest.approx(100)]
+
+
+def test_incremental_check(cell):
+    cell.add_box(0, 0, 100, 1, 1)
+    added = [cell.add_box(0, 100, 100, 2, 1)]
+    violations = drc.check(cell, [drc.Rule(drc.WIDTH, 1, 4)], elements=added)
+    assert [violation.value for violation in violations] == [pytest.approx(2)]
@@ -0,0 +1,101 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+from layouteditorwrapper import fracture, geometry, spatial
+
+
+def _circle(center, radius, count):
+    angles = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    return np.column_stack((center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)))
+
+
+def _star(random, count):
+    angles = np.sort(random.uniform(0, 2 * np.pi, count))
+    radii = random.uniform(20, 100, count)
+    return np.column_stack((radii * np.cos(angles), radii * np.sin(angles)))
+
+
+def _rings():
+    random = np.random.RandomState(0)
+    return [_circle((0, 0), 100, 64),
+            np.array([[0, 0], [100, 0], [100, 30], [30, 30], [30, 100], [0, 100]]),
+            _star(random, 40),
+            _star(random, 200)]
+
+
+def _containing(vertices, offsets, points):
+    """
+    :return: a tuple (point_indices, ring_indices) containing each pair of a point and a ring that contains it.
+    """
+    i, j = spatial.box_pairs(spatial.point_boxes(points), geometry.bounding_boxes(vertices, offsets))
+    inside = geometry.rings_contain(vertices, offsets, j, points[i])
+    return i[inside], j[inside]
+
+
+def _coverage(vertices, offsets, pieces, piece_offsets, sources, points):
+    """
+    :return: a tuple (inside, counts) of arrays with shape (M, K) containing, for each of the M rings and each of the K
+        points, 1 if the point is inside the ring, and the number of pieces cut from the ring that contain the point.
+    """
+    shape = (offsets.size - 1, len(points))
+    point_indices, ring_indices = _containing(vertices, offsets, points)
+    inside = np.zeros(shape, dtype=int)
+    inside[ring_indices, point_indices] = 1
+    point_indices, piece_indices = _containing(pieces, piece_offsets, points)
+    counts = np.zeros(shape, dtype=int)
+    np.add.at(counts, (sources[piece_indices], point_indices), 1)
+    return inside, counts
+
+
+@pytest.mark.parametrize('max_vertices', [4, 8, 50])
+def test_fracture_preserves_area_and_limit(max_vertices):
+    vertices, offsets = geometry.concatenate(_rings())
+    pieces, piece_offsets, sources = fracture.fracture(vertices, offsets, max_vertices)
+    assert np.all(np.diff(piece_offsets) <= max_vertices)
+    assert np.all(np.diff(sources) >= 0)
+    areas = np.bincount(sources, weights=geometry.ring_areas(pieces, piece_offsets), minlength=offsets.size - 1)
+    assert np.allclose(areas, geometry.ring_areas(vertices, offsets))
+    points = np.random.RandomState(1).uniform(-110, 110, (2000, 2))
+    inside, counts = _coverage(vertices, offsets, pieces, piece_offsets, sources, points)
+    assert np.array_equal(counts, inside)
+
+
+@pytest.mark.parametrize('transform', [[[1, 0], [0, 1]], [[-1, 0], [0, 1]], [[1, 0], [0, -1]], [[0, -1], [1, 0]]])
+def test_fracture_orientation_symmetry(transform):
+    vertices, offsets = geometry.concatenate(_rings())
+    expected = geometry.ring_areas(vertices, offsets)
+    vertices = vertices.dot(np.array(transform, dtype=np.float64).T)
+    pieces, piece_offsets, sources = fracture.fracture(vertices, offsets, 8)
+    areas = np.bincount(sources, weights=geometry.ring_areas(pieces, piece_offsets), minlength=offsets.size - 1)
+    assert np.allclose(areas, expected)
+
+
+def test_fracture_rectangle_is_one_piece():
+    vertices, offsets = geometry.concatenate([np.array([[0, 0], [10, 0], [10, 5], [0, 5]])])
+    pieces, piece_offsets, sources = fracture.fracture(vertices, offsets)
+    assert piece_offsets.tolist() == [0, 4]
+    assert sorted(map(tuple, pieces.tolist())) == [(0, 0), (0, 5), (10, 0), (10, 5)]
+
+
+def test_fracture_groups_with_hole():
+    vertices, offsets = geometry.concatenate([_circle((0, 0), 100, 64), _circle((0, 0), 50, 32)])
+    pieces, piece_offsets, sources = fracture.fracture(vertices, offsets, 16, groups=np.array([0, 0]))
+    assert np.all(sources == 0)
+    areas = geometry.ring_areas(vertices, offsets)
+    assert geometry.ring_areas(pieces, piece_offsets).sum() == pytest.approx(areas[0] - areas[1])
+    assert not np.any(geometry.rings_contain(pieces, piece_offsets, np.arange(piece_offsets.size - 1),
+                                             np.zeros((piece_offsets.size - 1, 2))))
+
+
+def test_split_keeps_small_rings():
+    rings = _rings()
+    vertices, offsets = geometry.concatenate(rings)
+    pieces, piece_offsets, sources = fracture.split(vertices, offsets, 50)
+    assert np.all(np.diff(piece_offsets) <= 50)
+    assert np.all(np.diff(sources) >= 0)
+    for source in (1, 2):
+        piece = np.flatnonzero(sources == source)
+        assert piece.size == 1
+        assert np.array_equal(pieces[piece_offsets[piece[0]]:piece_offsets[piece[0] + 1]], rings[source])
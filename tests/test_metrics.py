@@ -0,0 +1,46 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+metrics = pytest.importorskip('layouteditorwrapper.metrics')
+
+
+def test_path_outlines():
+    areas, perimeters = metrics.path_outlines([100, 100, 100], [6, 6, 6],
+                                              [metrics.FLUSH_CAP, metrics.ROUND_CAP, metrics.EXTENDED_CAP])
+    assert np.allclose(areas, [600, 600 + 9 * np.pi, 636])
+    assert np.allclose(perimeters, [212, 200 + 6 * np.pi, 224])
+
+
+def test_cell_metrics(cell):
+    cell.add_box(0, 0, 10, 20, 1)
+    cell.add_polygon([(0, 0), (30, 0), (0, 40)], 1)
+    cell.add_path([(0, 0), (100, 0), (100, 50)], 2, width=6, cap=metrics.FLUSH_CAP)
+    totals = metrics.cell_metrics(cell)
+    assert list(totals) == [1, 2]
+    assert totals[1] == pytest.approx(metrics.Metrics(800, 180, 0))
+    assert totals[2] == pytest.approx(metrics.Metrics(900, 312, 150))
+
+
+def test_cell_metrics_hierarchy(cell):
+    child = cell.drawing.add_cell(cell.name + '_child')
+    child.add_box(0, 0, 10, 20, 1)
+    cell.add_box(0, 0, 5, 5, 1)
+    cell.add_cell(child, (100, 0), angle=90)
+    cell.add_cell_array(child, origin=(0, 100), step_x=(50, 0), step_y=(0, 50), repeat_x=2, repeat_y=3)
+    assert metrics.cell_metrics(cell)[1] == pytest.approx(metrics.Metrics(25, 20, 0))
+    assert metrics.cell_metrics(cell, hierarchy=True)[1] == pytest.approx(metrics.Metrics(25 + 7 * 200, 20 + 7 * 60,
+                                                                                          0))
+
+
+def test_cell_bounding_box(cell):
+    child = cell.drawing.add_cell(cell.name + '_child')
+    child.add_box(0, 0, 10, 20, 1)
+    # Paths are expanded by half of their width in every direction.
+    cell.add_path([(0, 0), (100, 0)], 2, width=6)
+    cell.add_cell(child, (200, 0), angle=90)
+    cell.add_cell_array(child, origin=(0, 100), step_x=(50, 0), step_y=(0, 50), repeat_x=2, repeat_y=3)
+    assert np.allclose(metrics.cell_bounding_box(cell, hierarchy=False), [-3, -3, 103, 3])
+    assert np.allclose(metrics.cell_bounding_box(cell), [-3, -3, 200, 220])
+    assert metrics.cell_bounding_box(cell.drawing.add_cell(cell.name + '_empty')) is None
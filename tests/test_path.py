@@ -0,0 +1,43 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+path = pytest.importorskip('layouteditorwrapper.path')
+
+
+def _trace(end):
+    return path.Trace(outline=[(0, 0), end], width=1)
+
+
+def _check(p, end, length):
+    np.testing.assert_allclose(p.end, end)
+    assert p.length == pytest.approx(length)
+    assert p.arc_length == pytest.approx(length)
+
+
+def test_clear_invalidates_the_cached_sums():
+    p = path.Path([_trace((10, 0)), _trace((0, 10))])
+    _check(p, (10, 10), 20)
+    if hasattr(p, 'clear'):
+        p.clear()
+    else:  # Python 2 lists have no clear().
+        del p[:]
+    _check(p, (0, 0), 0)
+    p.append(_trace((0, 5)))
+    _check(p, (0, 5), 5)
+    np.testing.assert_allclose(p.origins, [[0, 0]])
+    points, angles = p.locate([5])
+    np.testing.assert_allclose(points, [[0, 5]], atol=1e-12)
+
+
+def test_mutation_invalidates_the_cached_sums():
+    p = path.Path([_trace((10, 0)), _trace((0, 10))])
+    _check(p, (10, 10), 20)
+    p[1] = _trace((3, 0))
+    _check(p, (13, 0), 13)
+    p.insert(0, _trace((0, -2)))
+    _check(p, (13, -2), 15)
+    np.testing.assert_allclose(p.origins, [[0, 0], [0, -2], [10, -2]])
+    del p[0]
+    _check(p, (13, 0), 13)
@@ -0,0 +1,96 @@
+from __future__ import division
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from layouteditorwrapper import geometry
+
+render = pytest.importorskip('layouteditorwrapper.render')
+
+
+def _mask(rings, shape, pixel=1, small='box'):
+    mask = np.zeros(shape, dtype=bool)
+    render._fill(mask, 0, 0, *geometry.concatenate([np.asarray(ring, dtype=np.float64) for ring in rings]),
+                 pixel=pixel, small=small)
+    return mask
+
+
+def test_fill_box():
+    mask = _mask([[(2, 1), (12, 1), (12, 6), (2, 6)]], (10, 20))
+    expected = np.zeros((10, 20), dtype=bool)
+    expected[1:6, 2:12] = True
+    assert np.array_equal(mask, expected)
+
+
+def test_fill_circle_area():
+    angles = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    circle = np.column_stack((50 + 40 * np.cos(angles), 50 + 40 * np.sin(angles)))
+    mask = _mask([circle], (100, 100))
+    assert np.count_nonzero(mask) == pytest.approx(np.pi * 40 ** 2, rel=0.01)
+
+
+def test_fill_orientation_symmetry():
+    # The vertices are not on the pixel grid, so no edge passes exactly through the center of a pixel.
+    triangle = np.array([[3.13, 2.27], [40.71, 7.39], [11.58, 33.62]])
+    mask = _mask([triangle], (50, 50))
+    assert np.array_equal(_mask([triangle[::-1]], (50, 50)), mask)
+    assert np.array_equal(_mask([triangle[:, ::-1]], (50, 50)), mask.T)
+    assert np.array_equal(_mask([[50, 0] + [-1, 1] * triangle], (50, 50)), mask[:, ::-1])
+
+
+def test_fill_small_shapes():
+    sliver = [(2.2, 3.1), (2.4, 3.1), (2.4, 8.9), (2.2, 8.9)]
+    boxed = _mask([sliver], (10, 10))
+    assert np.array_equal(np.argwhere(boxed), [[row, 2] for row in range(3, 9)])
+    assert not _mask([sliver], (10, 10), small='cull').any()
+
+
+def test_png_bytes():
+    image = np.random.RandomState(0).randint(0, 256, (7, 5, 3)).astype(np.uint8)
+    data = render.png_bytes(image)
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    assert struct.unpack('>IIBBBBB', data[16:29]) == (5, 7, 8, 2, 0, 0, 0)
+    start = data.index(b'IDAT')
+    length = struct.unpack('>I', data[start - 4:start])[0]
+    rows = np.frombuffer(zlib.decompress(data[start + 4:start + 4 + length]), dtype=np.uint8).reshape(7, -1)
+    assert np.all(rows[:, 0] == 0)
+    assert np.array_equal(rows[:, 1:].reshape(image.shape), image)
+    with pytest.raises(ValueError):
+        render.png_bytes(np.zeros((2, 2, 2), dtype=np.uint8))
+
+
+def test_layer_masks(cell):
+    cell.add_box(0, 0, 100, 50, 1)
+    cell.add_box(50, 50, 10, 10, 2)
+    masks = render.layer_masks(cell, width=100, box=(0, 0, 100, 100))
+    assert list(masks) == [1, 2]
+    # The first row is at the top of the image.
+    assert masks[1].shape == (100, 100)
+    assert masks[1][50:].all() and not masks[1][:50].any()
+    assert np.argwhere(masks[2]).min(axis=0).tolist() == [40, 50]
+    assert np.count_nonzero(masks[2]) == 100
+    assert list(render.layer_masks(cell, width=100, box=(0, 0, 100, 100), layers=[2])) == [2]
+
+
+def test_references_match_flat_drawing(layout, request):
+    drawing = layout.drawing(use_user_unit=False)
+    child = drawing.add_cell(request.node.name + '_child')
+    child.add_polygon([(0, 0), (40, 0), (40, 10), (10, 30), (0, 30)], 1)
+    hierarchy = drawing.add_cell(request.node.name + '_hierarchy')
+    hierarchy.add_cell(child, (200, 0), angle=90)
+    hierarchy.add_cell_array(child, origin=(0, 100), step_x=(50, 0), step_y=(0, 50), repeat_x=3, repeat_y=2)
+    flat = drawing.add_cell(request.node.name + '_flat')
+    flat.add_polygon([(200, 0), (200, 40), (190, 40), (170, 10), (170, 0)], 1)
+    for x in (0, 50, 100):
+        for y in (100, 150):
+            flat.add_polygon([(x, y), (x + 40, y), (x + 40, y + 10), (x + 10, y + 30), (x, y + 30)], 1)
+    box = (-10, -10, 240, 240)
+    expected = render.layer_masks(flat, width=250, box=box)[1]
+    assert np.array_equal(render.layer_masks(hierarchy, width=250, box=box)[1], expected)
+    image = render.render(hierarchy, width=250, box=box, colors={1: (0, 0, 0)}, opacity=1)
+    assert image.shape == (250, 250, 3)
+    assert np.array_equal(np.all(image == 0, axis=2), expected)
+    assert np.all(image[~expected] == 255)
@@ -0,0 +1,56 @@
+from __future__ import division
+
+import numpy as np
+
+from layouteditorwrapper import spatial
+
+
+def _brute_force_pairs(boxes_a, boxes_b, margin):
+    a = boxes_a[:, np.newaxis, :]
+    b = boxes_b[np.newaxis, :, :]
+    near = ((a[..., 0] - margin <= b[..., 2]) & (b[..., 0] <= a[..., 2] + margin) &
+            (a[..., 1] - margin <= b[..., 3]) & (b[..., 1] <= a[..., 3] + margin))
+    return set(zip(*[indices.tolist() for indices in np.nonzero(near)]))
+
+
+def _random_boxes(random, count):
+    corners = random.uniform(0, 1000, (count, 2))
+    return np.hstack((corners, corners + random.lognormal(2, 1.5, (count, 2))))
+
+
+def test_box_pairs_matches_brute_force():
+    random = np.random.RandomState(0)
+    boxes_a = _random_boxes(random, 300)
+    boxes_b = _random_boxes(random, 200)
+    for margin in (0, 5):
+        i, j = spatial.box_pairs(boxes_a, boxes_b, margin=margin)
+        assert set(zip(i.tolist(), j.tolist())) == _brute_force_pairs(boxes_a, boxes_b, margin)
+        assert len(i) == len(set(zip(i.tolist(), j.tolist())))
+
+
+def test_box_pairs_self():
+    random = np.random.RandomState(1)
+    boxes = _random_boxes(random, 300)
+    i, j = spatial.box_pairs(boxes, margin=2)
+    expected = set((a, b) for a, b in _brute_force_pairs(boxes, boxes, 2) if a < b)
+    assert set(zip(i.tolist(), j.tolist())) == expected
+    assert len(i) == len(expected)
+
+
+def test_box_pairs_empty():
+    i, j = spatial.box_pairs(np.empty((0, 4)), np.array([[0, 0, 1, 1]]))
+    assert i.size == j.size == 0
+    i, j = spatial.box_pairs(np.array([[0, 0, 1, 1], [5, 5, 6, 6]]))
+    assert i.size == j.size == 0
+
+
+def test_box_pairs_one_huge_box():
+    # A ground plane under many small shapes must not be registered in every cell of a grid sized for the small shapes.
+    random = np.random.RandomState(2)
+    corners = random.uniform(0, 1e6, (20000, 2))
+    boxes = np.vstack((np.hstack((corners, corners + 10)), [[0, 0, 1e6, 1e6]]))
+    i, j = spatial.box_pairs(boxes)
+    huge = j == boxes.shape[0] - 1
+    assert np.array_equal(np.sort(i[huge]), np.arange(20000))
+    i, j = spatial.box_pairs(boxes[-1:], boxes[:-1])
+    assert np.array_equal(np.sort(j), np.arange(20000))
@@ -0,0 +1,44 @@
+from __future__ import division
+
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from layouteditorwrapper import gds
+
+stream = pytest.importorskip('layouteditorwrapper.stream')
+
+
+def _records(data):
+    """
+    :return: a list of (record_type, data) tuples read from the bytes of a GDSII stream.
+    """
+    records = []
+    position = 0
+    while position < len(data):
+        length, record_type = struct.unpack('>HH', data[position:position + 4])
+        records.append((record_type, data[position + 4:position + length]))
+        position += length
+    return records
+
+
+def test_array_reference_points(cell):
+    child = cell.drawing.add_cell(cell.name + '_child')
+    child.add_box(0, 0, 10, 10, 1)
+    array = cell.add_cell_array(child, origin=(10, 20), step_x=(50, 0), step_y=(0, 30), repeat_x=3, repeat_y=2)
+    output = io.BytesIO()
+    writer = gds.Writer(output)
+    writer.begin_structure(cell.name)
+    stream.write_element(writer, array)
+    writer.end_structure()
+    writer.close()
+    records = _records(output.getvalue())
+    types = [record_type for record_type, _ in records]
+    start = types.index(gds.AREF)
+    colrow = records[types.index(gds.COLROW, start)][1]
+    xy = records[types.index(gds.XY, start)][1]
+    assert struct.unpack('>hh', colrow) == (3, 2)
+    # GDSII stores the origin displaced by all of the columns and by all of the rows.
+    assert np.array(struct.unpack('>6i', xy)).reshape(3, 2).tolist() == [[10, 20], [160, 20], [10, 80]]
@@ -0,0 +1,36 @@
+from __future__ import division
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+sweep = pytest.importorskip('layouteditorwrapper.sweep')
+
+
+def _box(drawing, length, turns, layer=1):
+    cell = drawing.add_cell('box_{}_{}'.format(length, turns))
+    cell.add_box(0, 0, length, turns, layer)
+    return cell
+
+
+def test_grid_origins():
+    origins, label_origins = sweep.grid_origins([(0, 0, 10, 20), (0, 0, 30, 5), (-5, 0, 5, 10)], 2, spacing=1,
+                                                label_space=2)
+    assert origins.tolist() == [[0, -22], [11, -22], [5, -35]]
+    assert label_origins.tolist() == [[0, 0], [11, -15], [0, -23]]
+
+
+def test_empty_grid(cell):
+    origins, label_origins = sweep.grid_origins([], 3)
+    assert origins.shape == label_origins.shape == (0, 2)
+    result = sweep.sweep(cell.drawing, _box, OrderedDict([('length', []), ('turns', [5, 10])]),
+                         cell_name=cell.name + '_sweep', label_layer=2, label_height=5)
+    assert result.variants == result.cells == []
+    assert result.origins.shape == (0, 2)
+
+
+def test_label():
+    assert sweep.label(OrderedDict([('length', 10 ** 7), ('gap', 2.50), ('mesh', True), ('turns', np.int64(5)),
+                                    ('width', np.float64(0.1)), ('name', 'a')])) == \
+        'length=10000000, gap=2.5, mesh=True, turns=5, width=0.1, name=a'
@@ -0,0 +1,74 @@
+from __future__ import division
+
+import functools
+
+import numpy as np
+
+from layouteditorwrapper import geometry, spatial, tiling
+
+
+def _lower_left_corners(tile):
+    """
+    An operation that reports each shape once, anchored at the lower left corner of its bounding box.
+    """
+    return geometry.bounding_boxes(tile.vertices, tile.offsets)[:, :2], tile.ids
+
+
+def _close_pairs(tile, distance):
+    """
+    An operation that reports each pair of shapes whose first vertices are closer than the given distance, anchored at
+    the midpoint of the two vertices.
+    """
+    points = tile.vertices[tile.offsets[:-1]]
+    i, j = spatial.box_pairs(spatial.point_boxes(points), margin=distance)
+    close = np.hypot(*(points[i] - points[j]).T) < distance
+    i = i[close]
+    j = j[close]
+    pairs = np.sort(np.column_stack((tile.ids[i], tile.ids[j])), axis=1)
+    return (points[i] + points[j]) / 2, pairs
+
+
+def _boxes(corners, sizes):
+    """
+    :return: the vertices and offsets of square boxes with the given lower left corners and sides.
+    """
+    corners = np.asarray(corners, dtype=np.float64)
+    return geometry.concatenate(geometry.box_rings(np.stack((corners, corners + sizes), axis=1)))
+
+
+def test_each_result_is_kept_once():
+    random = np.random.RandomState(0)
+    vertices, offsets = _boxes(random.uniform(0, 5000, (500, 2)), 30)
+    anchors, ids = tiling.run(_lower_left_corners, vertices, offsets, tile_size=700, halo=50)
+    assert np.array_equal(np.sort(ids), np.arange(500))
+
+
+def test_tiled_result_equals_untiled():
+    random = np.random.RandomState(1)
+    vertices, offsets = _boxes(random.uniform(0, 5000, (2000, 2)), 20)
+    operation = functools.partial(_close_pairs, distance=50)
+    whole = operation(tiling.Tile(0, np.array([-np.inf, -np.inf, np.inf, np.inf]), None, vertices, offsets,
+                                  np.zeros(2000, dtype=np.int64), np.arange(2000)))[1]
+    for workers in (None, 2):
+        anchors, pairs = tiling.run(operation, vertices, offsets, tile_size=700, halo=50, workers=workers)
+        assert sorted(map(tuple, pairs.tolist())) == sorted(map(tuple, whole.tolist()))
+
+
+def test_die_sized_ground_plane():
+    # A ground plane covers every tile, so it is given to each tile's operation but must not make the index of shapes
+    # grow with the number of tiles times the number of grid cells.
+    random = np.random.RandomState(2)
+    corners = np.vstack((random.uniform(0, 1e6, (5000, 2)), [[0, 0]]))
+    sizes = np.append(np.full(5000, 10), 1e6)[:, np.newaxis]
+    vertices, offsets = _boxes(corners, sizes)
+    anchors, ids = tiling.run(_lower_left_corners, vertices, offsets, tile_size=2e4, halo=100)
+    assert np.array_equal(np.sort(ids), np.arange(5001))
+
+
+def test_run_cell_with_ground_plane(cell):
+    random = np.random.RandomState(3)
+    for x, y in random.randint(0, 10 ** 6, (500, 2)).tolist():
+        cell.add_box(x, y, 10, 10, 1)
+    cell.add_box(0, 0, 10 ** 6, 10 ** 6, 2)
+    anchors, rows = tiling.run_cell(cell, [1, 2], _lower_left_corners, tile_size=5 * 10 ** 4, halo=100)
+    assert np.array_equal(np.sort(rows), np.arange(501))
@@ -0,0 +1,131 @@
+from __future__ import division
+
+import numpy as np
+import pytest
+
+from layouteditorwrapper import geometry, spatial
+
+union = pytest.importorskip('layouteditorwrapper.union')
+
+
+def _box(x0, y0, x1, y1):
+    return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float64)
+
+
+def _circles(random, count, extent):
+    angles = np.linspace(0, 2 * np.pi, 32, endpoint=False)
+    rings = []
+    for (x, y), radius in zip(random.uniform(0, extent, (count, 2)), random.uniform(20, 200, count)):
+        rings.append(np.rint(np.column_stack((x + radius * np.cos(angles), y + radius * np.sin(angles)))))
+    return rings
+
+
+def _parities(vertices, offsets, points):
+    """
+    :return: an integer array containing, for each point, the number of the given rings that contain it.
+    """
+    i, j = spatial.box_pairs(spatial.point_boxes(points), geometry.bounding_boxes(vertices, offsets))
+    inside = geometry.rings_contain(vertices, offsets, j, points[i])
+    return np.bincount(i[inside], minlength=len(points))
+
+
+def _near_boundary(vertices, offsets, points, tolerance):
+    """
+    :return: a boolean array that is True for each point that is within the tolerance of an edge of the given rings.
+    """
+    following = np.arange(1, vertices.shape[0] + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    starts = vertices
+    ends = vertices[following]
+    i, j = spatial.box_pairs(spatial.point_boxes(points), spatial.segment_boxes(starts, ends), margin=tolerance)
+    distances, _ = geometry.point_segment_distances(points[i], starts[j], ends[j])
+    near = np.zeros(len(points), dtype=bool)
+    near[i[distances < tolerance]] = True
+    return near
+
+
+def _assert_covers(vertices, offsets, result_vertices, result_offsets, points, tolerance=1):
+    """
+    Assert that the result covers exactly the points covered by the input, except within the tolerance of an input
+    edge, where rounding the crossings to integers can move the boundary, and that no point is covered twice.
+    """
+    covered = _parities(vertices, offsets, points) > 0
+    # A point inside a hole is inside both the hole and its outer ring.
+    counts = _parities(result_vertices, result_offsets, points)
+    near = _near_boundary(vertices, offsets, points, tolerance)
+    assert np.array_equal((counts % 2 == 1)[~near], covered[~near])
+    return counts
+
+
+def test_union_of_overlapping_boxes():
+    vertices, offsets = geometry.concatenate([_box(0, 0, 10, 10), _box(5, 0, 15, 10), _box(100, 100, 110, 120)])
+    result, result_offsets = union.union(vertices, offsets)
+    assert result.dtype == np.int64
+    assert sorted(geometry.ring_signed_areas(result, result_offsets).tolist()) == [150, 200]
+    assert sorted(np.diff(result_offsets).tolist()) == [4, 4]
+
+
+def test_union_orientation_and_holes():
+    # Four boxes that form a frame, given in both orientations.
+    frame = [_box(0, 0, 100, 10), _box(0, 90, 100, 100)[::-1], _box(0, 0, 10, 100), _box(90, 0, 100, 100)[::-1]]
+    vertices, offsets = geometry.concatenate(frame)
+    result, result_offsets = union.union(vertices, offsets)
+    areas = geometry.ring_signed_areas(result, result_offsets)
+    assert sorted(areas.tolist()) == [-6400, 10000]
+    piece_vertices, piece_offsets = union.polygons(result, result_offsets, max_vertices=8)
+    piece_areas = geometry.ring_signed_areas(piece_vertices, piece_offsets)
+    assert np.all(piece_areas != 0)
+    assert np.abs(piece_areas).sum() == pytest.approx(3600)
+    assert np.all(np.diff(piece_offsets) <= 8)
+    assert not np.any(_parities(piece_vertices, piece_offsets, np.array([[50.0, 50.0]])))
+
+
+@pytest.mark.parametrize('transform', [[[1, 0], [0, 1]], [[-1, 0], [0, 1]], [[1, 0], [0, -1]], [[0, -1], [1, 0]]])
+def test_union_of_circles(transform):
+    random = np.random.RandomState(0)
+    vertices, offsets = geometry.concatenate(_circles(random, 60, 2000))
+    reference, reference_offsets = union.union(vertices, offsets)
+    transform = np.array(transform, dtype=np.float64)
+    vertices = vertices.dot(transform.T)
+    result, result_offsets = union.union(vertices, offsets)
+    points = random.uniform(-2200, 2200, (3000, 2))
+    counts = _assert_covers(vertices, offsets, result, result_offsets, points)
+    assert counts.max() <= 2
+    # Outer rings are counterclockwise and holes are clockwise, so the signed areas add up to the covered area, which
+    # does not depend on the orientation of the input.
+    areas = geometry.ring_signed_areas(result, result_offsets)
+    assert np.all(areas != 0)
+    assert areas.sum() == pytest.approx(geometry.ring_signed_areas(reference, reference_offsets).sum(), rel=1e-4)
+
+
+def test_union_window():
+    vertices, offsets = geometry.concatenate([_box(0, 0, 100, 100), _box(50, 50, 150, 150)])
+    result, result_offsets = union.union(vertices, offsets, window=(0, 0, 100, 100))
+    assert geometry.ring_signed_areas(result, result_offsets).tolist() == [10000]
+
+
+def test_merge_tiled_equals_untiled(layout, request):
+    random = np.random.RandomState(1)
+    rings = _circles(random, 200, 5000)
+    cells = []
+    for name in ('untiled', 'tiled'):
+        cell = layout.drawing(use_user_unit=False).add_cell(request.node.name + name)
+        for ring in rings:
+            cell.add_polygon(ring, 1, database=True)
+        cell.add_path([(0, 0), (5000, 5000)], 1, width=30)
+        cells.append(cell)
+    untiled, tiled = cells
+    union.merge(untiled, 1)
+    union.merge(tiled, 1, tile_size=1200)
+    points = random.uniform(0, 5000, (3000, 2))
+    outlines = [cell.element_table().outlines([1]) for cell in cells]
+    untiled_counts = _parities(outlines[0][0], outlines[0][1], points)
+    tiled_counts = _parities(outlines[1][0], outlines[1][1], points)
+    # The polygons do not overlap, except along shared edges.
+    near = _near_boundary(outlines[0][0], outlines[0][1], points, 1) | _near_boundary(outlines[1][0], outlines[1][1],
+                                                                                      points, 1)
+    assert np.array_equal((untiled_counts > 0)[~near], (tiled_counts > 0)[~near])
+    assert untiled_counts[~near].max() == tiled_counts[~near].max() == 1
+    untiled_area = geometry.ring_areas(outlines[0][0], outlines[0][1]).sum()
+    tiled_area = geometry.ring_areas(outlines[1][0], outlines[1][1]).sum()
+    assert tiled_area == pytest.approx(untiled_area, rel=1e-4)